@@ -7,6 +7,7 @@ from flask_cors import CORS
 from config import Config
 from routes import api as api_blueprint
 from services import nebula_service, search_service,mongodb_service,neo4j_service
+from services import dashboard_rollup, media_service
 #from services import neo4j_service
 from flask.json.provider import DefaultJSONProvider
 
@@ -50,8 +51,10 @@ def create_app():
     with app.app_context():
         # 根据需要启动相应服务
         nebula_service.init_nebula_pool(app.config)
+        media_service.init_media_service(app.config)
         search_service.init_search_clients(app.config)
         mongodb_service.init_mongodb_pool(app.config)
+        dashboard_rollup.init_dashboard_rollup(app.config)
         neo4j_service.init_neo4j_pool(app.config)
 
     # 6. 注册Blueprint
@@ -15,6 +15,7 @@ class Config:
     VIDEO_ALLOWED_EXTENSIONS = {'mov', 'mp4', 'avi', 'mkv', 'flv'}
     PICTURE_ALLOWED_EXTENSIONS = {'png', 'jpg', 'jpeg'}
     TXT_ALLOWED_EXTENSIONS = {'txt'}
+    UPLOAD_RESULT_CACHE_TTL = 3600  # 按内容哈希缓存的图片/视频搜索结果有效期(秒)
 
     # 日志配置
     LOG_LEVEL = "INFO"
@@ -37,20 +38,51 @@ class Config:
     #NEO4J_PORT =  7687
     NEO4J_USER = 'neo4j'
     NEO4J_PASSWORD =  'password'
+    NEO4J_FULLTEXT_INDEX = 'infoFulltext'  # INFO节点全文索引（text/title/element_topic/info_class），启动时自动创建
+    NEO4J_FULLTEXT_ANALYZER = 'cjk'  # 中文按二元组切分
+    NEO4J_FULLTEXT_MAX_HITS = 1000  # 全文检索最多取回的命中数，再按influence_score取top-k
+    NEO4J_SNAPSHOT_ENABLED = True  # INFO节点内存快照，列表/搜索/统计/详情从内存读取
+    NEO4J_SNAPSHOT_CHECK_INTERVAL = 30  # 版本检查间隔(秒)：INFO节点数或版本字段最大值变化时重新加载
+    NEO4J_SNAPSHOT_MAX_AGE = 3600  # 版本未变化时也定期重新加载(秒)，0表示不定期加载
+    NEO4J_SNAPSHOT_VERSION_FIELD = 'update_time'  # INFO节点的更新时间属性，导入工具写入
     # 静态文件目录配置（使用原始字符串避免转义问题）
     fake_video_dir = r'/data/data/web/video'
     fake_img_dir = r'/data/data/web/picture'
+    # 搜索结果媒体链接配置（/api/media/<token>，签名链接代替内联base64）
+    MEDIA_URL_SECRET = os.environ.get('MEDIA_URL_SECRET')  # 未设置时使用进程内随机密钥；多worker部署必须设置且保持一致
+    MEDIA_URL_TTL = 3600  # 签名链接有效期(秒)
+    MEDIA_ALLOWED_ROOTS = ['/data/data/web', '/data/storage']  # 只允许访问这些目录下的文件，不能为空，为空时拒绝所有访问
+    MEDIA_THUMBNAIL_DIR = os.path.join(os.getcwd(), 'thumbnails')  # 预生成缩略图目录（scripts/build_thumbnails.py）
     # Milvus 配置
     MILVUS_URI = "http://172.18.112.199:31800"
     MILVUS_TOKEN = "root:Milvus" # 示例token，请按需修改
     MILVUS_VIDEO_COLLECTION = 'video_1010'
     MILVUS_IMAGE_COLLECTION = 'image_0911'
 
+    # 本地pHash索引配置（由 scripts/build_phash_index.py 构建，文件不存在时只使用Milvus）
+    PHASH_INDEX_PATH = os.path.join(os.getcwd(), 'models', 'phash', 'phash_index.npz')
+    PHASH_MAX_DISTANCE = 90  # 汉明距离严格小于该值才视为命中
+    PHASH_TOP_K = 10
+
+    # 批量图片搜索配置
+    PICTURE_BATCH_MAX_FILES = 500  # 单次批量搜索的图片数量上限
+    PHASH_WORKERS = None  # 签名计算进程数，None表示使用CPU核数
+    PHASH_POOL_MIN_BATCH = 8  # 图片数量不少于该值时才使用进程池
+
     # Elasticsearch 配置
     ES_HOSTS = ['http://172.18.112.199:9201']
     ES_AUTH = ('elastic', 'miti963258741') # 示例认证，请替换为您的真实认证信息
     ES_INDEX = 'sns_search_article'
 
+    # 文本重排序 n-gram 模型配置（由 scripts/build_ngram_model.py 离线构建）
+    NGRAM_MODEL_DIR = os.path.join(os.getcwd(), 'models', 'ngram')
+    SEARCH_TEXT_TOP_K_FIRST = 100  # ES召回候选数，重排序与源头标记的开销随其近似线性增长
+
+    # 文本搜索结果缓存配置
+    SEARCH_CACHE_SIZE = 512  # 进程内LRU条目上限，设为0禁用缓存
+    SEARCH_CACHE_DISK_DIR = None  # 多worker共享的本地磁盘缓存目录，None表示不启用
+    SEARCH_CACHE_GENERATION_TTL = 5  # ES索引代际检查间隔(秒)
+
     # MongoDB 配置
     MONGO_HOST = '172.18.112.199'
     # MONGO_HOST = '127.0.0.1'
@@ -59,7 +91,56 @@ class Config:
     MONGO_PASSWORD = ''  # 本地开发环境可以留空
     MONGO_DBNAME = 'admin'  # 用户实际数据库名
     MONGO_COLLECTION = 'event'  # 用户实际集合名
+    MONGO_MANAGE_INDEXES = True  # 启动时后台校验事件集合索引（services/mongo_indexes.py）
+    MONGO_CREATE_MISSING_INDEXES = False  # 启动校验时自动创建缺失的索引；默认只记录，由 scripts/ensure_event_indexes.py 创建，避免多个worker同时建索引
+    MONGO_EXPLAIN_ON_STARTUP = True  # 校验后explain各查询形态，记录仍在全集合扫描的查询
+    MONGO_NORMALIZED_FIELDS = 'auto'  # 查询是否使用isRiskBool/TimeDt影子字段：'auto'为迁移完成后启用，True/False强制
+    MONGO_NORMALIZE_INTERVAL = 300  # 迁移完成后为新文档补齐影子字段的间隔(秒)，0表示不启用
+
+    # 事件列表总数统计策略：exact(精确)/cached(精确+缓存)/capped(超过上限返回下界)/estimated(估算)
+    COUNT_STRATEGY_ALL_EVENTS = 'cached'
+    COUNT_STRATEGY_RISK_EVENTS = 'cached'
+    COUNT_CACHE_TTL = 60  # cached策略的缓存有效期(秒)
+    COUNT_CAP = 10000  # capped策略的计数上限，超过时返回 "10,000+"
+    # 事件列表快速路径：服务端转换_id、按原始BSON批次读取并一次性序列化为JSON（安装orjson时更快；文档仍完整解码，设置返回字段才能减少解码量）
+    EVENT_LIST_FAST_JSON = True
+    EVENT_LIST_FIELDS = None  # 列表默认返回字段，None表示全部字段；请求可用fields参数覆盖
+    STATS_CACHE_TTL = 60  # getDatabaseStats结果缓存有效期(秒)
+
+    # 事件集合变更监听（副本集使用change stream，单机部署退化为轮询），变更时清空计数/统计缓存并更新仪表盘汇总
+    CHANGE_WATCH_ENABLED = True
+    CHANGE_WATCH_POLL_INTERVAL = 10  # 轮询模式的间隔(秒)
+    CHANGE_WATCH_CACHE_TTL = 3600  # change stream正常时缓存使用的TTL(秒)，写入会主动失效
+    CHANGE_WATCH_PRE_IMAGES = False  # MongoDB 6.0+ 且集合开启changeStreamPreAndPostImages时启用，修改/删除可精确增量更新汇总
+
+    # 事件关键词二元组倒排索引（由 scripts/build_bigram_index.py 构建，文件不存在时只使用正则匹配）
+    BIGRAM_INDEX_PATH = os.path.join(os.getcwd(), 'models', 'bigram', 'event_bigram_index.npz')
+    BIGRAM_MAX_CANDIDATES = 10000  # 候选文档数超过该值时不走索引（常见关键词按时间排序扫描更快）
+    BIGRAM_RELOAD_INTERVAL = 300  # 检查索引文件是否被重建(秒)，重建后自动加载；0表示不检查
+
+    # 事件导出配置（/api/exportEvents，流式导出）
+    EXPORT_BATCH_SIZE = 5000  # 每批从游标读取的文档数
+    EXPORT_PARTITION_WORKERS = 4  # 分段导出时同时读取的分段数
+    EXPORT_MAX_ROWS = None  # 单次导出行数上限，None表示不限制
+
+    # 仪表盘汇总配置（/api/getDashboardMetrics 读取预计算结果）
+    DASHBOARD_ROLLUP_COLLECTION = 'dashboard_rollup'  # 汇总文档所在集合
+    DASHBOARD_ROLLUP_BATCH_SIZE = 200000  # 每次聚合处理的文档数上限
+    DASHBOARD_ROLLUP_REFRESH_INTERVAL = 60  # 增量刷新间隔(秒)，0表示不启动后台刷新
+    DASHBOARD_ROLLUP_FULL_REBUILD_INTERVAL = 24 * 3600  # 全量重建间隔(秒)，用于修正文档修改和删除
+    DASHBOARD_ROLLUP_STALE_REBUILD_INTERVAL = 3600  # 监听到无法增量处理的修改/删除后，最迟多久全量重建(秒)
+    DASHBOARD_QUERY_TIMEOUT = 30  # 实时统计(live=true)时每项查询的截止时间(秒)，各项并发执行
+    MONGO_ASYNC_WORKERS = 16  # 并发查询线程池大小，不应超过MongoClient的maxPoolSize
 
     # Towhee Video Search 配置
     TOWHEE_LEVELDB_PATH = '/data/data/sunye/video_backup.db' # 重要：请替换为您的真实路径
-    TOWHEE_DEVICE = 0 # 使用GPU 0, 如果没有GPU请设置为None
\ No newline at end of file
+    TOWHEE_DEVICE = 0 # 使用GPU 0, 如果没有GPU请设置为None
+    VIDEO_PIPELINE_POOL_SIZE = 1  # 每种 集合/设备/阈值 组合最多同时使用的流水线实例数
+    VIDEO_PIPELINE_ACQUIRE_TIMEOUT = 300  # 等待空闲流水线的超时时间(秒)
+    VIDEO_PIPELINE_WARMUP_THRESHOLDS = [0.8]  # 启动时预热的阈值，与 /api/search/video 使用的阈值一致
+
+    # 异步视频搜索任务配置
+    VIDEO_JOB_WORKERS = 2  # 后台执行视频检测的线程数
+    VIDEO_JOB_MAX_PENDING = 16  # 等待队列上限，超出时提交返回503
+    VIDEO_JOB_DIR = os.path.join(os.getcwd(), 'jobs', 'video')  # 任务记录目录，多个worker进程共享
+    VIDEO_JOB_RESULT_TTL = 24 * 3600  # 已完成任务结果保留时间(秒)
\ No newline at end of file
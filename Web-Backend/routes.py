@@ -4,10 +4,12 @@ import os
 import time
 import calendar
 import json
-from flask import Blueprint, request, jsonify, current_app, make_response, Response, redirect
+from flask import Blueprint, request, jsonify, current_app, make_response, Response, redirect, send_file
 from werkzeug.utils import secure_filename
 from datetime import datetime
 from services import nebula_service, search_service, mongodb_service,neo4j_service
+from services import upload_store, media_service, dashboard_rollup, mongo_indexes, export_engine
+from services.job_queue import QueueFullError, JOB_DONE, JOB_FAILED
 #from services import neo4j_service
 import utils
 from datetime import datetime
@@ -125,8 +127,8 @@ def search_text_route():
     #     return jsonify({"error": "'score' 参数必须是浮点数"}), 400
 
     start_time = time.time()
-    results = search_service.search_text(query_content, score, current_app.config)
-    print(results)
+    top_k_first = current_app.config.get('SEARCH_TEXT_TOP_K_FIRST', 100)
+    results = search_service.search_text(query_content, score, current_app.config, top_k_first=top_k_first)
     duration = time.time() - start_time
     current_app.logger.info(f"文本 '{query_content}' 搜索耗时: {duration:.2f}s")
     
@@ -136,23 +138,35 @@ def search_text_route():
     return jsonify({"search_results": results})
 
 
+@api.route('/search/text/cache', methods=['GET'])
+def search_text_cache_stats_route():
+    """文本搜索结果缓存的命中统计"""
+    return jsonify(search_service.get_text_cache_stats())
+
+
 def _handle_file_upload(file_key, allowed_checker):
     """处理文件上传的通用逻辑"""
     if file_key not in request.files:
         return None, jsonify({"error": f"请求中缺少 '{file_key}'"}), 400
 
-    file = request.files[file_key]
+    return _save_uploaded_file(request.files[file_key], allowed_checker)
+
+def _save_uploaded_file(file, allowed_checker):
+    """保存单个上传文件，返回 (filepath, error_response, status_code)"""
     # print(file.filename)
     if file.filename == '':
         return None, jsonify({"error": "未选择文件"}), 400
     # print(allowed_checker)
     if file and allowed_checker(file.filename):
-        filename = secure_filename(file.filename)
+        # 按内容SHA-256保存，相同内容只落盘一次，不同文件同名也不会互相覆盖
+        # 扩展名已通过allowed_checker白名单校验，直接取原始文件名中的扩展名（中文文件名经secure_filename后会丢失扩展名）
+        extension = file.filename.rsplit('.', 1)[1].lower()
         upload_folder = current_app.config['UPLOAD_FOLDER']
-        os.makedirs(upload_folder, exist_ok=True)
-        filepath = os.path.join(upload_folder, filename)
-        file.save(filepath)
-        current_app.logger.info(f"文件已保存至: {filepath}")
+        filepath, digest, is_new = upload_store.save_upload(file, upload_folder, extension)
+        if is_new:
+            current_app.logger.info(f"文件已保存至: {filepath}")
+        else:
+            current_app.logger.info(f"文件内容已存在，复用: {filepath}")
         return filepath, None, None
     else:
         return None, jsonify({"error": "文件类型不允许"}), 400
@@ -174,33 +188,62 @@ def search_picture_route():
     if isinstance(results_path, dict) and "error" in results_path:
         return jsonify(results_path), 500
     
-    # 将找到的图片路径转换为base64返回
-    image_base64_list = []
-    # results_path 的结构是 [[path1, path2], ...]
-    if results_path and isinstance(results_path[0], list):
-        for image_path in results_path[0]: 
-            # 注意：这里的路径应该是可访问的绝对路径或相对路径
-            # 假设 search_service 返回的路径是需要拼接的
-            # full_image_path = os.path.join("/path/to/image/dataset", image_path) 
-            # 此处暂时假设返回的是可以直接访问的完整路径
-            image_base64 = utils.to_base64(image_path)
-            if image_base64:
-                image_type = "image/" + image_path.split('.')[-1]
-                data_url = f"data:{image_type};base64,{image_base64}"
-                image_base64_list.append(data_url)
-        
     results_event = []
     if results_mid and isinstance(results_mid[0], list):
-        for mid in results_mid[0]: 
-            #去es找事件
-            event = search_service.search_event_by_mid(mid, current_app.config)
-            results_event.append(event)
-    # print(results_event)
+        #去es批量找事件
+        results_event = search_service.search_events_by_mids(results_mid[0], current_app.config)
+        if isinstance(results_event, dict) and "error" in results_event:
+            return jsonify(results_event), 500
+
+    # 匹配到的图片只返回签名链接，由 /api/media/<token> 按需读取，不再内联base64
+    media = []
+    if results_path and isinstance(results_path[0], list):
+        media = media_service.describe_media(
+            results_path[0], current_app.config,
+            mids=results_mid[0] if results_mid and isinstance(results_mid[0], list) else None)
+
+    return jsonify({"search_results": results_event, "media": media})
+
+# 测试:curl -X POST "http://127.0.0.1:5000/api/search/picture/batch" -F "files=@a.jpg" -F "files=@b.jpg"
+@api.route('/search/picture/batch', methods=['POST'])
+def search_picture_batch_route():
+    files = request.files.getlist('files')
+    if not files:
+        return jsonify({"error": "请求中缺少 'files'"}), 400
+
+    max_files = current_app.config.get('PICTURE_BATCH_MAX_FILES', 500)
+    if len(files) > max_files:
+        return jsonify({"error": f"单次最多上传 {max_files} 张图片"}), 400
+
+    filepaths = []
+    for file in files:
+        filepath, error_response, status_code = _save_uploaded_file(file, utils.is_picture_file_allowed)
+        if error_response:
+            return error_response, status_code
+        filepaths.append(filepath)
+
+    start_time = time.time()
+    results = search_service.search_pictures_batch(filepaths, current_app.config)
+    if isinstance(results, dict) and "error" in results:
+        return jsonify(results), 500
+
+    #去es批量找事件，所有图片合并为一次请求
+    events_per_image = search_service.search_events_by_mid_groups(
+        [r["mids"] for r in results], current_app.config)
+    if isinstance(events_per_image, dict) and "error" in events_per_image:
+        return jsonify(events_per_image), 500
 
-    # return jsonify({"message": "图片上传成功", "image_base64_list": image_base64_list, "search_results": results_event})
-    # 展平列表
-    results_event = [item for sublist in results_event for item in sublist]
-    return jsonify({"search_results": results_event})
+    batch_results = []
+    for file, result, events in zip(files, results, events_per_image):
+        item = {"filename": file.filename, "search_results": events,
+                "media": media_service.describe_media(result["paths"], current_app.config, mids=result["mids"])}
+        if "error" in result:
+            item["error"] = result["error"]
+        batch_results.append(item)
+
+    duration = time.time() - start_time
+    current_app.logger.info(f"批量图片搜索 {len(files)} 张耗时: {duration:.2f}s")
+    return jsonify({"results": batch_results, "count": len(batch_results)})
 
 # 测试:curl -X POST "http://127.0.0.1:5001/api/search/video" -F "file=@/data/storage/8888/xyt/work/milvus_dataset/video/raw_video/douyin_raw_1.mp4" -F "topk=5"
 @api.route('/search/video', methods=['POST'])
@@ -210,7 +253,6 @@ def search_video_route():
         return error_response, status_code
         
     score = 0.8
-    print(score)
     # try:
     #     top_k = int(top_k_str)
     # except ValueError:
@@ -221,29 +263,77 @@ def search_video_route():
     if isinstance(results, dict) and "error" in results:
         return jsonify(results), 500
 
-    video_base64_list = []
+    results_event = []
     if results and isinstance(results, list):
-        for video_path in results:
-             # 假设 search_service 返回的路径是可以直接访问的完整路径
-            print(video_path)
-            video_base64 = utils.to_base64(video_path)
-            if video_base64:
-                video_type = "video/mp4"
-                data_url = f"data:{video_type};base64,{video_base64}"
-                video_base64_list.append(data_url)
+        mids = search_service.video_paths_to_mids(results)
+        #去es批量找事件
+        results_event = search_service.search_events_by_mids(mids, current_app.config)
+        if isinstance(results_event, dict) and "error" in results_event:
+            return jsonify(results_event), 500
 
-    results_event = []
+    media = []
     if results and isinstance(results, list):
-        for video_path in results:
-            mid = video_path.split("/")[-1].split(".")[0]
-            #去es找事件
-            event = search_service.search_event_by_mid(mid, current_app.config)
-            results_event.append(event)
+        media = media_service.describe_media(results, current_app.config, mids=mids)
+
+    return jsonify({"search_results": results_event, "media": media})
+
+# 异步视频搜索：提交任务后轮询状态和结果
+@api.route('/search/video/jobs', methods=['POST'])
+def submit_video_search_job_route():
+    filepath, error_response, status_code = _handle_file_upload('file', utils.is_video_file_allowed)
+    if error_response:
+        return error_response, status_code
+
+    score = 0.8
+    try:
+        job = search_service.submit_video_search_job(filepath, score, current_app.config)
+    except QueueFullError as e:
+        return jsonify({"error": str(e)}), 503
+
+    current_app.logger.info(f"视频搜索任务已提交: {job['id']}")
+    return jsonify({
+        "job_id": job['id'],
+        "status": job['status'],
+        "status_url": f"/api/search/video/jobs/{job['id']}",
+        "result_url": f"/api/search/video/jobs/{job['id']}/result"
+    }), 202
+
+@api.route('/search/video/jobs/<job_id>', methods=['GET'])
+def get_video_search_job_route(job_id):
+    job = search_service.get_video_search_job(job_id)
+    if job is None:
+        return jsonify({"error": f"任务不存在或已过期: {job_id}"}), 404
+
+    return jsonify({
+        "job_id": job['id'],
+        "status": job['status'],
+        "progress": job['progress'],
+        "created_at": job['created_at'],
+        "started_at": job['started_at'],
+        "finished_at": job['finished_at'],
+        "error": job['error']
+    })
+
+@api.route('/search/video/jobs/<job_id>/result', methods=['GET'])
+def get_video_search_job_result_route(job_id):
+    job = search_service.get_video_search_job(job_id)
+    if job is None:
+        return jsonify({"error": f"任务不存在或已过期: {job_id}"}), 404
+    if job['status'] == JOB_FAILED:
+        return jsonify({"job_id": job_id, "status": job['status'], "error": job['error']}), 500
+    if job['status'] != JOB_DONE:
+        return jsonify({"job_id": job_id, "status": job['status'], "progress": job['progress']}), 202
 
-    # return jsonify({"message": "视频上传成功", "video_base64_list": video_base64_list})
-        # 展平列表
-    results_event = [item for sublist in results_event for item in sublist]
-    return jsonify({"search_results": results_event})
+    return jsonify(search_service.video_search_job_result(job['result'], current_app.config))
+
+# 媒体文件访问：校验签名后流式返回，支持Range请求（视频拖动播放）
+@api.route('/media/<token>', methods=['GET'])
+def get_media_route(token):
+    try:
+        path = media_service.resolve_media_token(token, current_app.config)
+    except media_service.MediaAccessError as e:
+        return jsonify({"error": str(e)}), 403
+    return send_file(path, conditional=True, max_age=current_app.config.get('MEDIA_URL_TTL', 3600))
 
 # --- General File Upload API ---
 @api.route('/upload', methods=['POST'])
@@ -270,6 +360,47 @@ def upload_file():
         "url": file_url
     }), 200
 
+def _cursor_page_response(query, page_size, sort_by, sort_order):
+    try:
+        page = mongodb_service.search_events_by_cursor(
+            query, cursor=request.args.get('cursor') or None,
+            page_size=page_size, sort_by=sort_by, sort_order=sort_order)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    if isinstance(page, dict) and "error" in page:
+        return jsonify(page), 500
+
+    page["page_size"] = page_size
+    return jsonify(page)
+
+def _events_json_options():
+    """列表快速路径参数：fields为逗号分隔的返回字段，未指定时使用EVENT_LIST_FIELDS（None表示全部字段）"""
+    fields = [f.strip() for f in request.args.get('fields', '').split(',') if f.strip()]
+    return {
+        'as_json': current_app.config.get('EVENT_LIST_FAST_JSON', True),
+        'fields': fields or current_app.config.get('EVENT_LIST_FIELDS'),
+    }
+
+def _events_page_response(page_result, page, page_size):
+    total = page_result["total"]
+    payload = {
+        "results": page_result["results"],
+        "page": page,
+        "page_size": page_size,
+        "total": total,
+        "total_pages": (total + page_size - 1) // page_size,
+        "count_type": page_result["count_type"],
+        "total_display": page_result["total_display"]
+    }
+    if not isinstance(payload["results"], bytes):
+        return jsonify(payload)
+
+    # 快速路径：结果数组已是JSON，直接拼接，不再经过Flask重新序列化
+    results = payload.pop("results")
+    body = b'{"results":' + results + b',' + json.dumps(payload, ensure_ascii=False)[1:].encode('utf-8')
+    return Response(body, mimetype='application/json')
+
 # 北理工 风险事件库
 # 添加新的API路由来支持更多MongoDB功能
 @api.route('/getAllEvents', methods=['GET'])
@@ -294,24 +425,27 @@ def get_all_events():
         'region': region,
         'start_time': start_time,
         'end_time': end_time,
-        'keyword': keyword
+        'keyword': keyword,
+        'keyword_fields': request.args.get('keyword_fields', '')  # 关键词匹配字段：Event(默认)、content
     }
     
     # 调用mongodb_service中的函数获取查询条件
     query = mongodb_service.get_all_events_query(params)
+
+    # 游标分页：传入cursor或pagination=cursor时按 (Time, _id) 定位，深页与首页代价相同
+    if 'cursor' in request.args or request.args.get('pagination') == 'cursor':
+        return _cursor_page_response(query, page_size, sort_by, sort_order)
     
-    events, total = mongodb_service.search_events(query, page=page, page_size=page_size, sort_by=sort_by, sort_order=sort_order)
-    
-    if isinstance(events, dict) and "error" in events:
-        return jsonify(events), 500
-    
-    return jsonify({
-        "results": events,
-        "page": page,
-        "page_size": page_size,
-        "total": total,
-        "total_pages": (total + page_size - 1) // page_size
-    })
+    # 计数策略：exact/cached/capped/estimated，可通过count参数覆盖接口默认策略
+    count_strategy = request.args.get('count', current_app.config.get('COUNT_STRATEGY_ALL_EVENTS', 'cached'))
+    try:
+        page_result = mongodb_service.search_events_page(query, page=page, page_size=page_size, sort_by=sort_by,
+                                                         sort_order=sort_order, count_strategy=count_strategy,
+                                                         **_events_json_options())
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    return _events_page_response(page_result, page, page_size)
 
 @api.route('/getRiskEvents', methods=['GET'])
 def get_risk_events():
@@ -335,24 +469,27 @@ def get_risk_events():
         'region': region,
         'start_time': start_time,
         'end_time': end_time,
-        'keyword': keyword
+        'keyword': keyword,
+        'keyword_fields': request.args.get('keyword_fields', '')  # 关键词匹配字段：Event(默认)、content
     }
     
     # 调用mongodb_service中的函数获取查询条件
     query = mongodb_service.get_risk_events_query(params)
+
+    # 游标分页：传入cursor或pagination=cursor时按 (Time, _id) 定位，深页与首页代价相同
+    if 'cursor' in request.args or request.args.get('pagination') == 'cursor':
+        return _cursor_page_response(query, page_size, sort_by, sort_order)
     
-    events, total = mongodb_service.search_events(query, page=page, page_size=page_size, sort_by=sort_by, sort_order=sort_order)
-    
-    if isinstance(events, dict) and "error" in events:
-        return jsonify(events), 500
-    
-    return jsonify({
-        "results": events,
-        "page": page,
-        "page_size": page_size,
-        "total": total,
-        "total_pages": (total + page_size - 1) // page_size
-    })
+    # 计数策略：exact/cached/capped/estimated，可通过count参数覆盖接口默认策略
+    count_strategy = request.args.get('count', current_app.config.get('COUNT_STRATEGY_RISK_EVENTS', 'cached'))
+    try:
+        page_result = mongodb_service.search_events_page(query, page=page, page_size=page_size, sort_by=sort_by,
+                                                         sort_order=sort_order, count_strategy=count_strategy,
+                                                         **_events_json_options())
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    return _events_page_response(page_result, page, page_size)
 
 @api.route('/getDatabaseStats', methods=['GET'])
 def get_database_stats():
@@ -376,114 +513,74 @@ def export_events():
         end_time = request.args.get('end_time', '')
         is_risk = request.args.get('is_risk', '')
         platform = request.args.get('platform', '')
-        export_format = request.args.get('format', 'json')  # 导出格式：json 
-        
-        current_app.logger.info(f"接收到导出请求: keyword={keyword}, region={region}, start_time={start_time}, end_time={end_time}, is_risk={is_risk}, platform={platform}, format={export_format}")
-        
+        export_format = request.args.get('format', 'jsonl').lower()  # 导出格式：jsonl/csv/parquet
+        compression = request.args.get('compression', 'none').lower()  # 压缩方式：none/gzip/zstd
+        partitions = int(request.args.get('partitions', 1))  # 按时间范围分段并行读取
+        limit = int(request.args.get('limit', 0)) or current_app.config.get('EXPORT_MAX_ROWS')
+    except ValueError:
+        return jsonify({"error": "partitions 和 limit 参数必须是整数"}), 400
+
+    current_app.logger.info(f"接收到导出请求: keyword={keyword}, region={region}, start_time={start_time}, end_time={end_time}, is_risk={is_risk}, platform={platform}, format={export_format}, compression={compression}, partitions={partitions}")
+
+    params = {
+        'keyword': keyword,
+        'region': region,
+        'start_time': start_time,
+        'end_time': end_time,
+        'is_risk': is_risk,
+        'platform': platform,
+        'keyword_fields': request.args.get('keyword_fields', '')
+    }
+
+    if not mongodb_service._check_connection():
+        return jsonify({"error": "MongoDB未连接"}), 500
+
+    try:
         # 构建查询条件
-        query = {}
-        conditions = []
-        
-        if keyword:
-            conditions.append({"Event": {"$regex": keyword, "$options": "i"}})
-        
-        if region:
-            conditions.append({"region": region})
-        
-        # 处理时间范围查询，支持按年月筛选 (格式：YYYY-MM)
-        if start_time:
-            if len(start_time) == 7 and start_time[4] == '-':  # 检查是否是年月格式 (YYYY-MM)
-                # 年月格式，设置为当月第一天
-                conditions.append({"Time": {"$gte": f"{start_time}-01 00:00"}})
-            else:
-                conditions.append({"Time": {"$gte": start_time}})
-        
-        if end_time:
-            if len(end_time) == 7 and end_time[4] == '-':  # 检查是否是年月格式 (YYYY-MM)
-                # 年月格式，设置为当月最后一天
-                year, month = map(int, end_time.split('-'))
-                last_day = calendar.monthrange(year, month)[1]
-                conditions.append({"Time": {"$lte": f"{year}-{month:02d}-{last_day} 23:59"}})
-            else:
-                conditions.append({"Time": {"$lte": end_time}})
-        
-        if is_risk:
-            conditions.append({"isRisk": is_risk})
-        
-        if platform:
-            conditions.append({"platform": platform})
-        
-        # 组合查询条件
-        if len(conditions) > 0:
-            if len(conditions) > 1:
-                query = {"$and": conditions}
-            else:
-                query = conditions[0]
-        
+        query = mongodb_service.get_export_events_query(params)
         current_app.logger.info(f"构建的查询条件: {query}")
-        
-        # 尝试使用流式处理进行导出
-        try:
-            # 使用流式模式，获取游标而不是一次性加载所有数据
-            cursor, _ = mongodb_service.search_events(query, page=1, page_size=100000, is_export=True, streaming=True)
-            
-            # 如果使用了流式处理，返回生成器响应
-            def generate():
-                count = 0
-                for event in cursor:
-                    # 转换ObjectId为字符串
-                    event = mongodb_service._convert_objectid_to_string(event)
-                    count += 1
-                    # 生成JSON行
-                    yield json.dumps(event, ensure_ascii=False) + '\n'
-                # 添加总数信息到最后一行（可选）
-                # yield json.dumps({"total_records": count}, ensure_ascii=False) + '\n'
-            
-            # 创建流式响应
-            response = Response(generate(), content_type='application/jsonl')
-            response.headers['Content-Disposition'] = 'attachment; filename="events_export.jsonl"'
-            return response
-        except Exception as e:
-            current_app.logger.warning(f"流式导出失败，回退到常规导出: {str(e)}")
-            # 回退到常规导出方式
-            events, total = mongodb_service.search_events(query, page=1, page_size=100000, is_export=True)
-            
-            if isinstance(events, dict) and "error" in events:
-                return jsonify(events), 500
-            
-            # 根据导出格式返回不同的响应
-            if export_format.lower() == 'jsonl' or export_format.lower() == 'json':
-                # 生成JSONL格式的响应
-                jsonl_content = ''
-                for event in events:
-                    # 确保event是可JSON序列化的
-                    if isinstance(event, dict):
-                        jsonl_content += json.dumps(event, ensure_ascii=False) + '\n'
-                    else:
-                        # 如果event不是dict，尝试转换
-                        try:
-                            jsonl_content += json.dumps(dict(event), ensure_ascii=False) + '\n'
-                        except:
-                            # 忽略无法序列化的条目
-                            continue
-                
-                # 创建响应对象，设置适当的头部
-                response = make_response(jsonl_content)
-                response.headers['Content-Type'] = 'application/jsonl'
-                response.headers['Content-Disposition'] = 'attachment; filename="events_export.jsonl"'
-                response.headers['X-Total-Records'] = str(total)
-                return response
-            else:
-                # 默认返回JSON格式
-                return jsonify({
-                    "results": events,
-                    "total": total,
-                    "export_time": datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-                })
-        
+
+        # 分段导出时忽略limit，各分段并行读取
+        partition_queries = None
+        if partitions > 1 and not limit:
+            partition_queries = mongodb_service.get_export_partition_queries(params, partitions)
+
+        # 流式导出：按批读取游标、边序列化边压缩，内存占用与导出行数无关
+        stream = export_engine.export_events(
+            mongodb_service.mongo_collection_obj, query,
+            export_format=export_format,
+            compression=compression,
+            batch_size=current_app.config.get('EXPORT_BATCH_SIZE', 5000),
+            limit=limit,
+            partition_queries=partition_queries,
+            workers=current_app.config.get('EXPORT_PARTITION_WORKERS', 4)
+        )
+    except export_engine.ExportError as e:
+        return jsonify({"error": str(e)}), 400
     except Exception as e:
         current_app.logger.error(f"Export events error: {str(e)}")
-        return jsonify({"error": str(e)}), 500    
+        return jsonify({"error": str(e)}), 500
+
+    response = Response(stream, content_type=export_engine.export_content_type(export_format, compression))
+    response.headers['Content-Disposition'] = f'attachment; filename="{export_engine.export_filename(export_format, compression)}"'
+    return response
+
+@api.route('/getIndexReport', methods=['GET'])
+def get_index_report():
+    """
+    获取事件集合索引校验和查询计划(explain)报告，refresh=true时重新校验；
+    同时传create=true时在后台创建缺失的索引，稍后再次请求查看结果
+    """
+    if request.args.get('refresh', '').lower() == 'true':
+        if not mongodb_service._check_connection():
+            return jsonify({"error": "MongoDB未连接"}), 500
+        if request.args.get('create', '').lower() == 'true':
+            mongo_indexes.check_event_indexes_async(mongodb_service.mongo_collection_obj, create=True)
+            return jsonify(mongo_indexes.get_index_report()), 202
+        report = mongo_indexes.check_event_indexes(mongodb_service.mongo_collection_obj, create=False)
+    else:
+        report = mongo_indexes.get_index_report()
+    return jsonify(report)
 
 @api.route('/getDashboardMetrics', methods=['GET'])
 def get_dashboard_metrics():
@@ -491,8 +588,11 @@ def get_dashboard_metrics():
     获取仪表盘指标数据
     """
     try:
-        # 调用mongodb_service中的函数获取仪表盘指标
-        metrics = mongodb_service.get_dashboard_metrics()
+        # 默认读取预计算汇总，live=true时实时统计
+        if request.args.get('live', '').lower() == 'true':
+            metrics = mongodb_service.get_dashboard_metrics()
+        else:
+            metrics = dashboard_rollup.get_dashboard_metrics()
         
         if isinstance(metrics, dict) and "error" in metrics:
             # 如果MongoDB连接失败，返回错误信息
@@ -651,6 +751,40 @@ def get_all_fake_knowledge_handler():
             "data": generate_mock_fake_news()
         })
 
+@api.route('/fake-knowledge/list', methods=['GET'])
+def list_fake_knowledge_handler():
+    """
+    分页获取虚假信息摘要：目标ID排在最前，排序、字段投影和分页在Neo4j中完成
+    参数：page_size（默认20，最大200）、cursor（上一页返回的next_cursor）、fields（逗号分隔的返回字段）
+    """
+    try:
+        page_size = int(request.args.get('page_size', 20))
+    except ValueError:
+        return jsonify({"success": False, "error": "page_size 参数必须是整数"}), 400
+    cursor = request.args.get('cursor') or None
+    fields = [f.strip() for f in request.args.get('fields', '').split(',') if f.strip()] or None
+
+    if not neo4j_service:
+        return jsonify({
+            "success": False,
+            "error": "Neo4j服务未可用",
+            "data": generate_mock_fake_news()[:page_size],
+            "next_cursor": None,
+            "has_more": False
+        })
+
+    try:
+        service = neo4j_service.get_neo4j_service(current_app.config)
+        page = service.get_fake_info_page(pinned_ids=TARGET_INFO_IDS, fields=fields, page_size=page_size, cursor=cursor)
+    except ValueError as e:
+        return jsonify({"success": False, "error": str(e)}), 400
+    except Exception as e:
+        current_app.logger.error(f"分页获取虚假信息失败: {str(e)}")
+        return jsonify({"success": False, "error": str(e)}), 500
+
+    current_app.logger.info(f"分页获取虚假信息成功，本页 {len(page['data'])} 条")
+    return jsonify(dict(page, success=True))
+
 @api.route('/fake-knowledge/search', methods=['GET'])
 def search_fake_knowledge_handler():
     """处理搜索虚假信息的请求"""
@@ -679,23 +813,9 @@ def search_fake_knowledge_handler():
                 "data": []
             })
             
-        all_fake_info = service.get_all_fake_info()
-        
-        # 简单的关键词过滤
-        search_results = []
-        for info in all_fake_info:
-            # 在多个字段中搜索关键词
-            if (
-                (info.get('text') and keyword.lower() in info['text'].lower()) or
-                (info.get('title') and keyword.lower() in info['title'].lower()) or
-                (info.get('element_topic') and keyword.lower() in info['element_topic'].lower()) or
-                (info.get('info_class') and keyword.lower() in info['info_class'].lower())
-            ):
-                search_results.append(info)
-        
-        # 按influence_score属性从高到低排序搜索结果
-        # 使用lambda函数确保只对有influence_score属性的项进行排序，并将其转换为数字进行比较
-        search_results.sort(key=lambda x: float(x.get('influence_score', 0)), reverse=True)
+        # 优先从INFO内存快照检索，否则使用全文索引，排序和截断都在服务层完成
+        limit = min(max(request.args.get('limit', 50, type=int), 1), 500)
+        search_results = service.search_fake_info(keyword, limit=limit)
         
         current_app.logger.info(f"搜索虚假信息成功，关键词: {keyword}，找到 {len(search_results)} 条结果")
         return jsonify({
@@ -904,7 +1024,9 @@ def health_check_handler():
                 services_status["neo4j"] = "unhealthy"
             else:
                 stats = service.get_fake_knowledge_stats()
-                services_status["neo4j"] = "healthy" if stats else "unhealthy"
+                # 统计数据可能来自内存快照，快照最近一次刷新失败说明Neo4j不可达
+                snapshot_error = service.get_snapshot_state()['last_error']
+                services_status["neo4j"] = "healthy" if stats and not snapshot_error else "unhealthy"
         except:
             services_status["neo4j"] = "unhealthy"
     
@@ -935,7 +1057,8 @@ def index_handler():
         "version": "1.0.0",
         "apis": [
             "/api/fake-knowledge/all - 获取所有虚假信息",
-            "/api/fake-knowledge/search?keyword=关键词 - 搜索虚假信息",
+            "/api/fake-knowledge/list?page_size=20&cursor=游标 - 分页获取虚假信息摘要",
+            "/api/fake-knowledge/search?keyword=关键词&limit=50 - 搜索虚假信息",
             "/api/fake-knowledge/detail/<fake_id> - 获取虚假信息详情",
             "/api/fake-knowledge/stats - 获取虚假信息库统计数据",
             "/api/fake-knowledge/media/<fake_id> - 获取虚假信息多媒体资源",
@@ -946,7 +1069,12 @@ def index_handler():
             "/api/getOriginalTweetById - 根据ID获取原始推文",
             "/api/search/text - 文本搜索",
             "/api/search/picture - 图片搜索",
+            "/api/search/picture/batch - 批量图片搜索",
             "/api/search/video - 视频搜索",
+            "/api/search/video/jobs - 提交异步视频搜索任务",
+            "/api/search/video/jobs/<job_id> - 查询视频搜索任务进度",
+            "/api/search/video/jobs/<job_id>/result - 获取视频搜索任务结果",
+            "/api/media/<token> - 获取搜索结果中的媒体文件（签名链接）",
             "/api/upload - 文件上传",
             "/health - 健康检查"
         ]
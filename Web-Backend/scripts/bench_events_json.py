@@ -0,0 +1,89 @@
+# /unified_service/scripts/bench_events_json.py
+# 事件列表序列化基准测试：原路径（解码为dict + 逐字段转换ObjectId + json.dumps）
+# 与快速路径（服务端转换_id/去除影子字段 + bson.decode_all + orjson）的耗时对比。
+# 两条路径都要把每条文档完整解码为dict，快速路径只是省掉了逐字段转换并换用更快的序列化器；
+# decode_only 一列是解码本身的耗时，即快速路径无法省掉的部分。
+# 用法（在 Web-Backend 目录下执行）:
+#   python scripts/bench_events_json.py [--sizes 20 100 1000] [--repeat 30]
+
+import argparse
+import json
+import os
+import random
+import sys
+import time
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import bson
+from bson import ObjectId
+from services.mongodb_service import JSONEncoder, _convert_objectid_to_string, _raw_batches_to_json, orjson
+
+
+def _random_event(rng):
+    return {
+        '_id': ObjectId(), 'Event': '某地发生事件' * 3, 'content': '正文内容' * 60,
+        'Time': '2024-03-01 12:00', 'TimeDt': datetime(2024, 3, 1, 12), 'isRisk': 'true', 'isRiskBool': True,
+        'platform': '微博', 'region': '北京', 'User': f"user{rng.randrange(10 ** 6)}",
+        'UserID': str(rng.randrange(10 ** 9)), 'URL': f"https://weibo.com/{rng.randrange(10 ** 9)}",
+        'Praise': rng.randrange(1000), 'Reblog': rng.randrange(1000), 'Comment': rng.randrange(1000),
+        'Keywords': ['关键词1', '关键词2', '关键词3'], 'MediaURL': [f"https://media/{i}.jpg" for i in range(3)],
+        'Latitude': 39.9, 'Longitude': 116.4, 'language': 'zh',
+    }
+
+
+def _server_side(event):
+    """模拟快速路径聚合中的 $set _id转字符串 + $unset 影子字段"""
+    event = dict(event, _id=str(event['_id']))
+    event.pop('isRiskBool', None)
+    event.pop('TimeDt', None)
+    return event
+
+
+def _best_ms(fn, repeat):
+    best = None
+    for _ in range(repeat):
+        start_time = time.perf_counter()
+        fn()
+        elapsed = time.perf_counter() - start_time
+        best = elapsed if best is None else min(best, elapsed)
+    return round(best * 1000, 3)
+
+
+def benchmark(sizes=(20, 100, 1000), repeat=30, seed=0):
+    rng = random.Random(seed)
+    report = []
+    for n in sizes:
+        events = [_random_event(rng) for _ in range(n)]
+        raw_full = b''.join(bson.encode(e) for e in events)
+        raw_fast = b''.join(bson.encode(_server_side(e)) for e in events)
+
+        def original():
+            docs = bson.decode_all(raw_full)
+            for doc in docs:
+                doc.pop('isRiskBool', None)
+                doc.pop('TimeDt', None)
+                _convert_objectid_to_string(doc)
+            return json.dumps(docs, cls=JSONEncoder, ensure_ascii=False).encode('utf-8')
+
+        report.append({
+            'n': n,
+            'serializer': 'orjson' if orjson is not None else 'json',
+            'original_ms': _best_ms(original, repeat),
+            'decode_only_ms': _best_ms(lambda: bson.decode_all(raw_fast), repeat),
+            'fast_path_ms': _best_ms(lambda: _raw_batches_to_json([raw_fast]), repeat),
+        })
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="事件列表序列化基准测试")
+    parser.add_argument('--sizes', type=int, nargs='+', default=[20, 100, 1000])
+    parser.add_argument('--repeat', type=int, default=30)
+    args = parser.parse_args()
+    print(json.dumps(benchmark(sizes=args.sizes, repeat=args.repeat), ensure_ascii=False, indent=2))
+
+
+if __name__ == '__main__':
+    main()
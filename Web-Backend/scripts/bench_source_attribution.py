@@ -0,0 +1,108 @@
+# /unified_service/scripts/bench_source_attribution.py
+# 源头标记(isSource)基准测试：单次遍历实现 vs 原两次分组实现，并校验输出一致
+# 用法（在 Web-Backend 目录下执行）:
+#   python scripts/bench_source_attribution.py [--sizes 1000 10000 100000]
+
+import argparse
+import json
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.source_attribution import assign_is_source, _is_original
+
+
+def assign_is_source_two_pass(candidates):
+    """原先的两次分组实现，用于校验单次遍历实现的结果一致"""
+    for c in candidates:
+        c["isSource"] = 0 if _is_original(c) else -1
+
+    id_group = {}
+    for c in candidates:
+        id_group.setdefault(c.get("event"), []).append(c)
+    for group in id_group.values():
+        for item in sorted(group, key=lambda x: x["publishtime"]):
+            if item["isSource"] == 0:
+                item["isSource"] = 1
+                break
+
+    id_group = {}
+    for c in candidates:
+        id_group.setdefault(c.get("datasource"), []).append(c)
+    final_candidates = []
+    for group in id_group.values():
+        sorted_group = sorted(group, key=lambda x: x["publishtime"])
+        for item in sorted_group:
+            if item["isSource"] in (0, 1):
+                item["isSource"] = 1
+                break
+        for item in sorted_group:
+            if item["isSource"] == -1:
+                item["isSource"] = 0
+        final_candidates.extend(sorted_group)
+    return final_candidates
+
+
+def _random_candidates(n, n_events, rng):
+    datasources = ['weibo', 'twitter', 'douyin', 'news']
+    candidates = []
+    for i in range(n):
+        candidates.append({
+            "id": str(i),
+            "event": f"event_{rng.randrange(n_events)}",
+            "datasource": rng.choice(datasources),
+            "publishtime": f"2024-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d} {rng.randint(0, 23):02d}:00:00",
+            "istweet": rng.random() < 0.7,
+            "isretweet": rng.random() < 0.4,
+        })
+    return candidates
+
+
+def benchmark(sizes=(1000, 10000, 50000, 100000), n_events=None, repeat=3, seed=0):
+    """
+    用随机候选集对比单次遍历实现与原两次分组实现的耗时，并校验两者输出一致
+    n_events为None时事件数取候选数的1/20
+    """
+    rng = random.Random(seed)
+    report = []
+    for n in sizes:
+        candidates = _random_candidates(n, n_events or max(1, n // 20), rng)
+        timings = {}
+        outputs = {}
+        for label, fn in (('single_pass', assign_is_source), ('two_pass', assign_is_source_two_pass)):
+            best = None
+            for _ in range(repeat):
+                batch = [dict(c) for c in candidates]
+                start_time = time.perf_counter()
+                result = fn(batch)
+                elapsed = time.perf_counter() - start_time
+                best = elapsed if best is None else min(best, elapsed)
+            timings[label] = round(best * 1000, 3)
+            outputs[label] = [(c["id"], c["isSource"]) for c in result]
+        report.append({
+            'n': n,
+            'single_pass_ms': timings['single_pass'],
+            'two_pass_ms': timings['two_pass'],
+            'identical': outputs['single_pass'] == outputs['two_pass'],
+        })
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="源头标记基准测试")
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 10000, 50000, 100000])
+    parser.add_argument('--events', type=int, default=None, help="事件数，默认取候选数的1/20")
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    report = benchmark(sizes=args.sizes, n_events=args.events, repeat=args.repeat)
+    print(json.dumps(report, ensure_ascii=False, indent=2))
+    if not all(r['identical'] for r in report):
+        raise SystemExit("单次遍历实现与原实现结果不一致")
+
+
+if __name__ == '__main__':
+    main()
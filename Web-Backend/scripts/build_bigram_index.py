@@ -0,0 +1,55 @@
+# /unified_service/scripts/build_bigram_index.py
+# 构建/评估事件关键词二元组倒排索引（覆盖Event和content字段）
+# 索引构建后新写入的文档由查询层按正则补查；change stream模式下被修改的文档也会交给正则校验，
+# 轮询模式（单机MongoDB）下修改无法发现，需定期重建，例如每天执行一次：
+#   0 3 * * * cd /path/to/Web-Backend && python scripts/build_bigram_index.py build
+# 服务进程每 BIGRAM_RELOAD_INTERVAL 秒检查索引文件，重建后自动加载
+# 用法（在 Web-Backend 目录下执行）:
+#   从MongoDB构建: python scripts/build_bigram_index.py build [--output models/bigram/event_bigram_index.npz]
+#   本地性能评估: python scripts/build_bigram_index.py bench [--n 1000000]
+
+import argparse
+import json
+import logging
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config import Config
+from services.bigram_index import DEFAULT_FIELDS, benchmark, build_from_mongo
+
+
+def main():
+    parser = argparse.ArgumentParser(description="构建事件关键词二元组倒排索引")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    build_parser = subparsers.add_parser('build', help="从MongoDB事件集合构建索引")
+    build_parser.add_argument('--output', default=Config.BIGRAM_INDEX_PATH, help="索引文件输出路径")
+    build_parser.add_argument('--fields', default=','.join(DEFAULT_FIELDS), help="逗号分隔的索引字段")
+    build_parser.add_argument('--batch-size', type=int, default=5000)
+
+    bench_parser = subparsers.add_parser('bench', help="使用随机中文文本评估索引性能")
+    bench_parser.add_argument('--n', type=int, default=1000000)
+    bench_parser.add_argument('--queries', type=int, default=200)
+
+    args = parser.parse_args()
+    logging.basicConfig(level=Config.LOG_LEVEL, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+
+    if args.command == 'bench':
+        print(json.dumps(benchmark(n=args.n, n_queries=args.queries), ensure_ascii=False, indent=2))
+        return
+
+    import pymongo
+    if Config.MONGO_USER and Config.MONGO_PASSWORD:
+        connection_string = f"mongodb://{Config.MONGO_USER}:{Config.MONGO_PASSWORD}@{Config.MONGO_HOST}:{Config.MONGO_PORT}/"
+    else:
+        connection_string = f"mongodb://{Config.MONGO_HOST}:{Config.MONGO_PORT}/"
+    client = pymongo.MongoClient(connection_string)
+    collection = client[Config.MONGO_DBNAME][Config.MONGO_COLLECTION]
+    fields = [f.strip() for f in args.fields.split(',') if f.strip()]
+    build_from_mongo(collection, args.output, fields=fields, batch_size=args.batch_size)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,35 @@
+# /unified_service/scripts/build_ngram_model.py
+# 离线构建文本重排序使用的语料级 n-gram IDF 模型
+# 用法（在 Web-Backend 目录下执行）: python scripts/build_ngram_model.py [--n 3] [--output models/ngram]
+
+import argparse
+import logging
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from elasticsearch import Elasticsearch
+from config import Config
+from services.ngram_model import DEFAULT_N_FEATURES, build_from_es
+
+
+def main():
+    parser = argparse.ArgumentParser(description="从ES索引离线构建n-gram重排序模型")
+    parser.add_argument('--n', type=int, default=3, help="字符n-gram长度，需与search_text的ngram_n一致")
+    parser.add_argument('--n-features', type=int, default=DEFAULT_N_FEATURES, help="哈希特征空间大小")
+    parser.add_argument('--index', default=Config.ES_INDEX, help="ES索引名")
+    parser.add_argument('--output', default=Config.NGRAM_MODEL_DIR, help="模型输出目录")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=Config.LOG_LEVEL, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+
+    es_client = Elasticsearch(hosts=Config.ES_HOSTS, basic_auth=Config.ES_AUTH)
+    if not es_client.ping():
+        raise ConnectionError("连接Elasticsearch失败")
+
+    build_from_es(es_client, args.index, args.output, n=args.n, n_features=args.n_features)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,119 @@
+# /unified_service/scripts/build_phash_index.py
+# 构建/评估本地pHash汉明空间索引
+# 用法（在 Web-Backend 目录下执行）:
+#   从Milvus导出:   python scripts/build_phash_index.py milvus [--vector-field vector]
+#   从图片目录构建: python scripts/build_phash_index.py dir /data/data/web/picture
+#   本地性能评估:   python scripts/build_phash_index.py bench [--n 1000000] [--max-distance 90]
+
+import argparse
+import json
+import logging
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+from config import Config
+from services.phash_index import PhashIndex, benchmark
+
+
+def _signature_bytes(value):
+    """Milvus返回的二值向量可能是bytes或单元素列表"""
+    if isinstance(value, (list, tuple)):
+        value = value[0]
+    return bytes(value)
+
+
+def build_from_milvus(args):
+    from pymilvus import connections, Collection
+
+    connections.connect(uri=Config.MILVUS_URI, token=Config.MILVUS_TOKEN)
+    collection = Collection(args.collection)
+    collection.load()
+
+    signatures, mids, paths = [], [], []
+    iterator = collection.query_iterator(
+        batch_size=args.batch_size,
+        expr=args.expr,
+        output_fields=[args.vector_field, "mid", "data_path"]
+    )
+    while True:
+        batch = iterator.next()
+        if not batch:
+            iterator.close()
+            break
+        for row in batch:
+            signatures.append(np.frombuffer(_signature_bytes(row[args.vector_field]), dtype=np.uint8))
+            mids.append(str(row["mid"]))
+            paths.append(str(row["data_path"]))
+        logging.info(f"已从Milvus读取 {len(signatures)} 条签名")
+
+    return signatures, mids, paths
+
+
+def build_from_dir(args):
+    # 复用线上的签名计算逻辑，保证与查询时一致
+    from services.search_service import _calculate_phash_signature
+
+    signatures, mids, paths = [], [], []
+    for root, _, files in os.walk(args.image_dir):
+        for filename in sorted(files):
+            if filename.rsplit('.', 1)[-1].lower() not in Config.PICTURE_ALLOWED_EXTENSIONS:
+                continue
+            path = os.path.join(root, filename)
+            try:
+                signature = _calculate_phash_signature(path)
+            except Exception as e:
+                logging.warning(f"计算pHash失败，跳过 {path}: {e}")
+                continue
+            signatures.append(np.frombuffer(signature, dtype=np.uint8))
+            # 图片文件名形如 <mid>_<序号>.jpg
+            mids.append(os.path.splitext(filename)[0].split('_')[0])
+            paths.append(path)
+    return signatures, mids, paths
+
+
+def main():
+    parser = argparse.ArgumentParser(description="构建本地pHash汉明空间索引")
+    parser.add_argument('--output', default=Config.PHASH_INDEX_PATH, help="索引文件输出路径")
+    subparsers = parser.add_subparsers(dest='source', required=True)
+
+    milvus_parser = subparsers.add_parser('milvus', help="从Milvus集合导出签名")
+    milvus_parser.add_argument('--collection', default=Config.MILVUS_IMAGE_COLLECTION)
+    milvus_parser.add_argument('--vector-field', default='vector', help="二值向量字段名")
+    milvus_parser.add_argument('--expr', default='', help="过滤表达式，可用于只导出热数据分段")
+    milvus_parser.add_argument('--batch-size', type=int, default=1000)
+
+    dir_parser = subparsers.add_parser('dir', help="从图片目录计算签名")
+    dir_parser.add_argument('image_dir')
+
+    bench_parser = subparsers.add_parser('bench', help="使用随机签名评估索引性能")
+    bench_parser.add_argument('--n', type=int, default=1000000)
+    bench_parser.add_argument('--queries', type=int, default=200)
+    bench_parser.add_argument('--max-distance', type=int, default=Config.PHASH_MAX_DISTANCE,
+                              help="线上命中阈值（默认取PHASH_MAX_DISTANCE），报告中的threshold一项按该阈值查询")
+
+    args = parser.parse_args()
+    logging.basicConfig(level=Config.LOG_LEVEL, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+
+    if args.source == 'bench':
+        report = benchmark(n=args.n, n_queries=args.queries, max_distance=args.max_distance)
+        print(json.dumps(report, ensure_ascii=False, indent=2))
+        return
+
+    if args.source == 'milvus':
+        signatures, mids, paths = build_from_milvus(args)
+    else:
+        signatures, mids, paths = build_from_dir(args)
+
+    if not signatures:
+        raise SystemExit("没有可写入索引的签名")
+
+    index = PhashIndex(np.vstack(signatures), mids, paths)
+    index.save(args.output)
+    logging.info(f"本地pHash索引构建完成: {len(index)} 条签名, 保存至 {args.output}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,47 @@
+# /unified_service/scripts/build_thumbnails.py
+# 为搜索结果中的图片/视频预生成缩略图，搜索接口只在缩略图存在时返回thumbnailUrl
+# 用法（在 Web-Backend 目录下执行）:
+#   python scripts/build_thumbnails.py /data/data/web/picture /data/data/web/video [--overwrite]
+
+import argparse
+import logging
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config import Config
+from services.media_service import generate_thumbnail
+
+
+def main():
+    parser = argparse.ArgumentParser(description="预生成媒体缩略图")
+    parser.add_argument('media_dirs', nargs='+', help="图片/视频目录")
+    parser.add_argument('--size', type=int, default=320, help="缩略图最长边像素")
+    parser.add_argument('--overwrite', action='store_true', help="重新生成已存在的缩略图")
+    args = parser.parse_args()
+    logging.basicConfig(level=Config.LOG_LEVEL, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+
+    app_config = {key: getattr(Config, key) for key in dir(Config) if not key.startswith('_')}
+    extensions = Config.PICTURE_ALLOWED_EXTENSIONS | Config.VIDEO_ALLOWED_EXTENSIONS
+
+    created, failed = 0, 0
+    for media_dir in args.media_dirs:
+        for root, _, files in os.walk(media_dir):
+            for filename in sorted(files):
+                if filename.rsplit('.', 1)[-1].lower() not in extensions:
+                    continue
+                path = os.path.join(root, filename)
+                try:
+                    if generate_thumbnail(path, app_config, size=(args.size, args.size), overwrite=args.overwrite):
+                        created += 1
+                    else:
+                        failed += 1
+                except Exception as e:
+                    logging.warning(f"生成缩略图失败，跳过 {path}: {e}")
+                    failed += 1
+    logging.info(f"缩略图生成完成: 成功 {created} 个, 失败 {failed} 个, 目录 {Config.MEDIA_THUMBNAIL_DIR}")
+
+
+if __name__ == '__main__':
+    main()
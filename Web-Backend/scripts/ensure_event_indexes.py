@@ -0,0 +1,40 @@
+# /unified_service/scripts/ensure_event_indexes.py
+# 校验事件集合索引（services/mongo_indexes.py 中声明的 EVENT_INDEXES），按需创建缺失的索引
+# 服务启动时默认只记录缺失的索引（MONGO_CREATE_MISSING_INDEXES=False），部署或迁移后执行本脚本一次性创建
+# 用法（在 Web-Backend 目录下执行）:
+#   只查看缺失的索引: python scripts/ensure_event_indexes.py
+#   创建缺失的索引:   python scripts/ensure_event_indexes.py --create [--explain]
+
+import argparse
+import json
+import logging
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pymongo
+from config import Config
+from services import mongo_indexes
+
+
+def main():
+    parser = argparse.ArgumentParser(description="校验/创建事件集合索引")
+    parser.add_argument('--create', action='store_true', help="创建缺失的索引")
+    parser.add_argument('--explain', action='store_true', help="校验后explain各查询形态")
+    args = parser.parse_args()
+    logging.basicConfig(level=Config.LOG_LEVEL, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+
+    if Config.MONGO_USER and Config.MONGO_PASSWORD:
+        connection_string = f"mongodb://{Config.MONGO_USER}:{Config.MONGO_PASSWORD}@{Config.MONGO_HOST}:{Config.MONGO_PORT}/"
+    else:
+        connection_string = f"mongodb://{Config.MONGO_HOST}:{Config.MONGO_PORT}/"
+    client = pymongo.MongoClient(connection_string)
+    collection = client[Config.MONGO_DBNAME][Config.MONGO_COLLECTION]
+
+    report = mongo_indexes.check_event_indexes(collection, create=args.create, explain=args.explain)
+    print(json.dumps(report, ensure_ascii=False, indent=2, default=str))
+
+
+if __name__ == '__main__':
+    main()
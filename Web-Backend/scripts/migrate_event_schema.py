@@ -0,0 +1,48 @@
+# /unified_service/scripts/migrate_event_schema.py
+# 为事件集合写入规范化影子字段：isRiskBool(布尔) 和 TimeDt(datetime)
+# 可随时中断，再次执行从断点继续；迁移完成后查询自动改用影子字段（MONGO_NORMALIZED_FIELDS='auto'）
+# 用法（在 Web-Backend 目录下执行）:
+#   执行/继续迁移: python scripts/migrate_event_schema.py [--batch-size 1000] [--limit N]
+#   从头重新迁移: python scripts/migrate_event_schema.py --restart
+#   查看迁移状态: python scripts/migrate_event_schema.py --status
+
+import argparse
+import logging
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pymongo
+from bson import json_util
+from config import Config
+from services.schema_migration import migrate_events, get_migration_state
+
+
+def main():
+    parser = argparse.ArgumentParser(description="事件集合isRisk/Time规范化迁移")
+    parser.add_argument('--batch-size', type=int, default=1000, help="每次bulk_write的文档数")
+    parser.add_argument('--limit', type=int, default=None, help="本次最多处理的文档数")
+    parser.add_argument('--restart', action='store_true', help="忽略断点，从头开始")
+    parser.add_argument('--status', action='store_true', help="只查看迁移状态")
+    args = parser.parse_args()
+    logging.basicConfig(level=Config.LOG_LEVEL, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+
+    if Config.MONGO_USER and Config.MONGO_PASSWORD:
+        connection_string = f"mongodb://{Config.MONGO_USER}:{Config.MONGO_PASSWORD}@{Config.MONGO_HOST}:{Config.MONGO_PORT}/"
+    else:
+        connection_string = f"mongodb://{Config.MONGO_HOST}:{Config.MONGO_PORT}/"
+    client = pymongo.MongoClient(connection_string)
+    db = client[Config.MONGO_DBNAME]
+
+    if args.status:
+        print(json_util.dumps(get_migration_state(db), ensure_ascii=False, indent=2))
+        return
+
+    state = migrate_events(db[Config.MONGO_COLLECTION], db, batch_size=args.batch_size,
+                           restart=args.restart, limit=args.limit)
+    print(json_util.dumps(state, ensure_ascii=False, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,230 @@
+# /unified_service/services/bigram_index.py
+
+import logging
+import os
+import time
+import numpy as np
+from bson import ObjectId
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_FIELDS = ('Event', 'content')
+
+# 词项键（uint64）：字段序号 << 42 | 二元组(首字符码点 << 21 | 次字符码点) 或单字码点
+# Unicode码点小于2^21，二元组首字符非0，因此单字键与二元组键不会冲突
+_CP_BITS = 21
+_FIELD_SHIFT = 2 * _CP_BITS
+
+
+def _codepoints(text):
+    return np.frombuffer(text.lower().encode('utf-32-le'), dtype='<u4').astype(np.uint64)
+
+
+def gram_keys(text, field_no=0, unigrams=True):
+    """计算文本的词项键集合（去重、升序），unigrams为True时同时包含单字键"""
+    if not text:
+        return np.zeros(0, dtype=np.uint64)
+    cps = _codepoints(text)
+    keys = (cps[:-1] << np.uint64(_CP_BITS)) | cps[1:]
+    if unigrams:
+        keys = np.concatenate([keys, cps])
+    return np.unique(keys | np.uint64(field_no << _FIELD_SHIFT))
+
+
+def _query_keys(keyword, field_no):
+    """关键词只有一个字时查单字倒排，否则查所有二元组倒排（各二元组倒排的交集是子串匹配的超集）"""
+    cps = _codepoints(keyword)
+    if len(cps) == 1:
+        keys = cps
+    else:
+        keys = np.unique((cps[:-1] << np.uint64(_CP_BITS)) | cps[1:])
+    return keys | np.uint64(field_no << _FIELD_SHIFT)
+
+
+class BigramIndex:
+    """
+    事件文本的字符二元组倒排索引（CSR形式：有序词项键 + 偏移 + 文档序号倒排）
+    文档序号按 _id 升序分配，每条倒排天然有序，求交集时无需再排序。
+    索引只覆盖构建时 _id 不大于max_id的文档，之后写入的文档由调用方按原条件补查。
+    """
+
+    def __init__(self, keys, offsets, postings, ids, fields, built_at=None):
+        if len(offsets) != len(keys) + 1:
+            raise ValueError(f"倒排偏移长度 {len(offsets)} 与词项数 {len(keys)} 不一致")
+        self.keys = np.asarray(keys, dtype=np.uint64)
+        self.offsets = np.asarray(offsets, dtype=np.int64)
+        self.postings = np.asarray(postings, dtype=np.int32)
+        self.ids = np.ascontiguousarray(ids, dtype=np.uint8).reshape(-1, 12)
+        self.fields = [str(f) for f in fields]
+        self.max_id = ObjectId(self.ids[-1].tobytes()) if len(self.ids) else None
+        # 开始读取数据的时间，此后的修改可能未反映在索引中
+        self.built_at = built_at
+
+    def __len__(self):
+        return len(self.ids)
+
+    def _posting(self, key):
+        i = int(np.searchsorted(self.keys, key))
+        if i < len(self.keys) and self.keys[i] == key:
+            return self.postings[self.offsets[i]:self.offsets[i + 1]]
+        return self.postings[:0]
+
+    def _field_candidates(self, keyword, field_no, max_candidates):
+        postings = sorted((self._posting(key) for key in _query_keys(keyword, field_no)), key=len)
+        # 从最短的倒排开始求交集，最短倒排已超过上限时说明关键词过于常见
+        if len(postings[0]) > max_candidates * 4:
+            return None
+        result = postings[0]
+        for posting in postings[1:]:
+            if not len(result):
+                break
+            result = np.intersect1d(result, posting, assume_unique=True)
+        return result
+
+    def candidates(self, keyword, fields=None, max_candidates=10000):
+        """
+        返回可能包含关键词的文档 _id 列表（子串匹配的超集，调用方需用原条件校验）
+        候选数超过max_candidates时返回None，表示关键词过于常见，应直接按原条件查询
+        """
+        if not keyword or not len(self):
+            return []
+        found = []
+        for field in fields or self.fields:
+            if field not in self.fields:
+                return None
+            ordinals = self._field_candidates(keyword, self.fields.index(field), max_candidates)
+            if ordinals is None:
+                return None
+            found.append(ordinals)
+        ordinals = found[0] if len(found) == 1 else np.union1d(found[0], np.concatenate(found[1:]))
+        if len(ordinals) > max_candidates:
+            return None
+        return [ObjectId(raw.tobytes()) for raw in self.ids[ordinals]]
+
+    def affected_by(self, change):
+        """
+        event_watcher变更是否可能使该文档的索引文本过期：
+        只有索引范围内文档的replace，或修改/删除了被索引字段的update才算；
+        update缺少字段信息（轮询模式）时按可能影响处理
+        """
+        if change['op'] not in ('update', 'replace') or not isinstance(change['id'], ObjectId):
+            return False
+        if self.max_id is None or change['id'] > self.max_id:
+            return False
+        if change['op'] == 'replace':
+            return True
+        updated = change.get('updated_fields')
+        removed = change.get('removed_fields')
+        if updated is None and removed is None:
+            return True
+        # 'content.text' 这类点号路径按顶层字段判断
+        return any(path.split('.', 1)[0] in self.fields for path in (updated or []) + (removed or []))
+
+    def save(self, path):
+        """保存为未压缩的npz，加载时无需解压；先写临时文件再替换，服务进程不会读到写了一半的索引"""
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.tmp.npz"
+        np.savez(tmp_path, keys=self.keys, offsets=self.offsets, postings=self.postings,
+                 ids=self.ids, fields=np.array(self.fields),
+                 built_at=np.array(self.built_at if self.built_at is not None else np.nan))
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path, allow_pickle=False) as data:
+            built_at = float(data['built_at']) if 'built_at' in data.files else float('nan')
+            return cls(data['keys'], data['offsets'], data['postings'], data['ids'], data['fields'],
+                       built_at=None if np.isnan(built_at) else built_at)
+
+    @classmethod
+    def build(cls, docs, fields=DEFAULT_FIELDS, chunk_size=100000):
+        """
+        从按 _id 升序的文档流构建索引
+        每chunk_size条文档合并一次（键, 序号）对，控制构建时的临时内存
+        """
+        fields = list(fields)
+        ids = []
+        chunk_keys, chunk_docs = [], []
+        merged_keys, merged_docs = [], []
+
+        def _flush():
+            if chunk_keys:
+                merged_keys.append(np.concatenate(chunk_keys))
+                merged_docs.append(np.concatenate(chunk_docs))
+                chunk_keys.clear()
+                chunk_docs.clear()
+
+        for doc in docs:
+            ordinal = len(ids)
+            ids.append(np.frombuffer(doc['_id'].binary, dtype=np.uint8))
+            for field_no, field in enumerate(fields):
+                value = doc.get(field)
+                keys = gram_keys(value if isinstance(value, str) else '', field_no)
+                if len(keys):
+                    chunk_keys.append(keys)
+                    chunk_docs.append(np.full(len(keys), ordinal, dtype=np.int32))
+            if (ordinal + 1) % chunk_size == 0:
+                _flush()
+                logger.info(f"二元组索引构建进度: 已处理 {ordinal + 1} 条文档")
+        _flush()
+
+        if merged_keys:
+            all_keys = np.concatenate(merged_keys)
+            all_docs = np.concatenate(merged_docs)
+            # 稳定排序：同一词项内文档序号保持升序
+            order = np.argsort(all_keys, kind='stable')
+            all_keys, postings = all_keys[order], all_docs[order]
+            keys, starts = np.unique(all_keys, return_index=True)
+            offsets = np.append(starts, len(postings)).astype(np.int64)
+        else:
+            keys, offsets, postings = np.zeros(0, dtype=np.uint64), np.zeros(1, dtype=np.int64), np.zeros(0, dtype=np.int32)
+        ids = np.vstack(ids) if ids else np.zeros((0, 12), dtype=np.uint8)
+        return cls(keys, offsets, postings, ids, fields)
+
+
+def build_from_mongo(collection, output_path, fields=DEFAULT_FIELDS, batch_size=5000):
+    """按 _id 升序读取事件集合构建二元组索引并保存"""
+    start_time = time.time()
+    cursor = collection.find({}, {f: 1 for f in fields}).sort('_id', 1).batch_size(batch_size)
+    index = BigramIndex.build(cursor, fields=fields)
+    index.built_at = start_time
+    index.save(output_path)
+    logger.info(f"二元组索引构建完成: {len(index)} 条文档, {len(index.keys)} 个词项, "
+                f"{len(index.postings)} 条倒排, 耗时 {time.time() - start_time:.2f}s, 保存至 {output_path}")
+    return index
+
+
+def benchmark(n=1000000, doc_len=30, n_queries=200, seed=0):
+    """用随机中文文本评估构建和查询耗时，可在没有MongoDB的环境中运行"""
+    rng = np.random.default_rng(seed)
+    # 常用汉字区间内取3000个字，近似真实文本的字频分布
+    alphabet = np.array([chr(c) for c in range(0x4E00, 0x4E00 + 3000)])
+    weights = 1.0 / np.arange(1, len(alphabet) + 1)
+    weights /= weights.sum()
+    texts = [''.join(rng.choice(alphabet, size=doc_len, p=weights)) for _ in range(n)]
+    docs = ({'_id': ObjectId(), 'Event': text} for text in texts)
+
+    start_time = time.time()
+    index = BigramIndex.build(docs, fields=('Event',))
+    build_time = time.time() - start_time
+
+    report = {'n': n, 'terms': len(index.keys), 'postings': len(index.postings), 'build_seconds': round(build_time, 3)}
+    for length in (2, 4):
+        targets = rng.integers(0, n, size=n_queries)
+        start_time = time.time()
+        hits, fallback = 0, 0
+        for target in targets:
+            offset = rng.integers(0, doc_len - length)
+            keyword = texts[target][offset:offset + length]
+            result = index.candidates(keyword)
+            if result is None:
+                fallback += 1
+            else:
+                hits += len(result)
+        elapsed = time.time() - start_time
+        report[f'keyword_len_{length}'] = {
+            'avg_query_ms': round(elapsed / n_queries * 1000, 3),
+            'avg_candidates': round(hits / max(n_queries - fallback, 1), 1),
+            'fallback_ratio': round(fallback / n_queries, 4),
+        }
+    return report
@@ -0,0 +1,384 @@
+# /unified_service/services/dashboard_rollup.py
+
+import logging
+import threading
+import time
+from datetime import datetime
+from pymongo.errors import DuplicateKeyError
+from services import mongodb_service
+from services import event_watcher
+
+logger = logging.getLogger(__name__)
+
+# 仪表盘汇总文档保存在独立的小集合中。
+# change stream模式下新增/修改/删除都由变更流按resume token条件更新（不同客户端生成的ObjectId不单调，
+# _id 水位线会漏掉 _id 小于水位线的新文档）；轮询模式只能按 _id 水位线增量刷新，漏计的文档由定期全量重建修正
+ROLLUP_ID = 'event_dashboard'
+DEFAULT_FIELDS = ["Event", "Content", "Time", "URL", "User", "UserID", "platform", "region", "Language", "isRisk",
+                  "Praise", "Reblog", "Comment", "MediaURL", "Latitude", "Longitude", "Keywords"]
+
+_rollup_config = {
+    'collection': 'dashboard_rollup',
+    'batch_size': 200000,
+    'refresh_interval': 60,
+    'full_rebuild_interval': 24 * 3600,
+    'stale_rebuild_interval': 3600,
+}
+_refresh_lock = threading.Lock()
+_refresher_thread = None
+# 监听到新增文档时唤醒后台刷新；监听到无法增量处理的修改/删除时标记stale，按stale_rebuild_interval提前全量重建
+_refresh_requested = threading.Event()
+# caught_up: 本进程已完成一次追赶刷新，之后的新增文档由变更流直接计入汇总
+_rollup_state = {'stale': False, 'caught_up': False}
+# 两次刷新之间的最小间隔(秒)，持续写入时避免连续刷新
+_MIN_REFRESH_GAP = 1
+
+
+def init_dashboard_rollup(app_config):
+    """读取配置并启动后台刷新线程；多个worker进程同时刷新时由水位线条件更新保证不重复累计"""
+    global _refresher_thread
+    _rollup_config['collection'] = app_config.get('DASHBOARD_ROLLUP_COLLECTION', 'dashboard_rollup')
+    _rollup_config['batch_size'] = app_config.get('DASHBOARD_ROLLUP_BATCH_SIZE', 200000)
+    _rollup_config['refresh_interval'] = app_config.get('DASHBOARD_ROLLUP_REFRESH_INTERVAL', 60)
+    _rollup_config['full_rebuild_interval'] = app_config.get('DASHBOARD_ROLLUP_FULL_REBUILD_INTERVAL', 24 * 3600)
+    _rollup_config['stale_rebuild_interval'] = app_config.get('DASHBOARD_ROLLUP_STALE_REBUILD_INTERVAL', 3600)
+    event_watcher.register_listener('dashboard_rollup', apply_change)
+
+    if not _rollup_config['refresh_interval'] or _refresher_thread is not None:
+        return
+    _refresher_thread = threading.Thread(target=_refresh_loop, name='dashboard-rollup', daemon=True)
+    _refresher_thread.start()
+    logger.info(f"仪表盘汇总后台刷新已启动: 间隔 {_rollup_config['refresh_interval']}s")
+
+
+def _refresh_loop():
+    last_full = time.time()
+    while True:
+        try:
+            since_full = time.time() - last_full
+            full = (bool(_rollup_config['full_rebuild_interval']) and since_full >= _rollup_config['full_rebuild_interval']) or \
+                (_rollup_state['stale'] and since_full >= _rollup_config['stale_rebuild_interval'])
+            refresh_dashboard_rollup(full=full)
+            if full:
+                last_full = time.time()
+        except Exception as e:
+            logger.warning(f"刷新仪表盘汇总失败: {e}")
+        time.sleep(_MIN_REFRESH_GAP)
+        # 有新增文档时提前刷新，否则按refresh_interval定期刷新
+        _refresh_requested.wait(max(_rollup_config['refresh_interval'] - _MIN_REFRESH_GAP, 0))
+        _refresh_requested.clear()
+
+
+def _summary_collection():
+    return mongodb_service.mongo_db[_rollup_config['collection']]
+
+
+def _empty_summary():
+    return {
+        '_id': ROLLUP_ID,
+        'watermark': None,
+        'count': 0,
+        'risk_count': 0,
+        'platform_counts': [],
+        'language_counts': [],
+        'total_data_num': 0,
+        'total_praise': 0,
+        'total_reblog': 0,
+        'total_comment': 0,
+        'fields': None,
+        'last_change': None,
+        'updated_at': None,
+    }
+
+
+def _aggregate_batch(watermark, batch_size):
+    """汇总水位线之后的一批文档，单次聚合同时得到计数、风险数、平台/语言分布和互动总量"""
+    match = {'_id': {'$gt': watermark}} if watermark is not None else {}
+    pipeline = [
+        {'$match': match},
+        {'$sort': {'_id': 1}},
+        {'$limit': batch_size},
+        {'$facet': {
+            'platforms': [
+                {'$match': {'platform': {'$nin': [None, '']}}},
+                {'$group': {'_id': '$platform', 'count': {'$sum': 1}}},
+            ],
+            'languages': [
+                {'$match': {'language': {'$nin': [None, '']}}},
+                {'$group': {'_id': '$language', 'count': {'$sum': 1}}},
+            ],
+            'totals': [
+                {'$group': {
+                    '_id': None,
+                    'count': {'$sum': 1},
+                    'risk_count': {'$sum': {'$cond': [{'$in': ['$isRisk', ['true', True]]}, 1, 0]}},
+                    'total_data_num': {'$sum': {'$ifNull': ['$data_num', 0]}},
+                    'total_praise': {'$sum': {'$ifNull': ['$Praise', 0]}},
+                    'total_reblog': {'$sum': {'$ifNull': ['$Reblog', 0]}},
+                    'total_comment': {'$sum': {'$ifNull': ['$Comment', 0]}},
+                    'max_id': {'$max': '$_id'},
+                }},
+            ],
+        }},
+    ]
+    result = list(mongodb_service.mongo_collection_obj.aggregate(pipeline, allowDiskUse=True))
+    return result[0] if result else {'platforms': [], 'languages': [], 'totals': []}
+
+
+def _merge_counts(pairs, groups):
+    """分布以 [名称, 计数] 列表保存，避免名称中的 . 或 $ 不能作为字段名"""
+    counts = dict((name, count) for name, count in pairs)
+    for group in groups:
+        counts[group['_id']] = counts.get(group['_id'], 0) + group['count']
+    return [[name, count] for name, count in counts.items()]
+
+
+def _accumulate(summary, batch):
+    """把一批聚合结果累加到汇总文档，返回本批处理的文档数"""
+    if not batch['totals']:
+        return 0
+    totals = batch['totals'][0]
+    for key in ('count', 'risk_count', 'total_data_num', 'total_praise', 'total_reblog', 'total_comment'):
+        summary[key] += totals[key]
+    summary['platform_counts'] = _merge_counts(summary['platform_counts'], batch['platforms'])
+    summary['language_counts'] = _merge_counts(summary['language_counts'], batch['languages'])
+    summary['watermark'] = totals['max_id']
+    return totals['count']
+
+
+def _max_token(a, b):
+    """resume token(_data字符串)按变更顺序递增，取较新的一个"""
+    if a is None or b is None:
+        return a if b is None else b
+    return max(a, b)
+
+
+def _stream_inserts():
+    """新增文档是否由变更流计入汇总；否则按 _id 水位线增量刷新"""
+    return _rollup_state['caught_up'] and event_watcher.get_watch_state()['mode'] != event_watcher.MODE_POLLING
+
+
+def refresh_dashboard_rollup(full=False):
+    """
+    增量刷新：汇总 _id 大于水位线的文档；full=True 时从头重建。
+    change stream模式下增量刷新只在本进程启动后执行一次（追赶未监听期间的新增），之后由apply_change计入；
+    刷新开始前本进程已分发的变更记入last_change，不会再被apply_change重复应用。
+    聚合读取期间写入的文档可能被重复或遗漏计入，由下一次全量重建修正
+    """
+    with _refresh_lock:
+        start_time = time.time()
+        collection = _summary_collection()
+        current = collection.find_one({'_id': ROLLUP_ID})
+        if not full and current is not None and _stream_inserts():
+            return current
+        seen_token = event_watcher.last_token() if event_watcher.invalidation_reliable() else None
+        stored = None if full else current
+        summary = dict(stored) if stored else _empty_summary()
+        old_watermark = stored['watermark'] if stored else None
+        old_change = stored.get('last_change') if stored else None
+
+        processed = 0
+        batch_size = _rollup_config['batch_size']
+        while True:
+            n = _accumulate(summary, _aggregate_batch(summary['watermark'], batch_size))
+            processed += n
+            if n < batch_size:
+                break
+
+        if event_watcher.invalidation_reliable():
+            _rollup_state['caught_up'] = True
+        if not processed and stored:
+            if seen_token is not None and _max_token(old_change, seen_token) != old_change:
+                # 没有新文档也推进last_change，已分发的新增不会在之后被重复计入
+                collection.update_one({'_id': ROLLUP_ID, 'watermark': old_watermark, 'last_change': old_change},
+                                      {'$set': {'last_change': _max_token(old_change, seen_token)}})
+            return stored
+
+        if not summary['fields']:
+            sample_doc = mongodb_service.mongo_collection_obj.find_one({}, {"_id": 0})
+            summary['fields'] = list(sample_doc.keys()) if sample_doc else None
+        summary['updated_at'] = datetime.now()
+
+        if stored:
+            # 条件更新：其他进程已推进水位线或应用了新变更时放弃本次结果，避免重复累计
+            summary['last_change'] = _max_token(old_change, seen_token)
+            result = collection.replace_one({'_id': ROLLUP_ID, 'watermark': old_watermark, 'last_change': old_change}, summary)
+            if result.matched_count == 0:
+                logger.info("仪表盘汇总已被其他进程刷新，放弃本次结果")
+                return collection.find_one({'_id': ROLLUP_ID})
+        elif not _replace_rebuilt(collection, summary, current, seen_token):
+            _mark_stale("全量重建期间汇总被并发更新")
+            return collection.find_one({'_id': ROLLUP_ID})
+        if full:
+            _rollup_state['stale'] = False
+
+        logger.info(f"仪表盘汇总{'全量重建' if full else '增量刷新'}完成: 新增 {processed} 条, 耗时 {time.time() - start_time:.2f}s")
+        return summary
+
+
+def _replace_rebuilt(collection, summary, current, seen_token):
+    """
+    写入全量重建结果，条件为写入前读到的水位线和last_change，不覆盖并发的apply_change；
+    重建期间已应用的变更保留其last_change，不会被再次应用。返回是否写入成功
+    """
+    for _ in range(3):
+        watermark = current['watermark'] if current else None
+        last_change = current.get('last_change') if current else None
+        summary['last_change'] = _max_token(last_change, seen_token)
+        if watermark is not None and (summary['watermark'] is None or watermark > summary['watermark']):
+            summary['watermark'] = watermark
+        try:
+            result = collection.replace_one({'_id': ROLLUP_ID, 'watermark': watermark, 'last_change': last_change},
+                                            summary, upsert=current is None)
+        except DuplicateKeyError:
+            # 其他进程先创建了汇总文档
+            result = None
+        if result is not None and (result.matched_count or result.upserted_id is not None):
+            return True
+        current = collection.find_one({'_id': ROLLUP_ID})
+    return False
+
+
+def _is_number(value):
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+
+def _add_contribution(summary, doc, sign):
+    """把一条文档对汇总的贡献加到(sign=1)或从(sign=-1)汇总文档，口径与 _aggregate_batch 一致"""
+    summary['count'] += sign
+    if doc.get('isRisk') in ('true', True):
+        summary['risk_count'] += sign
+    for field, key in (('data_num', 'total_data_num'), ('Praise', 'total_praise'),
+                       ('Reblog', 'total_reblog'), ('Comment', 'total_comment')):
+        if _is_number(doc.get(field)):
+            summary[key] += sign * doc[field]
+    for field, key in (('platform', 'platform_counts'), ('language', 'language_counts')):
+        if doc.get(field) not in (None, ''):
+            counts = _merge_counts(summary[key], [{'_id': doc[field], 'count': sign}])
+            summary[key] = [[name, count] for name, count in counts if count > 0]
+
+
+def _mark_stale(reason):
+    if not _rollup_state['stale']:
+        logger.info(f"仪表盘汇总无法增量更新({reason})，将在 {_rollup_config['stale_rebuild_interval']}s 内全量重建")
+    _rollup_state['stale'] = True
+
+
+def apply_change(change):
+    """
+    事件集合变更监听器（见 event_watcher）：
+    change stream模式下（本进程完成追赶刷新后）新增文档直接计入汇总，并推进水位线；
+    修改/删除有变更前文档(前像)时按差值更新汇总，没有前像时无法得知旧值，标记stale等待全量重建；
+    轮询模式的新增交给按水位线的增量刷新。
+    多个进程各自监听同一变更流，以变更的resume token作为条件更新，每个变更只会被应用一次
+    """
+    op = change['op']
+    if op == 'insert' and (change['token'] is None or change['doc'] is None or not _stream_inserts()):
+        _refresh_requested.set()
+        return
+    if op not in ('insert', 'update', 'replace', 'delete') or change['token'] is None:
+        if op == 'invalidate':
+            # 变更流断点丢失，恢复后需要重新追赶
+            _rollup_state['caught_up'] = False
+        _mark_stale(f"{change['source']} {op}")
+        return
+    before = None if op == 'insert' else change['before']
+    after = None if op == 'delete' else change['doc']
+    if (op != 'insert' and before is None) or (op != 'delete' and after is None):
+        _mark_stale(f"{op} 缺少前像")
+        return
+
+    with _refresh_lock:
+        collection = _summary_collection()
+        for _ in range(3):
+            stored = collection.find_one({'_id': ROLLUP_ID})
+            if stored is None:
+                return
+            # 水位线之后的文档尚未汇总，之后的刷新会按最新内容统计
+            if op != 'insert' and (stored['watermark'] is None or change['id'] > stored['watermark']):
+                return
+            last_change = stored.get('last_change')
+            if last_change is not None and change['token'] <= last_change:
+                return
+            summary = dict(stored)
+            if before is not None:
+                _add_contribution(summary, before, -1)
+            if after is not None:
+                _add_contribution(summary, after, 1)
+            if op == 'insert' and (summary['watermark'] is None or change['id'] > summary['watermark']):
+                summary['watermark'] = change['id']
+            summary['last_change'] = change['token']
+            summary['updated_at'] = datetime.now()
+            result = collection.replace_one(
+                {'_id': ROLLUP_ID, 'watermark': stored['watermark'], 'last_change': last_change}, summary)
+            if result.matched_count:
+                return
+        _mark_stale("并发更新冲突")
+
+
+def _top_counts(pairs, limit):
+    return sorted(pairs, key=lambda x: x[1], reverse=True)[:limit]
+
+
+def _summary_to_metrics(summary):
+    """把汇总文档转换为与原 get_dashboard_metrics 相同结构的指标"""
+    metrics = {'count1': summary['count'], 'risk_count': summary['risk_count']}
+
+    # 平台分布：取前10个平台，名称包含"微博"的统一归类为"微博"
+    platform_counts = {}
+    unique_platforms = []
+    for platform, count in _top_counts(summary['platform_counts'], 10):
+        if '微博' in platform:
+            platform = '微博'
+        if platform in platform_counts:
+            platform_counts[platform] += count
+        else:
+            platform_counts[platform] = count
+            unique_platforms.append(platform)
+    metrics['platforms'] = unique_platforms
+    metrics['platform_count'] = len(unique_platforms)
+    metrics['platform_counts'] = platform_counts
+
+    fields = summary.get('fields') or DEFAULT_FIELDS
+    metrics['fields'] = fields
+    metrics['field_count'] = len(fields)
+
+    interaction_sum = summary['total_praise'] + summary['total_reblog'] + summary['total_comment']
+    metrics['total_data_num'] = summary['total_data_num']
+    metrics['total_praise'] = summary['total_praise']
+    metrics['total_reblog'] = summary['total_reblog']
+    metrics['total_comment'] = summary['total_comment']
+    metrics['interaction_sum'] = interaction_sum
+    metrics['total_nums'] = summary['total_data_num'] + interaction_sum
+
+    top_languages = _top_counts(summary['language_counts'], 5)
+    metrics['languages'] = [language for language, _ in top_languages]
+    metrics['language_count'] = len(top_languages)
+    metrics['language_counts'] = dict(top_languages)
+
+    updated_at = summary.get('updated_at')
+    metrics['rollup_updated_at'] = updated_at.strftime('%Y-%m-%d %H:%M:%S') if updated_at else None
+    return metrics
+
+
+def get_dashboard_metrics():
+    """读取预计算的仪表盘汇总，汇总不存在时先同步构建一次"""
+    if not mongodb_service._check_connection():
+        return {'error': 'MongoDB未连接'}
+
+    try:
+        summary = _summary_collection().find_one({'_id': ROLLUP_ID})
+        if summary is None:
+            summary = refresh_dashboard_rollup()
+        metrics = _summary_to_metrics(summary)
+    except Exception as e:
+        logger.warning(f"读取仪表盘汇总失败，回退到实时统计: {e}")
+        return mongodb_service.get_dashboard_metrics()
+
+    try:
+        metrics['collections'] = mongodb_service.mongo_db.list_collection_names()
+    except Exception as e:
+        logger.warning(f"获取集合列表失败: {e}")
+        metrics['collections'] = []
+    metrics['db_status'] = 'connected'
+    return metrics
@@ -0,0 +1,81 @@
+# /unified_service/services/event_counts.py
+
+import logging
+import time
+from bson import json_util
+from services.result_cache import ResultCache
+from services import event_watcher
+
+logger = logging.getLogger(__name__)
+
+# 计数策略
+COUNT_EXACT = 'exact'          # 每次count_documents精确计数
+COUNT_CACHED = 'cached'        # 精确计数，按查询条件缓存TTL秒
+COUNT_CAPPED = 'capped'        # 最多数到cap条，超过时返回下界（如 "10,000+"）
+COUNT_ESTIMATED = 'estimated'  # 使用集合元数据估算，仅对空查询有意义
+COUNT_STRATEGIES = (COUNT_EXACT, COUNT_CACHED, COUNT_CAPPED, COUNT_ESTIMATED)
+
+_count_config = {'ttl': 60, 'watched_ttl': 3600, 'cap': 10000}
+_count_cache = ResultCache(max_entries=1024, name='event_count')
+_count_generation = [0]
+
+
+def init_count_strategies(app_config):
+    _count_config['ttl'] = app_config.get('COUNT_CACHE_TTL', 60)
+    _count_config['cap'] = app_config.get('COUNT_CAP', 10000)
+    _count_config['watched_ttl'] = app_config.get('CHANGE_WATCH_CACHE_TTL', 3600)
+    # 事件集合有任何写入时清空计数缓存
+    event_watcher.register_listener('event_counts', lambda change: clear_count_cache())
+
+
+def clear_count_cache():
+    """事件数据变化时清空计数缓存"""
+    _count_generation[0] += 1
+    _count_cache.clear()
+
+
+def _format_total(total, is_lower_bound):
+    return f"{total:,}+" if is_lower_bound else f"{total:,}"
+
+
+def _result(total, count_type, is_lower_bound=False):
+    """
+    count_type: 'exact' 精确值, 'cached' 缓存的精确值, 'lower_bound' 实际数量不少于total, 'estimated' 估算值
+    """
+    return {'total': total, 'count_type': count_type, 'total_display': _format_total(total, is_lower_bound)}
+
+
+def count_events(collection, query, strategy=COUNT_EXACT):
+    """按策略统计查询条件匹配的文档数"""
+    if strategy not in COUNT_STRATEGIES:
+        raise ValueError(f"未知的计数策略: {strategy}，可选值: {', '.join(COUNT_STRATEGIES)}")
+
+    # 空查询直接使用集合元数据，代价与集合大小无关
+    if not query:
+        return _result(collection.estimated_document_count(), COUNT_ESTIMATED)
+    if strategy == COUNT_ESTIMATED:
+        strategy = COUNT_CAPPED
+
+    if strategy == COUNT_CAPPED:
+        cap = _count_config['cap']
+        total = collection.count_documents(query, limit=cap + 1)
+        if total > cap:
+            return _result(cap, 'lower_bound', is_lower_bound=True)
+        return _result(total, COUNT_EXACT)
+
+    if strategy == COUNT_CACHED:
+        key = ResultCache.make_key(json_util.dumps(query))
+        hit, entry = _count_cache.get(key)
+        if hit and entry['expires_at'] > time.time():
+            return _result(entry['total'], COUNT_CACHED)
+        generation = _count_generation[0]
+        total = collection.count_documents(query)
+        if generation != _count_generation[0]:
+            # 计数期间发生变更，结果可能已过期，不写入缓存
+            return _result(total, COUNT_EXACT)
+        # change stream正常时写入都会触发失效，可以使用较长的TTL
+        ttl = _count_config['watched_ttl'] if event_watcher.invalidation_reliable() else _count_config['ttl']
+        _count_cache.put(key, {'total': total, 'expires_at': time.time() + ttl})
+        return _result(total, COUNT_EXACT)
+
+    return _result(collection.count_documents(query), COUNT_EXACT)
@@ -0,0 +1,182 @@
+# /unified_service/services/event_watcher.py
+
+import logging
+import threading
+import time
+from pymongo.errors import OperationFailure, PyMongoError
+
+logger = logging.getLogger(__name__)
+
+# 事件集合变更监听：副本集上使用change stream，单机部署(不支持change stream)时退化为轮询
+# 监听到的变更统一转换为 {'op', 'id', 'doc', 'before', 'token', 'updated_fields', 'removed_fields', 'source'} 后分发给已注册的监听器：
+#   op: insert / update / replace / delete / invalidate
+#   doc/before: 变更后/前的完整文档（轮询模式或服务端未开启前像时为None）
+#   token: change stream的resume token（_data字符串，按变更顺序递增），轮询模式为None
+#   updated_fields/removed_fields: update操作修改/删除的字段名列表（取自updateDescription），
+#     其他操作和轮询模式为None，表示不知道哪些字段变化
+MODE_STOPPED = 'stopped'
+MODE_CHANGE_STREAM = 'change_stream'
+MODE_POLLING = 'polling'
+MODE_RECONNECTING = 'reconnecting'
+
+# 单机部署执行$changeStream时的错误码
+_CHANGE_STREAM_UNSUPPORTED = (40573, 40324)
+
+_listeners = {}
+_listeners_lock = threading.Lock()
+_watch_state = {'mode': MODE_STOPPED, 'last_change_at': None, 'last_token': None, 'changes': 0, 'errors': 0}
+_watch_config = {'pre_images': False, 'poll_interval': 10, 'retry_interval': 5}
+_watcher_thread = None
+
+
+def register_listener(name, callback):
+    """注册变更监听器，同名监听器会被替换；监听器在监听线程中同步调用，应尽快返回"""
+    with _listeners_lock:
+        _listeners[name] = callback
+
+
+def unregister_listener(name):
+    with _listeners_lock:
+        _listeners.pop(name, None)
+
+
+def invalidation_reliable():
+    """change stream模式下所有写入（包括修改和删除）都会触发失效，缓存可以放心使用较长的TTL"""
+    return _watch_state['mode'] == MODE_CHANGE_STREAM
+
+
+def last_token():
+    """本进程最近分发的变更的resume token，用于判断之后的变更是否已包含在某次读取中"""
+    return _watch_state['last_token']
+
+
+def get_watch_state():
+    return dict(_watch_state, listeners=sorted(_listeners))
+
+
+def _dispatch(change):
+    _watch_state['changes'] += 1
+    _watch_state['last_change_at'] = time.time()
+    if change['token'] is not None:
+        _watch_state['last_token'] = change['token']
+    with _listeners_lock:
+        listeners = list(_listeners.items())
+    for name, callback in listeners:
+        try:
+            callback(change)
+        except Exception as e:
+            logger.warning(f"变更监听器 {name} 处理失败: {e}")
+
+
+def _normalize_change(event):
+    token = event.get('_id') or {}
+    description = event.get('updateDescription')
+    return {
+        'op': event.get('operationType'),
+        'id': (event.get('documentKey') or {}).get('_id'),
+        'doc': event.get('fullDocument'),
+        'before': event.get('fullDocumentBeforeChange'),
+        'token': token.get('_data'),
+        # 点号路径（如 'content.text'）保留原样，使用方按首段判断字段
+        'updated_fields': list((description.get('updatedFields') or {}).keys()) if description else None,
+        'removed_fields': list(description.get('removedFields') or []) if description else None,
+        'source': MODE_CHANGE_STREAM,
+    }
+
+
+def _watch_change_stream(collection):
+    """持续消费change stream，断线后从resume token继续；单机部署时抛出OperationFailure"""
+    resume_token = None
+    options = {'full_document': 'updateLookup', 'max_await_time_ms': 1000}
+    if _watch_config['pre_images']:
+        # 需要MongoDB 6.0+，并对集合执行 collMod: {changeStreamPreAndPostImages: {enabled: true}}
+        options['full_document_before_change'] = 'whenAvailable'
+    while True:
+        try:
+            with collection.watch(resume_after=resume_token, **options) as stream:
+                _watch_state['mode'] = MODE_CHANGE_STREAM
+                logger.info("事件集合change stream监听已启动")
+                while stream.alive:
+                    event = stream.try_next()
+                    # 没有新变更时也推进resume token，重连后不会重放已处理的区间
+                    resume_token = stream.resume_token
+                    if event is None:
+                        continue
+                    change = _normalize_change(event)
+                    if change['op'] == 'invalidate':
+                        # 集合被删除或重命名，旧的resume token不再可用
+                        resume_token = None
+                    _dispatch(change)
+        except OperationFailure as e:
+            if e.code in _CHANGE_STREAM_UNSUPPORTED:
+                raise
+            _watch_state['errors'] += 1
+            logger.warning(f"change stream中断，{_watch_config['retry_interval']}s后重试: {e}")
+            resume_token = None if e.code == 286 else resume_token  # 286: resume token已不在oplog中
+        except PyMongoError as e:
+            _watch_state['errors'] += 1
+            logger.warning(f"change stream中断，{_watch_config['retry_interval']}s后重试: {e}")
+        _watch_state['mode'] = MODE_RECONNECTING
+        if resume_token is None:
+            # 无法从断点继续，中断期间的变更可能丢失，按未知变更通知各监听器
+            _dispatch({'op': 'invalidate', 'id': None, 'doc': None, 'before': None, 'token': None,
+                       'updated_fields': None, 'removed_fields': None,
+                       'source': MODE_CHANGE_STREAM})
+        time.sleep(_watch_config['retry_interval'])
+
+
+def _latest_id(collection):
+    doc = collection.find_one({}, {'_id': 1}, sort=[('_id', -1)])
+    return doc['_id'] if doc else None
+
+
+def _poll(collection):
+    """
+    轮询模式：按 _id 水位线发现新增文档，按文档数变化推断删除；
+    文档修改无法发现，依赖各缓存自身的TTL
+    """
+    _watch_state['mode'] = MODE_POLLING
+    logger.info(f"事件集合不支持change stream，改为每 {_watch_config['poll_interval']}s 轮询")
+    last_id = _latest_id(collection)
+    last_count = collection.estimated_document_count()
+    while True:
+        time.sleep(_watch_config['poll_interval'])
+        try:
+            inserted = collection.count_documents({'_id': {'$gt': last_id}}) if last_id is not None else \
+                collection.estimated_document_count()
+            count = collection.estimated_document_count()
+            if inserted:
+                last_id = _latest_id(collection)
+                _dispatch({'op': 'insert', 'id': None, 'doc': None, 'before': None, 'token': None,
+                           'updated_fields': None, 'removed_fields': None,
+                           'source': MODE_POLLING})
+            if count < last_count + inserted:
+                _dispatch({'op': 'delete', 'id': None, 'doc': None, 'before': None, 'token': None,
+                           'updated_fields': None, 'removed_fields': None,
+                           'source': MODE_POLLING})
+            last_count = count
+        except PyMongoError as e:
+            _watch_state['errors'] += 1
+            logger.warning(f"轮询事件集合失败: {e}")
+
+
+def _watch_loop(collection):
+    try:
+        _watch_change_stream(collection)
+    except OperationFailure as e:
+        logger.info(f"change stream不可用: {e}")
+    except Exception as e:
+        logger.error(f"change stream监听异常退出，改为轮询: {e}")
+    _poll(collection)
+
+
+def start_event_watcher(collection, app_config):
+    """启动后台变更监听线程（每个进程一个）"""
+    global _watcher_thread
+    _watch_config['pre_images'] = app_config.get('CHANGE_WATCH_PRE_IMAGES', False)
+    _watch_config['poll_interval'] = app_config.get('CHANGE_WATCH_POLL_INTERVAL', 10)
+    if _watcher_thread is not None:
+        return _watcher_thread
+    _watcher_thread = threading.Thread(target=_watch_loop, args=(collection,), name='event-watcher', daemon=True)
+    _watcher_thread.start()
+    return _watcher_thread
@@ -0,0 +1,315 @@
+# /unified_service/services/export_engine.py
+
+import csv
+import io
+import json
+import logging
+import queue
+import threading
+import zlib
+from datetime import datetime, timedelta
+from bson import ObjectId
+
+try:
+    import orjson  # 可选依赖，更快的JSON序列化
+except ImportError:
+    orjson = None
+
+try:
+    import zstandard  # 可选依赖，zstd压缩
+except ImportError:
+    zstandard = None
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+    pq = None
+
+logger = logging.getLogger(__name__)
+
+# 导出字段（与search_events导出模式的投影一致）
+EXPORT_FIELDS = ['Event', 'Time', 'platform', 'region', 'content', 'isRisk']
+EXPORT_FORMATS = ('jsonl', 'csv', 'parquet')
+COMPRESSIONS = ('none', 'gzip', 'zstd')
+
+_CONTENT_TYPES = {
+    'jsonl': 'application/jsonl',
+    'csv': 'text/csv; charset=utf-8',
+    'parquet': 'application/vnd.apache.parquet',
+}
+
+
+class ExportError(Exception):
+    """导出参数不合法或缺少可选依赖"""
+
+
+def _export_value(value):
+    """与mongodb_service.JSONEncoder保持一致的取值转换"""
+    if isinstance(value, ObjectId):
+        return str(value)
+    if isinstance(value, datetime):
+        return value.strftime('%Y-%m-%d %H:%M')
+    return value
+
+
+def _rows(docs, fields):
+    return [[_export_value(doc.get(f)) for f in fields] for doc in docs]
+
+
+# --- 序列化 ---
+
+class _JsonlSerializer:
+    def __init__(self, fields):
+        self.fields = fields
+
+    def header(self):
+        return b''
+
+    def batch(self, docs):
+        out = []
+        for doc in docs:
+            record = {f: _export_value(doc[f]) for f in self.fields if f in doc}
+            if orjson is not None:
+                out.append(orjson.dumps(record, default=str))
+            else:
+                out.append(json.dumps(record, ensure_ascii=False, default=str).encode('utf-8'))
+        out.append(b'')
+        return b'\n'.join(out)
+
+    def footer(self):
+        return b''
+
+
+class _CsvSerializer:
+    def __init__(self, fields):
+        self.fields = fields
+
+    def _encode(self, rows):
+        buffer = io.StringIO()
+        csv.writer(buffer).writerows(rows)
+        return buffer.getvalue().encode('utf-8')
+
+    def header(self):
+        # 带BOM，Excel打开时能正确识别中文
+        return '\ufeff'.encode('utf-8') + self._encode([self.fields])
+
+    def batch(self, docs):
+        return self._encode(_rows(docs, self.fields))
+
+    def footer(self):
+        return b''
+
+
+class _StreamSink(io.RawIOBase):
+    """只追加的输出缓冲：写入的数据可随时取走，tell()仍返回累计偏移，保证Parquet页脚中的偏移量正确"""
+
+    def __init__(self):
+        self._chunks = []
+        self._position = 0
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        data = bytes(data)
+        self._chunks.append(data)
+        self._position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self._position
+
+    def drain(self):
+        data = b''.join(self._chunks)
+        self._chunks = []
+        return data
+
+
+class _ParquetSerializer:
+    def __init__(self, fields, compression='snappy'):
+        if pa is None:
+            raise ExportError("导出Parquet需要安装pyarrow")
+        self.fields = fields
+        self.schema = pa.schema([(f, pa.string()) for f in fields])
+        self._sink = _StreamSink()
+        self._writer = pq.ParquetWriter(pa.PythonFile(self._sink, mode='w'), self.schema, compression=compression)
+
+    def header(self):
+        return self._sink.drain()
+
+    def batch(self, docs):
+        columns = [[None if doc.get(f) is None else str(_export_value(doc.get(f))) for doc in docs] for f in self.fields]
+        self._writer.write_table(pa.Table.from_arrays([pa.array(c, type=pa.string()) for c in columns], schema=self.schema))
+        return self._sink.drain()
+
+    def footer(self):
+        self._writer.close()
+        return self._sink.drain()
+
+
+# --- 压缩 ---
+
+class _NoCompressor:
+    def compress(self, data):
+        return data
+
+    def flush(self):
+        return b''
+
+
+def _make_compressor(compression):
+    if compression == 'gzip':
+        return zlib.compressobj(6, zlib.DEFLATED, 31)
+    if compression == 'zstd':
+        if zstandard is None:
+            raise ExportError("zstd压缩需要安装zstandard")
+        return zstandard.ZstdCompressor(level=3).compressobj()
+    return _NoCompressor()
+
+
+# --- 数据读取 ---
+
+def _iter_batches(collection, query, fields, batch_size, limit=None):
+    """按批读取游标，每批batch_size条"""
+    projection = dict({'_id': 0}, **{f: 1 for f in fields})
+    cursor = collection.find(query, projection).batch_size(batch_size)
+    if limit:
+        cursor = cursor.limit(limit)
+    batch = []
+    for doc in cursor:
+        batch.append(doc)
+        if len(batch) >= batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def split_time_range(start, end, partitions):
+    """把 [start, end] 时间范围均分为partitions段，返回 [(段起点, 段终点)]，最后一段包含end"""
+    partitions = max(1, partitions)
+    step = (end - start) / partitions
+    if step <= timedelta(0):
+        return [(start, end)]
+    bounds = [start + step * i for i in range(partitions)] + [end]
+    return list(zip(bounds[:-1], bounds[1:]))
+
+
+def _iter_partitioned_batches(collection, partition_queries, fields, batch_size, workers):
+    """
+    各时间分段由后台线程并行读取；每段最多预取2批，按分段顺序输出，
+    保证输出有序且内存占用与总行数无关。
+    同时运行的读取线程为当前分段起的workers个，按顺序滑动启动，避免后面的分段占满线程
+    """
+    queues = [queue.Queue(maxsize=2) for _ in partition_queries]
+    done = object()
+    stop = threading.Event()
+    workers = max(1, workers)
+
+    def _put(q, item):
+        while not stop.is_set():
+            try:
+                q.put(item, timeout=1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def _produce(q, partition_query):
+        try:
+            for batch in _iter_batches(collection, partition_query, fields, batch_size):
+                if not _put(q, batch):
+                    return
+            _put(q, done)
+        except Exception as e:
+            _put(q, e)
+
+    started = 0
+
+    def _start_until(n):
+        nonlocal started
+        while started < min(n, len(partition_queries)):
+            threading.Thread(target=_produce, args=(queues[started], partition_queries[started]),
+                             daemon=True, name=f"export-partition-{started}").start()
+            started += 1
+
+    try:
+        for i, q in enumerate(queues):
+            _start_until(i + workers)
+            while True:
+                item = q.get()
+                if item is done:
+                    break
+                if isinstance(item, Exception):
+                    raise item
+                yield item
+    finally:
+        # 客户端中断下载时通知读取线程退出
+        stop.set()
+
+
+# --- 对外接口 ---
+
+def export_events(collection, query, export_format='jsonl', compression='none', fields=None,
+                  batch_size=5000, limit=None, partition_queries=None, workers=4):
+    """
+    返回导出内容的字节流生成器
+    partition_queries不为空时按分段并行读取（各分段查询条件需互不重叠）
+    """
+    export_format = 'jsonl' if export_format == 'json' else export_format
+    if export_format not in EXPORT_FORMATS:
+        raise ExportError(f"不支持的导出格式: {export_format}，可选值: {', '.join(EXPORT_FORMATS)}")
+    if compression not in COMPRESSIONS:
+        raise ExportError(f"不支持的压缩方式: {compression}，可选值: {', '.join(COMPRESSIONS)}")
+    fields = fields or EXPORT_FIELDS
+
+    # Parquet自带列压缩，不再整体压缩
+    if export_format == 'parquet':
+        serializer = _ParquetSerializer(fields, compression='zstd' if compression == 'zstd' else 'snappy')
+        compressor = _NoCompressor()
+    else:
+        serializer = _JsonlSerializer(fields) if export_format == 'jsonl' else _CsvSerializer(fields)
+        compressor = _make_compressor(compression)
+
+    if partition_queries and len(partition_queries) > 1:
+        batches = _iter_partitioned_batches(collection, partition_queries, fields, batch_size, workers)
+    else:
+        batches = _iter_batches(collection, query, fields, batch_size, limit)
+
+    def generate():
+        total = 0
+        chunk = compressor.compress(serializer.header())
+        if chunk:
+            yield chunk
+        for docs in batches:
+            if limit and total + len(docs) > limit:
+                docs = docs[:limit - total]
+            total += len(docs)
+            chunk = compressor.compress(serializer.batch(docs))
+            if chunk:
+                yield chunk
+            if limit and total >= limit:
+                break
+        chunk = compressor.compress(serializer.footer()) + compressor.flush()
+        if chunk:
+            yield chunk
+        logger.info(f"导出完成: {total} 条, 格式 {export_format}, 压缩 {compression}")
+
+    return generate()
+
+
+def export_filename(export_format, compression):
+    export_format = 'jsonl' if export_format == 'json' else export_format
+    suffix = {'gzip': '.gz', 'zstd': '.zst'}.get(compression, '') if export_format != 'parquet' else ''
+    return f"events_export.{export_format}{suffix}"
+
+
+def export_content_type(export_format, compression):
+    export_format = 'jsonl' if export_format == 'json' else export_format
+    if export_format != 'parquet' and compression == 'gzip':
+        return 'application/gzip'
+    if export_format != 'parquet' and compression == 'zstd':
+        return 'application/zstd'
+    return _CONTENT_TYPES.get(export_format, 'application/octet-stream')
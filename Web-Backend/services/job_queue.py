@@ -0,0 +1,199 @@
+# /unified_service/services/job_queue.py
+
+import json
+import logging
+import os
+import queue
+import threading
+import time
+import uuid
+
+logger = logging.getLogger(__name__)
+
+JOB_QUEUED = 'queued'
+JOB_RUNNING = 'running'
+JOB_DONE = 'done'
+JOB_FAILED = 'failed'
+
+
+class QueueFullError(Exception):
+    """任务队列已满"""
+
+
+class JobQueue:
+    """
+    本地后台任务队列：固定数量的工作线程 + 有界等待队列
+    任务记录（状态、进度、结果）保存在内存中，并可同步写入job_dir，
+    使多个Web worker进程都能查询到同一任务；完成的任务保留ttl秒。
+    """
+
+    def __init__(self, workers=2, max_pending=16, job_dir=None, ttl=24 * 3600, name='job'):
+        self.name = name
+        self.job_dir = job_dir
+        self.ttl = ttl
+        self._pending = queue.Queue(maxsize=max_pending)
+        self._jobs = {}
+        self._stats = {}
+        self._lock = threading.Lock()
+        if job_dir:
+            os.makedirs(job_dir, exist_ok=True)
+        self._threads = []
+        for i in range(max(1, workers)):
+            thread = threading.Thread(target=self._worker, name=f"{name}-worker-{i}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def submit(self, fn, *args, meta=None):
+        """
+        提交任务，fn(report_progress, *args) 的返回值作为任务结果
+        队列已满时抛出QueueFullError
+        """
+        job = {
+            'id': uuid.uuid4().hex,
+            'status': JOB_QUEUED,
+            'created_at': time.time(),
+            'started_at': None,
+            'finished_at': None,
+            'progress': {},
+            'meta': meta or {},
+            'result': None,
+            'error': None,
+        }
+        with self._lock:
+            self._jobs[job['id']] = job
+        try:
+            self._pending.put_nowait((job['id'], fn, args))
+        except queue.Full:
+            with self._lock:
+                self._jobs.pop(job['id'], None)
+            raise QueueFullError(f"{self.name}队列已满，请稍后再试")
+        self._persist(job)
+        self._expire()
+        return self._snapshot(job)
+
+    def get(self, job_id):
+        """查询任务记录，本进程没有时从job_dir读取"""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is not None:
+                return self._snapshot(job)
+        return self._load(job_id)
+
+    def stats(self):
+        with self._lock:
+            counts = {}
+            for job in self._jobs.values():
+                counts[job['status']] = counts.get(job['status'], 0) + 1
+        return {'name': self.name, 'pending': self._pending.qsize(), 'workers': len(self._threads), 'jobs': counts}
+
+    def get_stat(self, name, default=None):
+        """读取队列级统计值（如平均吞吐量）；有job_dir时从共享目录读取，各worker进程看到同一个值"""
+        if not self.job_dir:
+            with self._lock:
+                return self._stats.get(name, default)
+        try:
+            with open(self._stat_path(name), 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return default
+
+    def set_stat(self, name, value):
+        if not self.job_dir:
+            with self._lock:
+                self._stats[name] = value
+            return
+        path = self._stat_path(name)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(value, f)
+            os.replace(tmp_path, path)
+        except (OSError, TypeError, ValueError) as e:
+            logger.warning(f"保存{self.name}统计值 {name} 失败: {e}")
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+    # --- 内部方法 ---
+
+    def _stat_path(self, name):
+        # 不使用.json后缀，不会被_expire当作过期任务记录清理
+        return os.path.join(self.job_dir, f"_{name}.stat")
+
+    def _worker(self):
+        while True:
+            job_id, fn, args = self._pending.get()
+            with self._lock:
+                job = self._jobs.get(job_id)
+                if job is None:
+                    continue
+                job['status'] = JOB_RUNNING
+                job['started_at'] = time.time()
+            self._persist(job)
+
+            def report_progress(**progress):
+                with self._lock:
+                    job['progress'].update(progress)
+                self._persist(job)
+
+            try:
+                result = fn(report_progress, *args)
+                with self._lock:
+                    job['result'] = result
+                    job['status'] = JOB_DONE
+            except Exception as e:
+                logger.error(f"{self.name}任务 {job_id} 执行失败: {e}")
+                with self._lock:
+                    job['error'] = str(e)
+                    job['status'] = JOB_FAILED
+            finally:
+                with self._lock:
+                    job['finished_at'] = time.time()
+                self._persist(job)
+
+    def _snapshot(self, job):
+        return dict(job, progress=dict(job['progress']))
+
+    def _job_path(self, job_id):
+        return os.path.join(self.job_dir, f"{job_id}.json")
+
+    def _persist(self, job):
+        if not self.job_dir:
+            return
+        with self._lock:
+            snapshot = self._snapshot(job)
+        path = self._job_path(snapshot['id'])
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(snapshot, f, ensure_ascii=False)
+            os.replace(tmp_path, path)
+        except (OSError, TypeError, ValueError) as e:
+            logger.warning(f"保存{self.name}任务记录失败 {snapshot['id']}: {e}")
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+    def _load(self, job_id):
+        if not self.job_dir or not job_id or not all(c in '0123456789abcdef' for c in job_id):
+            return None
+        try:
+            with open(self._job_path(job_id), 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _expire(self):
+        """清理超过保留期的已结束任务"""
+        deadline = time.time() - self.ttl
+        with self._lock:
+            expired = [job_id for job_id, job in self._jobs.items()
+                       if job['finished_at'] and job['finished_at'] < deadline]
+            for job_id in expired:
+                del self._jobs[job_id]
+        if self.job_dir:
+            for filename in os.listdir(self.job_dir):
+                path = os.path.join(self.job_dir, filename)
+                try:
+                    if filename.endswith('.json') and os.path.getmtime(path) < deadline:
+                        os.remove(path)
+                except OSError:
+                    pass
@@ -0,0 +1,147 @@
+# /unified_service/services/media_service.py
+
+import hashlib
+import logging
+import os
+import secrets
+import threading
+from itsdangerous import URLSafeTimedSerializer, BadSignature, SignatureExpired
+
+logger = logging.getLogger(__name__)
+
+_SALT = 'media-url'
+THUMBNAIL_EXTENSION = 'jpg'
+
+# 未配置MEDIA_URL_SECRET时使用进程内随机密钥：单进程可用，多worker之间链接互不通用
+_fallback_secret = None
+_secret_lock = threading.Lock()
+
+
+class MediaAccessError(Exception):
+    """媒体链接无效、过期或指向不允许访问的文件"""
+
+
+def init_media_service(app_config):
+    """启动时检查签名密钥和允许访问的目录配置"""
+    if not app_config.get('MEDIA_URL_SECRET'):
+        logger.warning("未设置环境变量MEDIA_URL_SECRET，媒体链接使用进程内随机密钥签名；"
+                       "多worker部署时必须设置该变量，否则其他worker签发的链接无法通过校验")
+    if not app_config.get('MEDIA_ALLOWED_ROOTS'):
+        logger.error("MEDIA_ALLOWED_ROOTS为空，/api/media将拒绝所有非缩略图文件")
+
+
+def _secret(app_config):
+    global _fallback_secret
+    secret = app_config.get('MEDIA_URL_SECRET')
+    if secret:
+        return secret
+    with _secret_lock:
+        if _fallback_secret is None:
+            _fallback_secret = secrets.token_urlsafe(32)
+        return _fallback_secret
+
+
+def _serializer(app_config):
+    return URLSafeTimedSerializer(_secret(app_config), salt=_SALT)
+
+
+def media_url(media_path, app_config):
+    """为服务器上的媒体文件生成签名链接，链接本身不暴露文件路径，超过有效期后失效"""
+    token = _serializer(app_config).dumps(os.path.abspath(media_path))
+    return f"/api/media/{token}"
+
+
+def thumbnail_path(media_path, app_config):
+    """缩略图按原文件绝对路径的SHA-1命名，存放在MEDIA_THUMBNAIL_DIR下"""
+    thumb_dir = app_config.get('MEDIA_THUMBNAIL_DIR')
+    if not thumb_dir:
+        return None
+    name = hashlib.sha1(os.path.abspath(media_path).encode('utf-8')).hexdigest()
+    return os.path.join(thumb_dir, f"{name}.{THUMBNAIL_EXTENSION}")
+
+
+def describe_media(media_paths, app_config, mids=None):
+    """
+    构造搜索结果中的媒体描述，只生成链接、不读取文件内容
+    返回 [{"mid": ..., "url": ..., "thumbnailUrl": ...}]，没有预生成缩略图时thumbnailUrl为None
+    """
+    media = []
+    for i, media_path in enumerate(media_paths):
+        thumb = thumbnail_path(media_path, app_config)
+        media.append({
+            "mid": mids[i] if mids is not None and i < len(mids) else None,
+            "url": media_url(media_path, app_config),
+            "thumbnailUrl": media_url(thumb, app_config) if thumb and os.path.exists(thumb) else None,
+        })
+    return media
+
+
+def _is_under_allowed_root(path, app_config):
+    roots = app_config.get('MEDIA_ALLOWED_ROOTS')
+    if not roots:
+        return False
+    real = os.path.realpath(path)
+    for root in roots:
+        root = os.path.realpath(root)
+        if real == root or real.startswith(root + os.sep):
+            return True
+    return False
+
+
+def resolve_media_token(token, app_config):
+    """校验签名链接并返回文件路径，失败时抛出MediaAccessError"""
+    try:
+        path = _serializer(app_config).loads(token, max_age=app_config.get('MEDIA_URL_TTL', 3600))
+    except SignatureExpired:
+        raise MediaAccessError("媒体链接已过期")
+    except BadSignature:
+        raise MediaAccessError("媒体链接无效")
+
+    thumb_dir = app_config.get('MEDIA_THUMBNAIL_DIR')
+    in_thumb_dir = bool(thumb_dir) and os.path.dirname(os.path.realpath(path)) == os.path.realpath(thumb_dir)
+    if not in_thumb_dir and not _is_under_allowed_root(path, app_config):
+        raise MediaAccessError("不允许访问该媒体文件")
+    if not os.path.isfile(path):
+        raise MediaAccessError("媒体文件不存在")
+    return path
+
+
+def generate_thumbnail(media_path, app_config, size=(320, 320), overwrite=False):
+    """
+    生成缩略图：图片直接缩放，视频取首帧（需要OpenCV）
+    返回缩略图路径，无法生成时返回None
+    """
+    thumb = thumbnail_path(media_path, app_config)
+    if thumb is None:
+        return None
+    if os.path.exists(thumb) and not overwrite:
+        return thumb
+
+    from PIL import Image
+
+    extension = media_path.rsplit('.', 1)[-1].lower()
+    if extension in app_config.get('VIDEO_ALLOWED_EXTENSIONS', ()):
+        try:
+            import cv2
+        except ImportError:
+            logger.warning(f"未安装OpenCV，跳过视频缩略图: {media_path}")
+            return None
+        capture = cv2.VideoCapture(media_path)
+        try:
+            ok, frame = capture.read()
+        finally:
+            capture.release()
+        if not ok:
+            logger.warning(f"读取视频首帧失败: {media_path}")
+            return None
+        image = Image.fromarray(cv2.cvtColor(frame, cv2.COLOR_BGR2RGB))
+    else:
+        image = Image.open(media_path)
+
+    os.makedirs(os.path.dirname(thumb), exist_ok=True)
+    image = image.convert('RGB')
+    image.thumbnail(size)
+    tmp_path = f"{thumb}.{os.getpid()}.tmp"
+    image.save(tmp_path, format='JPEG', quality=80)
+    os.replace(tmp_path, thumb)
+    return thumb
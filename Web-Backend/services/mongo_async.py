@@ -0,0 +1,57 @@
+# /unified_service/services/mongo_async.py
+
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+
+logger = logging.getLogger(__name__)
+
+# pymongo的MongoClient是线程安全的，多个查询可在线程池中共享同一连接池并发执行
+query_executor = None
+_async_config = {'workers': 16}
+
+
+def init_mongo_async(app_config):
+    """读取线程池大小配置；线程数不应超过MongoClient的maxPoolSize"""
+    _async_config['workers'] = app_config.get('MONGO_ASYNC_WORKERS', 16)
+
+
+def _get_executor():
+    global query_executor
+    if query_executor is None:
+        query_executor = ThreadPoolExecutor(max_workers=_async_config['workers'], thread_name_prefix='mongo-query')
+    return query_executor
+
+
+class QueryTimeout(Exception):
+    """查询在截止时间内没有完成"""
+
+
+def submit(fn, *args, **kwargs):
+    """在查询线程池中执行fn，返回Future"""
+    return _get_executor().submit(fn, *args, **kwargs)
+
+
+def gather(tasks, timeout=None):
+    """
+    并发执行一组相互独立的查询，tasks为 {名称: 无参可调用对象}
+    返回 {名称: (是否成功, 结果或异常)}；超过timeout秒未完成的查询记为QueryTimeout，
+    总耗时由最慢的查询（或timeout）决定，而不是各查询耗时之和
+    """
+    start_time = time.time()
+    futures = {name: submit(fn) for name, fn in tasks.items()}
+    wait(futures.values(), timeout=timeout)
+
+    results = {}
+    for name, future in futures.items():
+        if not future.done():
+            # 已开始执行的查询无法取消，由调用方在查询中设置maxTimeMS让服务端终止
+            future.cancel()
+            results[name] = (False, QueryTimeout(f"{name} 超过 {timeout}s 未完成"))
+        elif future.exception() is not None:
+            results[name] = (False, future.exception())
+        else:
+            results[name] = (True, future.result())
+    logger.debug(f"并发查询 {list(tasks)} 完成, 耗时 {time.time() - start_time:.3f}s")
+    return results
+
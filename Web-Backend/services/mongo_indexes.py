@@ -0,0 +1,164 @@
+# /unified_service/services/mongo_indexes.py
+
+import logging
+import threading
+import pymongo
+
+logger = logging.getLogger(__name__)
+
+ASC = pymongo.ASCENDING
+DESC = pymongo.DESCENDING
+
+# 事件集合需要的索引：等值条件在前、排序字段Time在后（同时覆盖Time范围条件）
+# 对应 get_all_events_query / get_risk_events_query / get_export_events_query 生成的查询和 (Time, _id) 游标分页
+EVENT_INDEXES = [
+    {'keys': [('Event', ASC)], 'purpose': "按事件名查询（关键词子串匹配由二元组索引加速）"},
+    {'keys': [('Time', DESC), ('_id', DESC)], 'purpose': "按时间排序、时间范围、游标分页"},
+    {'keys': [('platform', ASC), ('Time', DESC)], 'purpose': "按平台筛选 + 时间排序"},
+    {'keys': [('region', ASC), ('Time', DESC)], 'purpose': "按地区筛选 + 时间排序"},
+    {'keys': [('isRisk', ASC), ('Time', DESC)], 'purpose': "风险事件 + 时间排序"},
+    {'keys': [('isRisk', ASC), ('platform', ASC), ('Time', DESC)], 'purpose': "风险事件按平台筛选 + 时间排序"},
+    {'keys': [('isRisk', ASC), ('region', ASC), ('Time', DESC)], 'purpose': "风险事件按地区筛选 + 时间排序"},
+    # 规范化影子字段（scripts/migrate_event_schema.py 写入），迁移完成后查询改用这些索引
+    {'keys': [('TimeDt', DESC), ('_id', DESC)], 'purpose': "[规范化] 按时间排序、时间范围、游标分页"},
+    {'keys': [('platform', ASC), ('TimeDt', DESC)], 'purpose': "[规范化] 按平台筛选 + 时间排序"},
+    {'keys': [('region', ASC), ('TimeDt', DESC)], 'purpose': "[规范化] 按地区筛选 + 时间排序"},
+    {'keys': [('isRiskBool', ASC), ('TimeDt', DESC)], 'purpose': "[规范化] 风险事件 + 时间排序"},
+    {'keys': [('isRiskBool', ASC), ('platform', ASC), ('TimeDt', DESC)], 'purpose': "[规范化] 风险事件按平台筛选 + 时间排序"},
+    {'keys': [('isRiskBool', ASC), ('region', ASC), ('TimeDt', DESC)], 'purpose': "[规范化] 风险事件按地区筛选 + 时间排序"},
+]
+
+# 用于explain的代表性查询参数，覆盖各路由生成的查询形态
+QUERY_SHAPE_PARAMS = [
+    ('getAllEvents', {}),
+    ('getAllEvents', {'platform': '微博'}),
+    ('getAllEvents', {'region': '北京'}),
+    ('getAllEvents', {'start_time': '2024-01', 'end_time': '2024-03'}),
+    ('getAllEvents', {'platform': '微博', 'start_time': '2024-01'}),
+    ('getAllEvents', {'keyword': '事件'}),
+    ('getRiskEvents', {}),
+    ('getRiskEvents', {'platform': '微博'}),
+    ('getRiskEvents', {'region': '北京', 'end_time': '2024-03'}),
+    ('exportEvents', {'is_risk': 'true', 'platform': '微博'}),
+    ('exportEvents', {'region': '北京', 'start_time': '2024-01'}),
+    ('exportEvents', {'keyword': '事件'}),
+]
+
+_index_state = {'status': 'unknown', 'missing': [], 'created': [], 'explain': []}
+
+
+def _index_key(keys):
+    return tuple((field, int(direction)) for field, direction in keys)
+
+
+def missing_indexes(collection, specs=None):
+    """对比集合现有索引，返回尚未创建的索引定义"""
+    specs = specs or EVENT_INDEXES
+    existing = {_index_key(info['key']) for info in collection.index_information().values()}
+    return [spec for spec in specs if _index_key(spec['keys']) not in existing]
+
+
+def ensure_indexes(collection, specs=None):
+    """创建缺失的索引（后台构建，不阻塞读写），返回新建的索引名"""
+    created = []
+    for spec in missing_indexes(collection, specs):
+        try:
+            name = collection.create_index(spec['keys'], background=True)
+            created.append(name)
+            logger.info(f"已创建索引 {name}: {spec['purpose']}")
+        except Exception as e:
+            logger.error(f"创建索引失败 {spec['keys']}: {e}")
+    return created
+
+
+def _plan_stages(plan):
+    """递归收集执行计划中的所有stage名称"""
+    stages = []
+    if isinstance(plan, dict):
+        if 'stage' in plan:
+            stages.append(plan['stage'])
+        for value in plan.values():
+            stages.extend(_plan_stages(value))
+    elif isinstance(plan, list):
+        for item in plan:
+            stages.extend(_plan_stages(item))
+    return stages
+
+
+def _build_query(route, params):
+    # 延迟导入，避免与mongodb_service循环引用
+    from services import mongodb_service
+    if route == 'getRiskEvents':
+        return mongodb_service.get_risk_events_query(params)
+    if route == 'exportEvents':
+        return mongodb_service.get_export_events_query(params)
+    return mongodb_service.get_all_events_query(params)
+
+
+def _explain_sort_field():
+    # 与查询层一致：迁移完成后按TimeDt排序
+    from services import mongodb_service
+    return mongodb_service._sort_field('Time')
+
+
+def explain_query_shapes(collection, shapes=None):
+    """对各路由生成的查询形态执行explain，记录仍在全集合扫描(COLLSCAN)的查询"""
+    report = []
+    for route, params in shapes or QUERY_SHAPE_PARAMS:
+        query = _build_query(route, params)
+        try:
+            plan = collection.find(query).sort([(_explain_sort_field(), DESC), ('_id', DESC)]).limit(10).explain()
+            stages = _plan_stages(plan.get('queryPlanner', {}).get('winningPlan', {}))
+            collscan = 'COLLSCAN' in stages
+            report.append({'route': route, 'params': params, 'query': str(query),
+                           'stages': stages, 'collscan': collscan})
+            if collscan:
+                logger.warning(f"查询仍为全集合扫描: {route} {params} -> {query}")
+        except Exception as e:
+            logger.warning(f"explain失败 {route} {params}: {e}")
+            report.append({'route': route, 'params': params, 'query': str(query), 'error': str(e)})
+    return report
+
+
+def check_event_indexes(collection, create=False, explain=True):
+    """
+    校验事件集合索引并explain各查询形态
+    create=False 时只记录缺失的索引；建索引由 /api/getIndexReport?refresh=true&create=true
+    或 scripts/ensure_event_indexes.py 显式触发，避免多个worker启动时同时建索引
+    """
+    try:
+        missing = missing_indexes(collection)
+        _index_state['missing'] = [_index_key(spec['keys']) for spec in missing]
+        for spec in missing:
+            logger.warning(f"事件集合缺少索引 {_index_key(spec['keys'])}: {spec['purpose']}")
+        if missing and create:
+            _index_state['status'] = 'creating'
+            _index_state['created'] = ensure_indexes(collection, missing)
+            _index_state['missing'] = [_index_key(spec['keys']) for spec in missing_indexes(collection)]
+        elif missing:
+            logger.warning(f"事件集合缺少 {len(missing)} 个索引，未自动创建；"
+                           f"可执行 scripts/ensure_event_indexes.py 或调用 /api/getIndexReport?refresh=true&create=true")
+        _index_state['status'] = 'ok' if not _index_state['missing'] else 'missing'
+        if explain:
+            _index_state['explain'] = explain_query_shapes(collection)
+    except Exception as e:
+        logger.error(f"校验事件集合索引失败: {e}")
+        _index_state['status'] = 'error'
+    return get_index_report()
+
+
+def check_event_indexes_async(collection, create=False, explain=True):
+    """在后台线程中校验索引，避免大集合建索引拖慢服务启动或请求"""
+    thread = threading.Thread(target=check_event_indexes, args=(collection, create, explain),
+                              name='mongo-index-check', daemon=True)
+    thread.start()
+    return thread
+
+
+def get_index_report():
+    return {
+        'status': _index_state['status'],
+        'missing': [list(map(list, key)) for key in _index_state['missing']],
+        'created': list(_index_state['created']),
+        'explain': list(_index_state['explain']),
+    }
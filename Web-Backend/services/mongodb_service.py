@@ -1,18 +1,52 @@
 import os
 import pymongo
-from pymongo.errors import ConnectionFailure, ServerSelectionTimeoutError
+from pymongo.errors import ConnectionFailure, ExecutionTimeout, ServerSelectionTimeoutError
 from datetime import datetime, date, timedelta
 import json
-from bson import ObjectId
+import calendar
+from bson import ObjectId, json_util
+import bson
+import base64
 import os
 import logging
+import time
+import re
+import functools
+import threading
+from services import mongo_indexes
+from services import event_counts
+from services import mongo_async
+from services import event_watcher
+from services import export_engine
+from services import schema_migration
+from services.schema_migration import RISK_FIELD, TIME_FIELD
+from services.bigram_index import BigramIndex
+
+try:
+    import orjson  # 可选依赖，更快的JSON序列化
+except ImportError:
+    orjson = None
 
 # 使用全局变量存储连接池，确保单例
 mongodb_pool = None
 mongo_db = None
 mongo_collection_obj = None
+bigram_index = None
 logger = logging.getLogger(__name__)
 
+# 查询是否使用规范化影子字段(isRiskBool/TimeDt)：'auto'表示迁移完成后自动启用
+_normalized_state = {'mode': 'auto', 'enabled': False, 'checked_at': 0.0}
+_NORMALIZED_CHECK_INTERVAL = 60
+_bigram_config = {'max_candidates': 10000, 'path': None, 'mtime': None, 'reload_interval': 300}
+# 二元组索引构建后被修改过Event/content的文档（_id不大于max_id）：{_id: 发现修改的时间}
+# 这些文档总是交给正则校验；无法确认修改范围时（change stream断点丢失、修改过多）暂停使用索引，直到重新加载
+_bigram_dirty = {}
+_bigram_state = {'untrusted_since': None}
+_bigram_lock = threading.Lock()
+_dashboard_config = {'timeout': 30}
+# getDatabaseStats结果缓存，事件集合变更时清空
+_stats_cache = {'value': None, 'expires_at': 0.0, 'generation': 0, 'ttl': 60, 'watched_ttl': 3600}
+
 def init_mongodb_pool(app_config):
     """根据配置初始化MongoDB连接池"""
     global mongodb_pool
@@ -69,15 +103,30 @@ def init_mongodb_pool(app_config):
         
         mongo_collection_obj = mongo_db[mongo_collection]
         print(f"成功访问集合: {mongo_collection}")
-        # 在连接 MongoDB 后执行
-        try:
-            mongo_collection_obj.create_index(
-                "Event",
-                background=True  # 后台创建，不阻塞
+        _normalized_state['mode'] = app_config.get('MONGO_NORMALIZED_FIELDS', 'auto')
+        event_counts.init_count_strategies(app_config)
+        mongo_async.init_mongo_async(app_config)
+        _dashboard_config['timeout'] = app_config.get('DASHBOARD_QUERY_TIMEOUT', 30)
+        init_bigram_index(app_config)
+        if _normalized_state['mode'] and app_config.get('MONGO_NORMALIZE_INTERVAL'):
+            schema_migration.start_incremental_migration(
+                mongo_collection_obj, mongo_db, interval=app_config.get('MONGO_NORMALIZE_INTERVAL'))
+        if _normalized_state['mode']:
+            # 新增和修改的文档由变更监听立即写入影子字段
+            event_watcher.register_listener(
+                'schema_migration', lambda change: schema_migration.apply_change(mongo_collection_obj, change))
+        _stats_cache['ttl'] = app_config.get('STATS_CACHE_TTL', 60)
+        _stats_cache['watched_ttl'] = app_config.get('CHANGE_WATCH_CACHE_TTL', 3600)
+        event_watcher.register_listener('database_stats', lambda change: clear_statistics_cache())
+        if app_config.get('CHANGE_WATCH_ENABLED', True):
+            event_watcher.start_event_watcher(mongo_collection_obj, app_config)
+        # 索引由mongo_indexes统一管理：后台校验（默认只记录缺失，不创建），并explain各查询形态
+        if app_config.get('MONGO_MANAGE_INDEXES', True):
+            mongo_indexes.check_event_indexes_async(
+                mongo_collection_obj,
+                create=app_config.get('MONGO_CREATE_MISSING_INDEXES', False),
+                explain=app_config.get('MONGO_EXPLAIN_ON_STARTUP', True)
             )
-            print("已确保 Event 字段的索引存在")
-        except Exception as e:
-            print(f"创建索引失败: {e}")
         # 测试查询一个文档
         try:
             first_document = mongo_collection_obj.find_one()
@@ -105,6 +154,76 @@ def init_mongodb_pool(app_config):
         logger.error(f"连接MongoDB失败: {e}")
         return False
 
+def init_bigram_index(app_config):
+    """加载事件文本二元组倒排索引（由 scripts/build_bigram_index.py 构建），文件不存在时关键词查询直接使用正则"""
+    _bigram_config['max_candidates'] = app_config.get('BIGRAM_MAX_CANDIDATES', 10000)
+    _bigram_config['path'] = app_config.get('BIGRAM_INDEX_PATH')
+    _bigram_config['reload_interval'] = app_config.get('BIGRAM_RELOAD_INTERVAL', 300)
+    event_watcher.register_listener('bigram_index', _bigram_on_change)
+    _reload_bigram_index()
+    if _bigram_config['path'] and _bigram_config['reload_interval']:
+        threading.Thread(target=_bigram_reload_loop, name='bigram-index-reload', daemon=True).start()
+
+
+def _reload_bigram_index():
+    """索引文件有更新（定期执行 scripts/build_bigram_index.py build）时重新加载，返回是否加载了新索引"""
+    global bigram_index
+    index_path = _bigram_config['path']
+    if not index_path or not os.path.exists(index_path):
+        if _bigram_config['mtime'] is None:
+            logger.info(f"未找到二元组索引 {index_path}，关键词查询将直接使用正则匹配")
+        return False
+    mtime = os.path.getmtime(index_path)
+    if mtime == _bigram_config['mtime']:
+        return False
+    _bigram_config['mtime'] = mtime
+    try:
+        start_time = time.time()
+        index = BigramIndex.load(index_path)
+    except Exception as e:
+        logger.error(f"加载二元组索引失败: {e}")
+        return False
+    with _bigram_lock:
+        bigram_index = index
+        if index.built_at is not None:
+            # 新索引开始构建之前记录的修改已包含在索引中
+            for doc_id in [k for k, t in _bigram_dirty.items() if t < index.built_at]:
+                del _bigram_dirty[doc_id]
+            if _bigram_state['untrusted_since'] is not None and _bigram_state['untrusted_since'] < index.built_at:
+                _bigram_state['untrusted_since'] = None
+    logger.info(f"二元组索引加载成功: {len(index)} 条文档, 耗时 {time.time() - start_time:.2f}s")
+    return True
+
+
+def _bigram_reload_loop():
+    while True:
+        time.sleep(_bigram_config['reload_interval'])
+        try:
+            _reload_bigram_index()
+        except Exception as e:
+            logger.warning(f"检查二元组索引更新失败: {e}")
+
+
+def _bigram_on_change(change):
+    """
+    event_watcher监听器：索引范围内文档的被索引字段(Event/content)被修改时记入_bigram_dirty，保证关键词查询仍然精确；
+    点赞/评论数、影子字段等其他字段的修改不影响索引。
+    轮询模式无法发现修改，修改后的文本要到下一次重建索引后才能被关键词搜到
+    """
+    index = bigram_index
+    if index is None or index.max_id is None:
+        return
+    with _bigram_lock:
+        if index.affected_by(change):
+            _bigram_dirty[change['id']] = time.time()
+            if len(_bigram_dirty) > _bigram_config['max_candidates'] and _bigram_state['untrusted_since'] is None:
+                _bigram_state['untrusted_since'] = time.time()
+                logger.warning("二元组索引构建后被修改的文档过多，关键词查询暂时改用正则，等待索引重建")
+        elif change['op'] == 'invalidate' and _bigram_state['untrusted_since'] is None:
+            # change stream断点丢失，期间的修改无从得知
+            _bigram_state['untrusted_since'] = time.time()
+            logger.warning("变更监听中断且无法续传，关键词查询暂时改用正则，等待索引重建")
+
 class JSONEncoder(json.JSONEncoder):
     """用于处理ObjectId和其他MongoDB特殊类型的JSON编码器"""
     def default(self, o):
@@ -135,6 +254,29 @@ def _check_connection():
         return False
 
 
+def _json_default(o):
+    """与JSONEncoder一致的特殊类型转换，供orjson使用"""
+    if isinstance(o, ObjectId):
+        return str(o)
+    if isinstance(o, datetime):
+        return o.strftime('%Y-%m-%d %H:%M')
+    raise TypeError(f"无法序列化的类型: {type(o)}")
+
+
+def _raw_batches_to_json(raw_batches):
+    """
+    把原始BSON批次（aggregate_raw_batches）解码并序列化为JSON数组字节串
+    每条文档仍会完整解码为dict（耗时见 scripts/bench_events_json.py 的decode_only），
+    相比原路径省掉的是逐字段转换ObjectId和标准库json序列化；要减少解码量需通过fields只返回需要的字段
+    """
+    events = []
+    for batch in raw_batches:
+        events.extend(bson.decode_all(batch))
+    if orjson is not None:
+        return orjson.dumps(events, default=_json_default, option=orjson.OPT_PASSTHROUGH_DATETIME)
+    return json.dumps(events, cls=JSONEncoder, ensure_ascii=False).encode('utf-8')
+
+
 def _convert_objectid_to_string(data):
     """将数据中的ObjectId转换为字符串"""
     if isinstance(data, dict):
@@ -150,6 +292,117 @@ def _convert_objectid_to_string(data):
     return data
 
 
+def use_normalized_fields():
+    """查询是否改用影子字段；auto模式下读取迁移状态，结果缓存一段时间"""
+    mode = _normalized_state['mode']
+    if mode != 'auto':
+        return bool(mode)
+    now = time.time()
+    if now - _normalized_state['checked_at'] >= _NORMALIZED_CHECK_INTERVAL and mongo_db is not None:
+        _normalized_state['checked_at'] = now
+        try:
+            state = schema_migration.get_migration_state(mongo_db)
+            _normalized_state['enabled'] = bool(state and state.get('completed'))
+        except Exception as e:
+            logger.warning(f"读取规范化迁移状态失败: {e}")
+    return _normalized_state['enabled']
+
+
+def _strip_shadow_fields(event):
+    """影子字段只用于查询，不返回给前端"""
+    event.pop(RISK_FIELD, None)
+    event.pop(TIME_FIELD, None)
+    return event
+
+
+def _sort_field(sort_by):
+    if sort_by == 'Time' and use_normalized_fields():
+        return TIME_FIELD
+    return sort_by
+
+
+def _with_legacy_fallback(condition, shadow_field, legacy):
+    """影子字段条件，尚未补齐影子字段的文档（刚写入、增量迁移还未处理）仍按原字段条件匹配"""
+    return {"$or": [condition, {"$and": [{shadow_field: {"$exists": False}}, legacy]}]}
+
+
+def _risk_condition(value, legacy):
+    """风险条件：迁移完成后使用布尔影子字段，否则使用调用方原有的条件"""
+    if use_normalized_fields():
+        normalized = schema_migration.normalize_is_risk(value)
+        if normalized is not None:
+            return _with_legacy_fallback({RISK_FIELD: normalized}, RISK_FIELD, legacy)
+    return legacy
+
+
+def _keyword_condition(keyword, fields=None):
+    """
+    关键词子串匹配条件（不区分大小写），fields默认只匹配Event
+    有二元组索引时先由倒排求交得到候选 _id，正则只在候选和索引构建后新写入的文档上执行；
+    关键词过于常见（候选过多）时不走索引，按时间排序扫描很快就能凑满一页
+    """
+    fields = fields or ['Event']
+    pattern = re.escape(keyword)
+    regex = [{field: {"$regex": pattern, "$options": "i"}} for field in fields]
+    regex = regex[0] if len(regex) == 1 else {"$or": regex}
+    index = bigram_index
+    if index is None or _bigram_state['untrusted_since'] is not None:
+        return regex
+    try:
+        ids = index.candidates(keyword, fields=fields, max_candidates=_bigram_config['max_candidates'])
+    except Exception as e:
+        logger.warning(f"二元组索引查询失败，使用正则匹配: {e}")
+        return regex
+    if ids is None:
+        return regex
+    with _bigram_lock:
+        dirty = list(_bigram_dirty)
+    # 候选 + 构建后被修改过的文档 + 构建后新写入的文档，再由正则校验
+    scope = {"$or": [{"_id": {"$in": ids + dirty}}, {"_id": {"$gt": index.max_id}}]}
+    return {"$and": [scope, regex]}
+
+
+def _keyword_fields(params):
+    """keyword_fields参数：逗号分隔的字段名，只允许Event和content"""
+    fields = [f.strip() for f in (params.get('keyword_fields') or '').split(',') if f.strip() in ('Event', 'content')]
+    return fields or None
+
+
+def _month_end(year_month):
+    year, month = map(int, year_month.split('-'))
+    return f"{year_month}-{calendar.monthrange(year, month)[1]} 23:59"
+
+
+def _time_range_conditions(start_time, end_time):
+    """
+    时间范围条件，支持按年月筛选 (格式：YYYY-MM)
+    迁移完成后使用datetime影子字段；无法解析的输入仍按原字符串比较
+    """
+    conditions = []
+    normalized = use_normalized_fields()
+    if start_time:
+        is_month = len(start_time) == 7 and start_time[4] == '-'
+        # 年月格式，设置为当月第一天
+        legacy_start = f"{start_time}-01 00:00" if is_month else start_time
+        start_dt = schema_migration.parse_event_time(legacy_start) if normalized else None
+        if start_dt is not None:
+            conditions.append(_with_legacy_fallback({TIME_FIELD: {"$gte": start_dt}}, TIME_FIELD,
+                                                    {"Time": {"$gte": legacy_start}}))
+        else:
+            conditions.append({"Time": {"$gte": legacy_start}})
+    if end_time:
+        is_month = len(end_time) == 7 and end_time[4] == '-'
+        # 年月格式，设置为当月最后一天
+        legacy_end = _month_end(end_time) if is_month else end_time
+        end_dt = schema_migration.parse_event_time(legacy_end) if normalized else None
+        if end_dt is not None:
+            conditions.append(_with_legacy_fallback({TIME_FIELD: {"$lte": end_dt}}, TIME_FIELD,
+                                                    {"Time": {"$lte": legacy_end}}))
+        else:
+            conditions.append({"Time": {"$lte": legacy_end}})
+    return conditions
+
+
 def get_event_by_id(event_id):
     """根据ID获取事件数据"""
     if not _check_connection():
@@ -165,15 +418,39 @@ def get_event_by_id(event_id):
             event = mongo_collection_obj.find_one({'_id': event_id})
             
         if event:
-            return _convert_objectid_to_string(event)
+            return _convert_objectid_to_string(_strip_shadow_fields(event))
         return None
     except Exception as e:
         logger.error(f"获取事件数据失败: {e}")
         return None
 
 
-def search_events(query=None, page=1, page_size=100, sort_by='Time', sort_order=-1, is_export=False, streaming=False):
-    """搜索事件数据，增加重试机制和性能优化"""
+def _expand_is_risk_query(search_query):
+    """isRisk查询条件是布尔值时，同时匹配布尔值和对应的字符串"""
+    if 'isRisk' in search_query:
+        is_risk_value = search_query['isRisk']
+        if isinstance(is_risk_value, bool) and use_normalized_fields():
+            legacy = {'isRisk': {'$in': [is_risk_value, 'true' if is_risk_value else 'false']}}
+            rest = {k: v for k, v in search_query.items() if k != 'isRisk'}
+            condition = _with_legacy_fallback({RISK_FIELD: is_risk_value}, RISK_FIELD, legacy)
+            return {'$and': [rest, condition]} if rest else condition
+        if isinstance(is_risk_value, bool):
+            str_value = 'true' if is_risk_value else 'false'
+            # 构建$or条件，同时匹配布尔值和字符串
+            search_query = {
+                '$and': [
+                    {k: v for k, v in search_query.items() if k != 'isRisk'},
+                    {'$or': [
+                        {'isRisk': is_risk_value},
+                        {'isRisk': str_value}
+                    ]}
+                ]
+            }
+    return search_query
+
+
+def search_events(query=None, page=1, page_size=100, sort_by='Time', sort_order=-1, is_export=False, streaming=False, with_count=True):
+    """搜索事件数据，增加重试机制和性能优化；with_count=False时不统计总数（total返回None）"""
     logger.info(f"调用search_events: query={query}, page={page}, page_size={page_size}, is_export={is_export}, streaming={streaming}")
     
     if not _check_connection():
@@ -192,21 +469,7 @@ def search_events(query=None, page=1, page_size=100, sort_by='Time', sort_order=
             logger.info(f"执行查询: search_query={search_query}")
             
 
-            if 'isRisk' in search_query:
-                is_risk_value = search_query['isRisk']
-                # 如果查询条件是布尔值，同时查询布尔值和对应的字符串
-                if isinstance(is_risk_value, bool):
-                    str_value = 'true' if is_risk_value else 'false'
-                    # 构建$or条件，同时匹配布尔值和字符串
-                    search_query = {
-                        '$and': [
-                            {k: v for k, v in search_query.items() if k != 'isRisk'},
-                            {'$or': [
-                                {'isRisk': is_risk_value},
-                                {'isRisk': str_value}
-                            ]}
-                        ]
-                    }
+            search_query = _expand_is_risk_query(search_query)
             
             # 执行查询并分页
             skip = (page - 1) * page_size
@@ -243,7 +506,7 @@ def search_events(query=None, page=1, page_size=100, sort_by='Time', sort_order=
             # 排序 - 只对需要的字段排序
             if sort_by:
                 try:
-                    cursor = cursor.sort(sort_by, sort_order)
+                    cursor = cursor.sort(_sort_field(sort_by), sort_order)
                 except Exception as e:
                     logger.warning(f"排序失败，使用默认排序: {e}")
             
@@ -260,8 +523,11 @@ def search_events(query=None, page=1, page_size=100, sort_by='Time', sort_order=
             logger.info(f"非流式处理获取到 {len(events)} 条数据")
             
             # 转换ObjectId为字符串
-            events = [_convert_objectid_to_string(event) for event in events]
+            events = [_convert_objectid_to_string(_strip_shadow_fields(event)) for event in events]
             
+            if not with_count:
+                return events, None
+
             # 优化：先获取数据，再计算总数
             try:
                 # 对于空查询（获取所有数据），使用更高效的estimated_document_count
@@ -303,35 +569,196 @@ def search_events(query=None, page=1, page_size=100, sort_by='Time', sort_order=
             logger.error(f"搜索事件数据失败: {e}")
             return [], 0
 
+def search_events_json(query=None, page=1, page_size=100, sort_by='Time', sort_order=-1, fields=None):
+    """
+    列表快速路径：返回当前页结果数组的JSON字节串
+    _id转字符串和影子字段去除在服务端聚合中完成，fields不为空时只返回这些字段（其余字段不传输、不解码）；
+    结果以原始BSON批次读取，由C解码器整批解码为dict后一次性序列化，不再逐字段遍历、也不经过Flask重新序列化
+    """
+    if not _check_connection():
+        logger.warning("MongoDB连接不可用，返回空结果")
+        return b'[]'
+
+    page_size = max(1, min(page_size, 1000))
+    pipeline = [{'$match': _expand_is_risk_query(query or {})}]
+    if sort_by:
+        pipeline.append({'$sort': {_sort_field(sort_by): sort_order}})
+    pipeline += [{'$skip': (max(page, 1) - 1) * page_size}, {'$limit': page_size}]
+    fields = [f for f in fields or [] if f != '_id']
+    if fields:
+        pipeline.append({'$project': dict({f: 1 for f in fields}, _id={'$toString': '$_id'})})
+    else:
+        pipeline += [{'$set': {'_id': {'$toString': '$_id'}}}, {'$unset': [RISK_FIELD, TIME_FIELD]}]
+
+    try:
+        return _raw_batches_to_json(mongo_collection_obj.aggregate_raw_batches(pipeline))
+    except Exception as e:
+        logger.error(f"搜索事件数据失败: {e}")
+        return b'[]'
+
+
+def search_events_page(query=None, page=1, page_size=100, sort_by='Time', sort_order=-1, count_strategy=event_counts.COUNT_EXACT,
+                       as_json=False, fields=None):
+    """
+    分页查询 + 按策略计数（见 services/event_counts.py）
+    返回 {"results", "total", "count_type", "total_display"}；计数策略无效时抛出ValueError
+    as_json=True时results为JSON字节串（见search_events_json）
+    """
+    if count_strategy not in event_counts.COUNT_STRATEGIES:
+        raise ValueError(f"未知的计数策略: {count_strategy}，可选值: {', '.join(event_counts.COUNT_STRATEGIES)}")
+
+    if as_json:
+        events = search_events_json(query, page=page, page_size=page_size, sort_by=sort_by, sort_order=sort_order, fields=fields)
+    else:
+        events, _ = search_events(query, page=page, page_size=page_size, sort_by=sort_by, sort_order=sort_order, with_count=False)
+    page_result = {"results": events}
+    try:
+        page_result.update(event_counts.count_events(mongo_collection_obj, _expand_is_risk_query(query or {}), count_strategy))
+    except Exception as e:
+        logger.warning(f"获取总数失败: {e}")
+        # 与search_events一致：计数失败时给出保守估计，确保分页控件能正常工作
+        total = 1000 if events and events != b'[]' else 0
+        page_result.update({"total": total, "count_type": "estimated", "total_display": f"{total:,}"})
+    return page_result
+
+
+def _encode_page_cursor(event, sort_by, sort_order, direction):
+    """把页边界文档的 (排序字段值, _id) 编码为不透明的游标字符串"""
+    payload = {'f': sort_by, 'o': sort_order, 'd': direction, 'v': event.get(sort_by), 'id': event['_id']}
+    return base64.urlsafe_b64encode(json_util.dumps(payload).encode('utf-8')).decode('ascii').rstrip('=')
+
+
+def _decode_page_cursor(token, sort_by, sort_order):
+    try:
+        padded = token + '=' * (-len(token) % 4)
+        payload = json_util.loads(base64.urlsafe_b64decode(padded.encode('ascii')).decode('utf-8'))
+        direction = payload['d']
+        value, last_id = payload['v'], payload['id']
+    except Exception:
+        raise ValueError("无效的分页游标")
+    if payload.get('f') != sort_by or payload.get('o') != sort_order or direction not in ('next', 'prev'):
+        raise ValueError("分页游标与当前排序条件不一致")
+    return direction, value, last_id
+
+
+def _seek_condition(field, value, last_id, descending):
+    """
+    (field, _id) 定位条件：只匹配扫描方向上位于边界文档之后的文档
+    field为空值(null/缺失)的文档在降序中排在最后、升序中排在最前，需要单独处理
+    """
+    op = '$lt' if descending else '$gt'
+    if value is None:
+        conditions = [{field: None, '_id': {op: last_id}}]
+        if not descending:
+            conditions.append({field: {'$ne': None}})
+    else:
+        conditions = [{field: {op: value}}, {field: value, '_id': {op: last_id}}]
+        if descending:
+            conditions.append({field: None})
+    return {'$or': conditions}
+
+
+def search_events_by_cursor(query=None, cursor=None, page_size=100, sort_by='Time', sort_order=-1):
+    """
+    游标（keyset）分页：按 (sort_by, _id) 定位页边界，不使用skip，也不统计总数，
+    任意深度的页代价都与第一页相同。
+    返回 {"results", "next_cursor", "prev_cursor", "has_more"}；游标无效时抛出ValueError
+    """
+    if not _check_connection():
+        logger.warning("MongoDB连接不可用，返回空结果")
+        return {"results": [], "next_cursor": None, "prev_cursor": None, "has_more": False}
+
+    page_size = max(1, min(page_size, 1000))
+    sort_by = _sort_field(sort_by or 'Time')
+    direction = 'next'
+    search_query = _expand_is_risk_query(query or {})
+
+    if cursor:
+        direction, value, last_id = _decode_page_cursor(cursor, sort_by, sort_order)
+        # 向前翻页时按相反方向扫描，取到结果后再反转
+        descending = (sort_order == -1) == (direction == 'next')
+        seek = _seek_condition(sort_by, value, last_id, descending)
+        search_query = {'$and': [search_query, seek]} if search_query else seek
+
+    scan_order = sort_order if direction == 'next' else -sort_order
+    try:
+        events = list(
+            mongo_collection_obj.find(search_query)
+            .sort([(sort_by, scan_order), ('_id', scan_order)])
+            .limit(page_size + 1)
+        )
+    except Exception as e:
+        logger.error(f"游标分页查询失败: {e}")
+        return {"error": str(e)}
+
+    # 多取一条用于判断该方向上是否还有数据
+    has_more_in_scan = len(events) > page_size
+    events = events[:page_size]
+    if direction == 'prev':
+        events.reverse()
+
+    if direction == 'next':
+        has_more = has_more_in_scan
+        has_prev = cursor is not None
+    else:
+        has_more = True
+        has_prev = has_more_in_scan
+
+    next_cursor = _encode_page_cursor(events[-1], sort_by, sort_order, 'next') if events and has_more else None
+    prev_cursor = _encode_page_cursor(events[0], sort_by, sort_order, 'prev') if events and has_prev else None
+
+    return {
+        "results": [_convert_objectid_to_string(_strip_shadow_fields(event)) for event in events],
+        "next_cursor": next_cursor,
+        "prev_cursor": prev_cursor,
+        "has_more": has_more
+    }
+
+def clear_statistics_cache():
+    _stats_cache['value'] = None
+    _stats_cache['generation'] += 1
+
+
 def get_statistics():
-    """获取数据库统计信息"""
+    """获取数据库统计信息（两次全量计数代价较高，结果缓存到事件集合下一次变更或TTL到期）"""
     if not _check_connection():
         return {'error': 'MongoDB未连接'}
 
+    cached = _stats_cache['value']
+    if cached is not None and _stats_cache['expires_at'] > time.time():
+        return dict(cached)
+
+    generation = _stats_cache['generation']
     try:
         # 获取文档总数
         count = mongo_collection_obj.count_documents({})
         
         # 获取风险事件数量
-        risk_query = {
+        risk_query = _risk_condition(True, {
             '$or': [
                 {'isRisk': 'true'},
                 {'isRisk': True}
             ]
-        }
+        })
         risk_count = mongo_collection_obj.count_documents(risk_query)
         
         # 不使用索引相关功能，避免超时问题
         # 使用db.command获取集合统计信息，而不是直接调用stats()
         stats = mongo_db.command("collStats", mongo_collection_obj.name)
         
-        return {
+        result = {
             'total_documents': count,
             'risk_documents': risk_count,
             'collection_size': stats.get('size', 0),
             'avg_document_size': stats.get('avgObjSize', 0),
             # 不返回索引大小相关信息
         }
+        ttl = _stats_cache['watched_ttl'] if event_watcher.invalidation_reliable() else _stats_cache['ttl']
+        # 统计期间发生变更时不缓存本次结果
+        if generation == _stats_cache['generation']:
+            _stats_cache['value'] = result
+            _stats_cache['expires_at'] = time.time() + ttl
+        return dict(result)
     except Exception as e:
         logger.error(f"获取数据库统计信息失败: {e}")
         # 出错时返回基本统计信息，避免API完全不可用
@@ -368,34 +795,11 @@ def get_all_events_query(params=None):
             conditions.append({"region": region})
         
         # 处理时间范围查询，支持按年月筛选 (格式：YYYY-MM)
-        if start_time:
-            if len(start_time) == 7 and start_time[4] == '-':  # 检查是否是年月格式 (YYYY-MM)
-                # 年月格式，设置为当月第一天
-                year_month = start_time
-                # 直接使用日期范围查询，不使用正则匹配
-                conditions.append({"Time": {"$gte": f"{year_month}-01 00:00"}})
-            else:
-                conditions.append({"Time": {"$gte": start_time}})
-        if end_time:
-            if len(end_time) == 7 and end_time[4] == '-':  # 检查是否是年月格式 (YYYY-MM)
-                # 年月格式，设置为当月最后一天
-                year_month = end_time
-                # 解析年月
-                year, month = map(int, year_month.split('-'))
-                # 计算当月最后一天
-                if month == 12:
-                    last_day = 31
-                else:
-                    last_day = (date(year, month + 1, 1) - timedelta(days=1)).day
-                # 直接使用日期范围查询，不使用正则匹配
-                conditions.append({"Time": {"$lte": f"{year_month}-{last_day} 23:59"}})
-            else:
-                conditions.append({"Time": {"$lte": end_time}})
+        conditions.extend(_time_range_conditions(start_time, end_time))
         
-        # 如果提供了关键词参数，添加到查询条件中（不区分大小写）
+        # 如果提供了关键词参数，添加到查询条件中（子串匹配，不区分大小写）
         if keyword:
-            # 改为前缀匹配，确保能用索引
-            conditions.append({"Event": {"$regex": f"^{keyword}", "$options": "i"}})
+            conditions.append(_keyword_condition(keyword, _keyword_fields(params)))
         
         # 组合查询条件
         if len(conditions) > 0:
@@ -423,8 +827,8 @@ def get_risk_events_query(params=None):
         end_time = params.get('end_time', '')
         keyword = params.get('keyword', '')
         
-        # 构建查询条件，只获取isRisk=true的事件（true是以字符串形式存储）
-        conditions = [{"isRisk": "true"}]
+        # 构建查询条件，只获取isRisk=true的事件（未迁移时true是以字符串形式存储）
+        conditions = [_risk_condition(True, {"isRisk": "true"})]
         
         # 如果提供了平台参数，添加到查询条件中
         if platform:
@@ -435,34 +839,11 @@ def get_risk_events_query(params=None):
             conditions.append({"region": region})
         
         # 处理时间范围查询，支持按年月筛选 (格式：YYYY-MM)
-        if start_time:
-            if len(start_time) == 7 and start_time[4] == '-':  # 检查是否是年月格式 (YYYY-MM)
-                # 年月格式，设置为当月第一天
-                year_month = start_time
-                # 直接使用日期范围查询，不使用正则匹配
-                conditions.append({"Time": {"$gte": f"{year_month}-01 00:00"}})
-            else:
-                conditions.append({"Time": {"$gte": start_time}})
-        if end_time:
-            if len(end_time) == 7 and end_time[4] == '-':  # 检查是否是年月格式 (YYYY-MM)
-                # 年月格式，设置为当月最后一天
-                year_month = end_time
-                # 解析年月
-                year, month = map(int, year_month.split('-'))
-                # 计算当月最后一天
-                if month == 12:
-                    last_day = 31
-                else:
-                    last_day = (date(year, month + 1, 1) - timedelta(days=1)).day
-                # 直接使用日期范围查询，不使用正则匹配
-                conditions.append({"Time": {"$lte": f"{year_month}-{last_day} 23:59"}})
-            else:
-                conditions.append({"Time": {"$lte": end_time}})
+        conditions.extend(_time_range_conditions(start_time, end_time))
         
-        # 如果提供了关键词参数，添加到查询条件中（不区分大小写）
+        # 如果提供了关键词参数，添加到查询条件中（子串匹配，不区分大小写）
         if keyword:
-            # 改为前缀匹配，确保能用索引
-            conditions.append({"Event": {"$regex": f"^{keyword}", "$options": "i"}})
+            conditions.append(_keyword_condition(keyword, _keyword_fields(params)))
         
         # 组合查询条件
         if len(conditions) > 1:
@@ -473,373 +854,526 @@ def get_risk_events_query(params=None):
         return query
     except Exception as e:
         logger.error(f"构建风险事件查询条件失败: {e}")
-        return {"isRisk": "true"}
+        return _risk_condition(True, {"isRisk": "true"})
 
-def get_dashboard_metrics():    
-    """获取仪表盘指标数据，高效查询真实数据"""
-    if not _check_connection():
-        return {'error': 'MongoDB未连接'}
+def get_export_events_query(params=None):
+    """构建导出事件的查询条件"""
+    params = params or {}
+    keyword = params.get('keyword', '')
+    region = params.get('region', '')
+    start_time = params.get('start_time', '')
+    end_time = params.get('end_time', '')
+    is_risk = params.get('is_risk', '')
+    platform = params.get('platform', '')
+
+    query = {}
+    conditions = []
+
+    if keyword:
+        conditions.append(_keyword_condition(keyword, _keyword_fields(params)))
+
+    if region:
+        conditions.append({"region": region})
+
+    # 处理时间范围查询，支持按年月筛选 (格式：YYYY-MM)
+    conditions.extend(_time_range_conditions(start_time, end_time))
+
+    if is_risk:
+        conditions.append(_risk_condition(is_risk, {"isRisk": is_risk}))
 
+    if platform:
+        conditions.append({"platform": platform})
+
+    # 组合查询条件
+    if len(conditions) > 0:
+        if len(conditions) > 1:
+            query = {"$and": conditions}
+        else:
+            query = conditions[0]
+
+    return query
+
+def get_export_partition_queries(params, partitions):
+    """
+    把导出的时间范围均分为partitions段，返回互不重叠的分段查询条件（半开区间，最后一段包含终点）
+    未同时指定起止时间或无法解析时返回None，表示不分段
+    """
+    params = params or {}
+    start_time, end_time = params.get('start_time', ''), params.get('end_time', '')
+    if partitions <= 1 or not start_time or not end_time:
+        return None
+    start_dt = schema_migration.parse_event_time(f"{start_time}-01 00:00" if len(start_time) == 7 else start_time)
+    end_dt = schema_migration.parse_event_time(_month_end(end_time) if len(end_time) == 7 else end_time)
+    if start_dt is None or end_dt is None or end_dt <= start_dt:
+        return None
+
+    base_query = get_export_events_query(dict(params, start_time='', end_time=''))
+    normalized = use_normalized_fields()
+    ranges = export_engine.split_time_range(start_dt, end_dt, partitions)
+    queries = []
+    for i, (lower, upper) in enumerate(ranges):
+        upper_op = '$lte' if i == len(ranges) - 1 else '$lt'
+        # 原Time字段为分钟精度字符串，相邻分段使用同一个边界字符串，不重不漏
+        legacy = {'Time': {'$gte': lower.strftime('%Y-%m-%d %H:%M'), upper_op: upper.strftime('%Y-%m-%d %H:%M')}}
+        if normalized:
+            condition = _with_legacy_fallback({TIME_FIELD: {'$gte': lower, upper_op: upper}}, TIME_FIELD, legacy)
+        else:
+            condition = legacy
+        queries.append({'$and': [base_query, condition]} if base_query else condition)
+    return queries
+
+
+def _remaining_ms(deadline):
+    """统计项剩余的服务端执行时间(毫秒)，截止时间已过时抛出ExecutionTimeout"""
+    remaining = int((deadline - time.monotonic()) * 1000)
+    if remaining <= 0:
+        raise ExecutionTimeout("仪表盘统计项已超过截止时间，不再执行回退查询")
+    return remaining
+
+
+def _dashboard_total_count(max_time_ms):
+    """仪表盘指标：文档总数"""
+    metrics = {}
+    # 1. 文档总数 - 使用最高效的查询方法
     try:
-        # 构建返回结果
-        metrics = {}
+        # 使用estimated_document_count，这是获取总数最快的方法
+        metrics['count1'] = mongo_collection_obj.estimated_document_count(maxTimeMS=max_time_ms)
+        logger.info(f"成功获取文档总数: {metrics['count1']}")
+    except Exception as e:
+        logger.warning(f"获取文档总数失败: {e}")
+        # 查询失败时返回0
+        metrics['count1'] = 0
+    return metrics
+
+
+def _dashboard_risk_count(max_time_ms):
+    """仪表盘指标：风险事件数量"""
+    metrics = {}
+    # 2. 风险事件数量 - 优化查询
+    try:
+        logger.info("开始查询风险事件数量")
+        # 处理isRisk字段的不同类型
+        risk_query = _risk_condition(True, {
+            '$or': [
+                {'isRisk': 'true'},
+                {'isRisk': True}
+            ]
+        })
         
-        # 1. 文档总数 - 使用最高效的查询方法
-        try:
-            # 使用estimated_document_count，这是获取总数最快的方法
-            metrics['count1'] = mongo_collection_obj.estimated_document_count()
-            logger.info(f"成功获取文档总数: {metrics['count1']}")
-        except Exception as e:
-            logger.warning(f"获取文档总数失败: {e}")
-            # 查询失败时返回0
-            metrics['count1'] = 0
+        # 使用count_documents查询风险事件数量
+        risk_count = mongo_collection_obj.count_documents(risk_query, limit=100000, maxTimeMS=max_time_ms)  # 设置上限避免查询过大
+        metrics['risk_count'] = risk_count
+        logger.info(f"成功获取风险事件数量: {risk_count}")
+    except Exception as e:
+        logger.warning(f"获取风险事件数量失败: {e}")
+        metrics['risk_count'] = 0
+    return metrics
+
+
+def _dashboard_platforms(max_time_ms):
+    """仪表盘指标：平台分布"""
+    # 回退查询与主查询共用同一截止时间，超过后不再发起新的查询
+    deadline = time.monotonic() + max_time_ms / 1000
+    metrics = {}
+    # 3. 平台分布 - 使用更高效的方法获取真实数据，增加超时时间和重试机制
+    try:
+        logger.info("开始查询平台分布数据")
         
-        # 2. 风险事件数量 - 优化查询
-        try:
-            logger.info("开始查询风险事件数量")
-            # 处理isRisk字段的不同类型
-            risk_query = {
-                '$or': [
-                    {'isRisk': 'true'},
-                    {'isRisk': True}
-                ]
-            }
-            
-            # 使用count_documents查询风险事件数量
-            risk_count = mongo_collection_obj.count_documents(risk_query, limit=100000)  # 设置上限避免查询过大
-            metrics['risk_count'] = risk_count
-            logger.info(f"成功获取风险事件数量: {risk_count}")
-        except Exception as e:
-            logger.warning(f"获取风险事件数量失败: {e}")
-            metrics['risk_count'] = 0
+        # 优化的平台分布查询，使用更大的超时时间
+        pipeline = [
+            # 只包含有platform字段的文档
+            {'$match': {'platform': {'$exists': True, '$ne': None, '$ne': ''}}},
+            # 按platform分组并计数
+            {'$group': {'_id': '$platform', 'count': {'$sum': 1}}},
+            # 按计数降序排列
+            {'$sort': {'count': -1}},
+            # 只返回前10个平台
+            {'$limit': 10}
+        ]
         
-        # 3. 平台分布 - 使用更高效的方法获取真实数据，增加超时时间和重试机制
-        try:
-            logger.info("开始查询平台分布数据")
+        # 超时时间与仪表盘查询截止时间一致
+        platform_results = list(mongo_collection_obj.aggregate(pipeline, maxTimeMS=max_time_ms))
+
+        # 处理结果
+        platform_counts = {}
+        unique_platforms = []
+
+        for result in platform_results:
+            platform = result['_id']
+            count = result['count']
             
-            # 优化的平台分布查询，使用更大的超时时间
-            pipeline = [
-                # 只包含有platform字段的文档
-                {'$match': {'platform': {'$exists': True, '$ne': None, '$ne': ''}}},
-                # 按platform分组并计数
-                {'$group': {'_id': '$platform', 'count': {'$sum': 1}}},
-                # 按计数降序排列
-                {'$sort': {'count': -1}},
-                # 只返回前10个平台
-                {'$limit': 10}
-            ]
+            # 如果平台包含"微博"，则统一归类为"微博"
+            if '微博' in platform:
+                platform = '微博'
             
-            # 增加超时时间到30秒，确保有足够时间完成查询
-            platform_results = list(mongo_collection_obj.aggregate(pipeline, maxTimeMS=30000))
-            platform_results = list(mongo_collection_obj.aggregate(pipeline, maxTimeMS=30000))
+            # 统计计数
+            if platform in platform_counts:
+                platform_counts[platform] += count
+            else:
+                platform_counts[platform] = count
+                unique_platforms.append(platform)
 
-            # 处理结果
+        metrics['platforms'] = unique_platforms
+        metrics['platform_count'] = len(unique_platforms)
+        metrics['platform_counts'] = platform_counts
+        
+        logger.info(f"成功获取平台分布数据: {len(unique_platforms)}个平台")
+    except Exception as e:
+        logger.warning(f"获取平台信息失败: {e}")
+        # 增加查询重试机制
+        try:
+            logger.info("尝试使用更简单的查询获取平台数据")
+            # 改进重试机制：使用distinct获取所有平台，然后单独统计数量
             platform_counts = {}
-            unique_platforms = []
-
-            for result in platform_results:
-                platform = result['_id']
-                count = result['count']
+            
+            try:
+                # 先获取所有唯一的平台值
+                all_platforms = mongo_collection_obj.distinct('platform', maxTimeMS=_remaining_ms(deadline))
                 
-                # 如果平台包含"微博"，则统一归类为"微博"
-                if '微博' in platform:
-                    platform = '微博'
+                # 为每个平台单独统计数量（限制为前20个以避免过多查询）
+                for platform in all_platforms:
+                    if platform and platform != '':
+                        count = mongo_collection_obj.count_documents({'platform': platform}, maxTimeMS=_remaining_ms(deadline))
+                        platform_counts[platform] = count
                 
-                # 统计计数
-                if platform in platform_counts:
-                    platform_counts[platform] += count
-                else:
-                    platform_counts[platform] = count
-                    unique_platforms.append(platform)
-
+                # 按计数排序并取前10个
+                sorted_platforms = sorted(platform_counts.items(), key=lambda x: x[1], reverse=True)[:10]
+                
+                unique_platforms = [p[0] for p in sorted_platforms]
+                platform_counts = dict(sorted_platforms)
+                
+            except Exception as distinct_e:
+                logger.warning(f"distinct方法失败，回退到采样方法: {distinct_e}")
+                # 如果distinct方法失败，回退到采样方法，但增加样本量
+                sample_docs = mongo_collection_obj.find(
+                    {'platform': {'$exists': True, '$ne': None, '$ne': ''}},
+                    {'platform': 1},
+                    max_time_ms=_remaining_ms(deadline)
+                ).limit(5000)
+                
+                # 手动统计样本中的平台分布
+                platform_counts = {}
+                for doc in sample_docs:
+                    platform = doc.get('platform')
+                    if platform:
+                        platform_counts[platform] = platform_counts.get(platform, 0) + 1
+                
+                # 按计数排序并取前10个
+                sorted_platforms = sorted(platform_counts.items(), key=lambda x: x[1], reverse=True)[:10]
+                
+                unique_platforms = [p[0] for p in sorted_platforms]
+                platform_counts = dict(sorted_platforms)
+            
+            # 设置结果
             metrics['platforms'] = unique_platforms
             metrics['platform_count'] = len(unique_platforms)
             metrics['platform_counts'] = platform_counts
             
-            logger.info(f"成功获取平台分布数据: {len(unique_platforms)}个平台")
-        except Exception as e:
-            logger.warning(f"获取平台信息失败: {e}")
-            # 增加查询重试机制
-            try:
-                logger.info("尝试使用更简单的查询获取平台数据")
-                # 改进重试机制：使用distinct获取所有平台，然后单独统计数量
-                platform_counts = {}
-                
-                try:
-                    # 先获取所有唯一的平台值
-                    all_platforms = mongo_collection_obj.distinct('platform')
-                    
-                    # 为每个平台单独统计数量（限制为前20个以避免过多查询）
-                    for platform in all_platforms:
-                        if platform and platform != '':
-                            count = mongo_collection_obj.count_documents({'platform': platform})
-                            platform_counts[platform] = count
-                    
-                    # 按计数排序并取前10个
-                    sorted_platforms = sorted(platform_counts.items(), key=lambda x: x[1], reverse=True)[:10]
-                    
-                    unique_platforms = [p[0] for p in sorted_platforms]
-                    platform_counts = dict(sorted_platforms)
-                    
-                except Exception as distinct_e:
-                    logger.warning(f"distinct方法失败，回退到采样方法: {distinct_e}")
-                    # 如果distinct方法失败，回退到采样方法，但增加样本量
-                    sample_docs = mongo_collection_obj.find(
-                        {'platform': {'$exists': True, '$ne': None, '$ne': ''}},
-                        {'platform': 1}
-                    ).limit(5000)
-                    
-                    # 手动统计样本中的平台分布
-                    platform_counts = {}
-                    for doc in sample_docs:
-                        platform = doc.get('platform')
-                        if platform:
-                            platform_counts[platform] = platform_counts.get(platform, 0) + 1
-                    
-                    # 按计数排序并取前10个
-                    sorted_platforms = sorted(platform_counts.items(), key=lambda x: x[1], reverse=True)[:10]
-                    
-                    unique_platforms = [p[0] for p in sorted_platforms]
-                    platform_counts = dict(sorted_platforms)
-                
-                # 设置结果
-                metrics['platforms'] = unique_platforms
-                metrics['platform_count'] = len(unique_platforms)
-                metrics['platform_counts'] = platform_counts
-                
-                logger.info(f"成功使用简单查询获取平台分布数据: {len(unique_platforms)}个平台")
-            except Exception as retry_e:
-                logger.error(f"重试获取平台信息也失败: {retry_e}")
-                # 查询失败时返回空数据
-                metrics['platforms'] = []
-                metrics['platform_count'] = 0
-                metrics['platform_counts'] = {}
-        
-        # 4. 字段列表和总数
-        try:
-            # 获取一个文档来获取所有字段
-            sample_doc = mongo_collection_obj.find_one({}, {"_id": 0})
-            if sample_doc:
-                field_names = list(sample_doc.keys())
-                field_count = len(field_names)
-                metrics['fields'] = field_names
-                metrics['field_count'] = field_count
-            else:
-                # 如果没有找到文档，使用预定义的字段列表
-                metrics['fields'] = ["Event", "Content", "Time", "URL", "User", "UserID", "platform", "region", "Language", "isRisk", "Praise", "Reblog", "Comment", "MediaURL", "Latitude", "Longitude", "Keywords"]
-                metrics['field_count'] = len(metrics['fields'])
-        except Exception as e:
-            logger.warning(f"获取字段列表失败: {e}")
+            logger.info(f"成功使用简单查询获取平台分布数据: {len(unique_platforms)}个平台")
+        except Exception as retry_e:
+            logger.error(f"重试获取平台信息也失败: {retry_e}")
+            # 查询失败时返回空数据
+            metrics['platforms'] = []
+            metrics['platform_count'] = 0
+            metrics['platform_counts'] = {}
+    return metrics
+
+
+def _dashboard_fields(max_time_ms):
+    """仪表盘指标：字段列表"""
+    metrics = {}
+    # 4. 字段列表和总数
+    try:
+        # 获取一个文档来获取所有字段
+        sample_doc = mongo_collection_obj.find_one({}, {"_id": 0}, max_time_ms=max_time_ms)
+        if sample_doc:
+            field_names = list(sample_doc.keys())
+            field_count = len(field_names)
+            metrics['fields'] = field_names
+            metrics['field_count'] = field_count
+        else:
+            # 如果没有找到文档，使用预定义的字段列表
             metrics['fields'] = ["Event", "Content", "Time", "URL", "User", "UserID", "platform", "region", "Language", "isRisk", "Praise", "Reblog", "Comment", "MediaURL", "Latitude", "Longitude", "Keywords"]
             metrics['field_count'] = len(metrics['fields'])
+    except Exception as e:
+        logger.warning(f"获取字段列表失败: {e}")
+        metrics['fields'] = ["Event", "Content", "Time", "URL", "User", "UserID", "platform", "region", "Language", "isRisk", "Praise", "Reblog", "Comment", "MediaURL", "Latitude", "Longitude", "Keywords"]
+        metrics['field_count'] = len(metrics['fields'])
+    return metrics
+
+
+def _dashboard_interactions(max_time_ms):
+    """仪表盘指标：互动总量"""
+    # 回退查询与主查询共用同一截止时间，超过后不再发起新的查询
+    deadline = time.monotonic() + max_time_ms / 1000
+    metrics = {}
+    # 5. 互动总量 - 优化聚合查询，使用采样方法
+    try:
+        logger.info("开始查询互动总量数据")
+        
+        # 优化的数据总数查询，包括data_num和转赞评总量
+        pipeline = [
+            # 分组计算总和 - 不使用match和sample以提高性能
+            {'$group': {
+                '_id': None,
+                'total_data_num': {'$sum': {'$ifNull': ['$data_num', 0]}},
+                'total_praise': {'$sum': {'$ifNull': ['$Praise', 0]}},
+                'total_reblog': {'$sum': {'$ifNull': ['$Reblog', 0]}},
+                'total_comment': {'$sum': {'$ifNull': ['$Comment', 0]}}
+            }}
+        ]
+        
+        # 超时时间与仪表盘查询截止时间一致
+        result = list(mongo_collection_obj.aggregate(pipeline, maxTimeMS=max_time_ms))
         
-        # 5. 互动总量 - 优化聚合查询，使用采样方法
+        if result:
+            stats = result[0]
+            # 计算data_num总和和转赞评总和
+            total_data_num = stats.get("total_data_num", 0)
+            total_praise = stats.get("total_praise", 0)
+            total_reblog = stats.get("total_reblog", 0)
+            total_comment = stats.get("total_comment", 0)
+            
+            # 按照用户需求：数据总数 = 每个数据的data_num + 转赞评的总量
+            interaction_sum = total_praise + total_reblog + total_comment
+            total_nums = total_data_num + interaction_sum
+            
+            metrics['total_data_num'] = total_data_num
+            metrics['total_praise'] = total_praise
+            metrics['total_reblog'] = total_reblog
+            metrics['total_comment'] = total_comment
+            metrics['interaction_sum'] = interaction_sum
+            metrics['total_nums'] = total_nums
+            
+            logger.info(f"成功获取互动总量数据")
+        else:
+            metrics['total_nums'] = 0
+            metrics['total_praise'] = 0
+            metrics['total_reblog'] = 0
+            metrics['total_comment'] = 0
+    except Exception as e:
+        logger.warning(f"聚合查询失败: {e}")
+        # 增加查询重试机制
         try:
-            logger.info("开始查询互动总量数据")
+            logger.info("尝试使用更简单的查询获取互动数据")
+            # 使用更简单的查询，只获取少量样本
+            sample_docs = mongo_collection_obj.find(
+                {'$and': [
+                    {'Praise': {'$exists': True}},
+                    {'Reblog': {'$exists': True}},
+                    {'Comment': {'$exists': True}}
+                ]},
+                {'Praise': 1, 'Reblog': 1, 'Comment': 1},
+                max_time_ms=_remaining_ms(deadline)
+            ).limit(1000)
             
-            # 优化的数据总数查询，包括data_num和转赞评总量
-            pipeline = [
-                # 分组计算总和 - 不使用match和sample以提高性能
-                {'$group': {
-                    '_id': None,
-                    'total_data_num': {'$sum': {'$ifNull': ['$data_num', 0]}},
-                    'total_praise': {'$sum': {'$ifNull': ['$Praise', 0]}},
-                    'total_reblog': {'$sum': {'$ifNull': ['$Reblog', 0]}},
-                    'total_comment': {'$sum': {'$ifNull': ['$Comment', 0]}}
-                }}
-            ]
+            # 手动计算样本中的data_num总和和转赞评总和
+            total_data_num = 0
+            total_praise = 0
+            total_reblog = 0
+            total_comment = 0
+            
+            for doc in sample_docs:
+                # 确保data_num的值被正确计算，即使为None也处理为0
+                data_num_value = doc.get('data_num', 0)
+                if isinstance(data_num_value, (int, float)):
+                    total_data_num += data_num_value
+                else:
+                    # 尝试转换非数字类型的值
+                    try:
+                        total_data_num += int(data_num_value)
+                    except (ValueError, TypeError):
+                        total_data_num += 0
+                
+                total_praise += doc.get('Praise', 0)
+                total_reblog += doc.get('Reblog', 0)
+                total_comment += doc.get('Comment', 0)
+            
+            # 按照用户需求：数据总数 = 每个数据的data_num + 转赞评的总量
+            interaction_sum = total_praise + total_reblog + total_comment
+            total_nums = total_data_num + interaction_sum
+            
+            metrics['total_data_num'] = total_data_num
+            metrics['total_praise'] = total_praise
+            metrics['total_reblog'] = total_reblog
+            metrics['total_comment'] = total_comment
+            metrics['interaction_sum'] = interaction_sum
+            metrics['total_nums'] = total_nums
             
-            # 增加超时时间到30秒
-            result = list(mongo_collection_obj.aggregate(pipeline, maxTimeMS=30000))
+            logger.info(f"成功使用简单查询获取互动总量数据")
+        except Exception as retry_e:
+            logger.error(f"重试获取互动数据也失败: {retry_e}")
+            # 查询失败时返回0值
+            metrics['total_nums'] = 0
+            metrics['total_data_num'] = 0
+            metrics['total_praise'] = 0
+            metrics['total_reblog'] = 0
+            metrics['total_comment'] = 0
+            metrics['interaction_sum'] = 0
+    return metrics
+
+
+def _dashboard_languages(max_time_ms):
+    """仪表盘指标：语言分布"""
+    # 回退查询与主查询共用同一截止时间，超过后不再发起新的查询
+    deadline = time.monotonic() + max_time_ms / 1000
+    metrics = {}
+    # 6. 语言分布 - 使用更高效的方法获取真实数据，增加超时时间
+    try:
+        logger.info("开始查询语言分布数据")
+        
+        # 优化的语言分布查询，使用更大的超时时间
+        pipeline = [
+            # 只包含有language字段的文档
+            {'$match': {'language': {'$exists': True, '$ne': None, '$ne': ''}}},
+            # 按language分组并计数
+            {'$group': {'_id': '$language', 'count': {'$sum': 1}}},
+            # 按计数降序排列
+            {'$sort': {'count': -1}},
+            # 只返回前5种语言
+            {'$limit': 5}
+        ]
+        
+        # 超时时间与仪表盘查询截止时间一致
+        language_results = list(mongo_collection_obj.aggregate(pipeline, maxTimeMS=max_time_ms))
+        
+        # 处理结果
+        language_counts = {}
+        unique_languages = []
+        
+        for result in language_results:
+            language = result['_id']
+            count = result['count']
+            language_counts[language] = count
+            unique_languages.append(language)
+        
+        metrics['languages'] = unique_languages
+        metrics['language_count'] = len(unique_languages)
+        metrics['language_counts'] = language_counts
+        
+        logger.info(f"成功获取语言分布数据: {len(unique_languages)}种语言")
+    except Exception as e:
+        logger.warning(f"获取语言信息失败: {e}")
+        # 增加查询重试机制
+        try:
+            logger.info("尝试使用更简单的查询获取语言数据")
+            # 改进重试机制：使用distinct获取所有语言，然后单独统计数量
+            language_counts = {}
             
-            if result:
-                stats = result[0]
-                # 计算data_num总和和转赞评总和
-                total_data_num = stats.get("total_data_num", 0)
-                total_praise = stats.get("total_praise", 0)
-                total_reblog = stats.get("total_reblog", 0)
-                total_comment = stats.get("total_comment", 0)
+            try:
+                # 先获取所有唯一的语言值
+                all_languages = mongo_collection_obj.distinct('language', maxTimeMS=_remaining_ms(deadline))
                 
-                # 按照用户需求：数据总数 = 每个数据的data_num + 转赞评的总量
-                interaction_sum = total_praise + total_reblog + total_comment
-                total_nums = total_data_num + interaction_sum
+                # 为每个语言单独统计数量
+                for language in all_languages:
+                    if language and language != '':
+                        count = mongo_collection_obj.count_documents({'language': language}, maxTimeMS=_remaining_ms(deadline))
+                        language_counts[language] = count
                 
-                metrics['total_data_num'] = total_data_num
-                metrics['total_praise'] = total_praise
-                metrics['total_reblog'] = total_reblog
-                metrics['total_comment'] = total_comment
-                metrics['interaction_sum'] = interaction_sum
-                metrics['total_nums'] = total_nums
+                # 按计数排序并取前5个
+                sorted_languages = sorted(language_counts.items(), key=lambda x: x[1], reverse=True)[:5]
                 
-                logger.info(f"成功获取互动总量数据")
-            else:
-                metrics['total_nums'] = 0
-                metrics['total_praise'] = 0
-                metrics['total_reblog'] = 0
-                metrics['total_comment'] = 0
-        except Exception as e:
-            logger.warning(f"聚合查询失败: {e}")
-            # 增加查询重试机制
-            try:
-                logger.info("尝试使用更简单的查询获取互动数据")
-                # 使用更简单的查询，只获取少量样本
-                sample_docs = mongo_collection_obj.find(
-                    {'$and': [
-                        {'Praise': {'$exists': True}},
-                        {'Reblog': {'$exists': True}},
-                        {'Comment': {'$exists': True}}
-                    ]},
-                    {'Praise': 1, 'Reblog': 1, 'Comment': 1}
-                ).limit(1000)
+                unique_languages = [l[0] for l in sorted_languages]
+                language_counts = dict(sorted_languages)
                 
-                # 手动计算样本中的data_num总和和转赞评总和
-                total_data_num = 0
-                total_praise = 0
-                total_reblog = 0
-                total_comment = 0
+            except Exception as distinct_e:
+                logger.warning(f"distinct方法失败，回退到采样方法: {distinct_e}")
+                # 如果distinct方法失败，回退到采样方法，但增加样本量
+                sample_docs = mongo_collection_obj.find(
+                    {'language': {'$exists': True, '$ne': None, '$ne': ''}},
+                    {'language': 1},
+                    max_time_ms=_remaining_ms(deadline)
+                ).limit(5000)
                 
+                # 手动统计样本中的语言分布
+                language_counts = {}
                 for doc in sample_docs:
-                    # 确保data_num的值被正确计算，即使为None也处理为0
-                    data_num_value = doc.get('data_num', 0)
-                    if isinstance(data_num_value, (int, float)):
-                        total_data_num += data_num_value
-                    else:
-                        # 尝试转换非数字类型的值
-                        try:
-                            total_data_num += int(data_num_value)
-                        except (ValueError, TypeError):
-                            total_data_num += 0
-                    
-                    total_praise += doc.get('Praise', 0)
-                    total_reblog += doc.get('Reblog', 0)
-                    total_comment += doc.get('Comment', 0)
-                
-                # 按照用户需求：数据总数 = 每个数据的data_num + 转赞评的总量
-                interaction_sum = total_praise + total_reblog + total_comment
-                total_nums = total_data_num + interaction_sum
+                    language = doc.get('language')
+                    if language:
+                        language_counts[language] = language_counts.get(language, 0) + 1
                 
-                metrics['total_data_num'] = total_data_num
-                metrics['total_praise'] = total_praise
-                metrics['total_reblog'] = total_reblog
-                metrics['total_comment'] = total_comment
-                metrics['interaction_sum'] = interaction_sum
-                metrics['total_nums'] = total_nums
+                # 按计数排序并取前5个
+                sorted_languages = sorted(language_counts.items(), key=lambda x: x[1], reverse=True)[:5]
                 
-                logger.info(f"成功使用简单查询获取互动总量数据")
-            except Exception as retry_e:
-                logger.error(f"重试获取互动数据也失败: {retry_e}")
-                # 查询失败时返回0值
-                metrics['total_nums'] = 0
-                metrics['total_data_num'] = 0
-                metrics['total_praise'] = 0
-                metrics['total_reblog'] = 0
-                metrics['total_comment'] = 0
-                metrics['interaction_sum'] = 0
-        
-        # 6. 语言分布 - 使用更高效的方法获取真实数据，增加超时时间
-        try:
-            logger.info("开始查询语言分布数据")
-            
-            # 优化的语言分布查询，使用更大的超时时间
-            pipeline = [
-                # 只包含有language字段的文档
-                {'$match': {'language': {'$exists': True, '$ne': None, '$ne': ''}}},
-                # 按language分组并计数
-                {'$group': {'_id': '$language', 'count': {'$sum': 1}}},
-                # 按计数降序排列
-                {'$sort': {'count': -1}},
-                # 只返回前5种语言
-                {'$limit': 5}
-            ]
-            
-            # 增加超时时间到30秒，确保有足够时间完成查询
-            language_results = list(mongo_collection_obj.aggregate(pipeline, maxTimeMS=30000))
-            
-            # 处理结果
-            language_counts = {}
-            unique_languages = []
-            
-            for result in language_results:
-                language = result['_id']
-                count = result['count']
-                language_counts[language] = count
-                unique_languages.append(language)
+                unique_languages = [l[0] for l in sorted_languages]
+                language_counts = dict(sorted_languages)
             
+            # 设置结果
             metrics['languages'] = unique_languages
             metrics['language_count'] = len(unique_languages)
             metrics['language_counts'] = language_counts
             
-            logger.info(f"成功获取语言分布数据: {len(unique_languages)}种语言")
-        except Exception as e:
-            logger.warning(f"获取语言信息失败: {e}")
-            # 增加查询重试机制
-            try:
-                logger.info("尝试使用更简单的查询获取语言数据")
-                # 改进重试机制：使用distinct获取所有语言，然后单独统计数量
-                language_counts = {}
-                
-                try:
-                    # 先获取所有唯一的语言值
-                    all_languages = mongo_collection_obj.distinct('language')
-                    
-                    # 为每个语言单独统计数量
-                    for language in all_languages:
-                        if language and language != '':
-                            count = mongo_collection_obj.count_documents({'language': language})
-                            language_counts[language] = count
-                    
-                    # 按计数排序并取前5个
-                    sorted_languages = sorted(language_counts.items(), key=lambda x: x[1], reverse=True)[:5]
-                    
-                    unique_languages = [l[0] for l in sorted_languages]
-                    language_counts = dict(sorted_languages)
-                    
-                except Exception as distinct_e:
-                    logger.warning(f"distinct方法失败，回退到采样方法: {distinct_e}")
-                    # 如果distinct方法失败，回退到采样方法，但增加样本量
-                    sample_docs = mongo_collection_obj.find(
-                        {'language': {'$exists': True, '$ne': None, '$ne': ''}},
-                        {'language': 1}
-                    ).limit(5000)
-                    
-                    # 手动统计样本中的语言分布
-                    language_counts = {}
-                    for doc in sample_docs:
-                        language = doc.get('language')
-                        if language:
-                            language_counts[language] = language_counts.get(language, 0) + 1
-                    
-                    # 按计数排序并取前5个
-                    sorted_languages = sorted(language_counts.items(), key=lambda x: x[1], reverse=True)[:5]
-                    
-                    unique_languages = [l[0] for l in sorted_languages]
-                    language_counts = dict(sorted_languages)
-                
-                # 设置结果
-                metrics['languages'] = unique_languages
-                metrics['language_count'] = len(unique_languages)
-                metrics['language_counts'] = language_counts
-                
-                logger.info(f"成功使用简单查询获取语言分布数据: {len(unique_languages)}种语言")
-            except Exception as retry_e:
-                logger.error(f"重试获取语言信息也失败: {retry_e}")
-                # 查询失败时返回空数据
-                metrics['languages'] = []
-                metrics['language_count'] = 0
-                metrics['language_counts'] = {}
-        
-        # 添加当前数据库集合信息
-        try:
-            metrics['collections'] = mongo_db.list_collection_names()
-        except Exception as e:
-            logger.warning(f"获取集合列表失败: {e}")
-            metrics['collections'] = []
-        
+            logger.info(f"成功使用简单查询获取语言分布数据: {len(unique_languages)}种语言")
+        except Exception as retry_e:
+            logger.error(f"重试获取语言信息也失败: {retry_e}")
+            # 查询失败时返回空数据
+            metrics['languages'] = []
+            metrics['language_count'] = 0
+            metrics['language_counts'] = {}
+    return metrics
+
+
+def _dashboard_collections(max_time_ms):
+    """仪表盘指标：数据库集合列表"""
+    metrics = {}
+    # 添加当前数据库集合信息
+    try:
+        metrics['collections'] = mongo_db.list_collection_names()
+    except Exception as e:
+        logger.warning(f"获取集合列表失败: {e}")
+        metrics['collections'] = []
+    return metrics
+
+
+# 仪表盘各项统计相互独立，超时未完成时使用的默认值
+_DASHBOARD_FALLBACK_FIELDS = ["Event", "Content", "Time", "URL", "User", "UserID", "platform", "region", "Language", "isRisk", "Praise", "Reblog", "Comment", "MediaURL", "Latitude", "Longitude", "Keywords"]
+_DASHBOARD_SECTIONS = [
+    ('total_count', _dashboard_total_count, {'count1': 0}),
+    ('risk_count', _dashboard_risk_count, {'risk_count': 0}),
+    ('platforms', _dashboard_platforms, {'platforms': [], 'platform_count': 0, 'platform_counts': {}}),
+    ('fields', _dashboard_fields, {'fields': _DASHBOARD_FALLBACK_FIELDS, 'field_count': len(_DASHBOARD_FALLBACK_FIELDS)}),
+    ('interactions', _dashboard_interactions, {'total_nums': 0, 'total_data_num': 0, 'total_praise': 0,
+                                               'total_reblog': 0, 'total_comment': 0, 'interaction_sum': 0}),
+    ('languages', _dashboard_languages, {'languages': [], 'language_count': 0, 'language_counts': {}}),
+    ('collections', _dashboard_collections, {'collections': []}),
+]
+
+
+def get_dashboard_metrics(timeout=None):
+    """
+    实时统计仪表盘指标（全集合扫描）；接口默认读取 dashboard_rollup 中的预计算汇总
+    各项统计在查询线程池中并发执行，总耗时取决于最慢的一项；
+    超过timeout秒（默认DASHBOARD_QUERY_TIMEOUT）未完成的统计项使用默认值，并列在timed_out中
+    """
+    if not _check_connection():
+        return {'error': 'MongoDB未连接'}
+
+    timeout = timeout or _dashboard_config['timeout']
+    max_time_ms = int(timeout * 1000)
+    try:
+        results = mongo_async.gather(
+            {name: functools.partial(section, max_time_ms) for name, section, _ in _DASHBOARD_SECTIONS},
+            timeout=timeout
+        )
+
+        # 构建返回结果
+        metrics = {}
+        timed_out = []
+        for name, _, defaults in _DASHBOARD_SECTIONS:
+            ok, value = results[name]
+            if ok:
+                metrics.update(value)
+            else:
+                logger.warning(f"仪表盘统计项 {name} 失败: {value}")
+                metrics.update(defaults)
+                timed_out.append(name)
+        if timed_out:
+            metrics['timed_out'] = timed_out
+
         # 添加数据库状态信息
         metrics['db_status'] = 'connected'
-        
+
         return metrics
     except Exception as e:
         logger.error(f"获取仪表盘指标失败: {e}")
         return {'error': str(e), 'db_status': 'error'}
-
@@ -1,5 +1,11 @@
 import os
+import re
+import json
+import base64
 import logging
+import threading
+import time
+from bisect import bisect_right
 from datetime import datetime
 from neo4j import GraphDatabase, basic_auth
 
@@ -9,6 +15,18 @@ logger = logging.getLogger(__name__)
 # 使用全局变量存储驱动实例，确保单例
 neo4j_driver = None
 
+# INFO全文索引：CJK分析器把中文切分为二元组，短语查询即子串匹配
+FULLTEXT_FIELDS = ['text', 'title', 'element_topic', 'info_class']
+_fulltext_config = {'index': 'infoFulltext', 'analyzer': 'cjk', 'max_hits': 1000}
+_fulltext_state = {'available': False}
+
+# INFO节点内存快照：分析员导入新案例时才会变化，列表/搜索/统计/详情优先从快照读取
+_snapshot_config = {'enabled': True, 'check_interval': 30, 'max_age': 3600, 'version_field': 'update_time'}
+_snapshot_lock = threading.Lock()
+_snapshot_state = {'last_check_at': None, 'last_refresh_at': None, 'last_error': None, 'refreshes': 0}
+_snapshot_thread = None
+fake_info_snapshot = None
+
 
 def init_neo4j_pool(app_config):
     """初始化Neo4j连接池"""
@@ -48,6 +66,17 @@ def init_neo4j_pool(app_config):
                 logger.info(f"Neo4j数据库连接成功: {neo4j_uri}")
                 print(f"Neo4j数据库连接成功: {neo4j_uri}")
         
+        _fulltext_config['index'] = app_config.get('NEO4J_FULLTEXT_INDEX', 'infoFulltext')
+        _fulltext_config['analyzer'] = app_config.get('NEO4J_FULLTEXT_ANALYZER', 'cjk')
+        _fulltext_config['max_hits'] = app_config.get('NEO4J_FULLTEXT_MAX_HITS', 1000)
+        ensure_fulltext_index()
+
+        _snapshot_config['enabled'] = app_config.get('NEO4J_SNAPSHOT_ENABLED', True)
+        _snapshot_config['check_interval'] = app_config.get('NEO4J_SNAPSHOT_CHECK_INTERVAL', 30)
+        _snapshot_config['max_age'] = app_config.get('NEO4J_SNAPSHOT_MAX_AGE', 3600)
+        _snapshot_config['version_field'] = app_config.get('NEO4J_SNAPSHOT_VERSION_FIELD', 'update_time')
+        start_snapshot_refresher()
+
         print("Neo4j服务初始化完成")
         return True
         
@@ -81,6 +110,205 @@ def close_neo4j_connection():
         logger.info("Neo4j驱动连接已关闭")
         print("Neo4j驱动连接已关闭")
     
+# ================= INFO节点内存快照 =================
+
+# 详情接口返回的INFO字段（与get_fake_info_detail的查询一致）
+FAKE_INFO_DETAIL_FIELDS = ['id', 'date', 'reposts_num', 'infoId', 'picture_url', 'element_time', 'element_topic',
+                           'comments_num', 'source', 'likes_num', 'video_url', 'info_class', 'event_type',
+                           'element_character', 'element_place', 'text', 'user', 'modal']
+
+
+def _to_float(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return 0.0
+
+
+def _id_str(value):
+    return str(value) if value is not None else None
+
+
+class FakeInfoSnapshot:
+    """
+    INFO节点的只读列式快照：每个属性一列（与节点顺序对齐，缺失的属性为None），
+    另外预先计算检索用的小写文本列、influence_score列、按infoId/id的查找表和列表排序。
+    快照构建后不再修改，刷新时整体替换模块级引用，读取方拿到引用后即可无锁访问。
+    """
+
+    def __init__(self, infos, version, graph_counts):
+        self.version = version
+        self.built_at = time.time()
+        self.size = len(infos)
+        self.fields = sorted({key for info in infos for key in info})
+        self.columns = {f: [info.get(f) for info in infos] for f in self.fields}
+        empty = [None] * self.size
+        self._search_columns = [
+            [value.lower() if isinstance(value, str) else '' for value in self.columns.get(f, empty)]
+            for f in FULLTEXT_FIELDS
+        ]
+        self._influence = [_to_float(v) for v in self.columns.get('influence_score', empty)]
+
+        # 按infoId、id查找节点序号（同一取值可能对应多个节点）
+        self._info_ids = [_id_str(v) for v in self.columns.get('infoId', empty)]
+        self._ids = [_id_str(v) for v in self.columns.get('id', empty)]
+        self._by_info_id, self._by_id = {}, {}
+        for lookup, values in ((self._by_info_id, self._info_ids), (self._by_id, self._ids)):
+            for i, value in enumerate(values):
+                if value is not None:
+                    lookup.setdefault(value, []).append(i)
+
+        # 列表排序键与get_fake_info_page的Cypher一致：coalesce(toString(infoId), toString(id), '')
+        self._sort_keys = [a if a is not None else (b if b is not None else '') for a, b in zip(self._info_ids, self._ids)]
+        self._order = sorted(range(self.size), key=self._sort_keys.__getitem__)
+        self._ordered_keys = [self._sort_keys[i] for i in self._order]
+
+        categories = {v for v in self.columns.get('info_class', []) if v is not None}
+        self.stats = {
+            "entityCount": graph_counts['nodes'],
+            "relationCount": graph_counts['relations'],
+            "infoModalCount": self.size,
+            "fakeNewsCategoryCount": len(categories),
+        }
+
+    def __len__(self):
+        return self.size
+
+    def row(self, i, fields=None):
+        """按列还原第i个节点；fields为None时返回全部已有属性，否则按字段投影（缺失为None），title缺失时取正文前50字"""
+        if fields is None:
+            return _with_title({f: self.columns[f][i] for f in self.fields if self.columns[f][i] is not None})
+        info = {f: self.columns[f][i] if f in self.columns else None for f in fields}
+        if 'title' in info and info['title'] is None:
+            text = self.columns['text'][i] if 'text' in self.columns else None
+            if isinstance(text, str):
+                info['title'] = text[:50] + '...' if len(text) > 50 else text
+        return info
+
+    def all(self):
+        return [self.row(i) for i in range(self.size)]
+
+    def detail(self, fake_id):
+        """与get_fake_info_detail一致：先按infoId查找，再按id查找，未找到返回None"""
+        key = str(fake_id)
+        matches = self._by_info_id.get(key) or self._by_id.get(key)
+        if not matches:
+            return None
+        i = matches[0]
+        return {f: self.columns[f][i] if f in self.columns else None for f in FAKE_INFO_DETAIL_FIELDS}
+
+    def search(self, keyword, limit=50):
+        """四个文本字段子串匹配，按influence_score、关键词出现次数（作为score返回）从高到低排序"""
+        keyword = keyword.lower()
+        hits = []
+        for i in range(self.size):
+            score = sum(column[i].count(keyword) for column in self._search_columns)
+            if score:
+                hits.append((-self._influence[i], -score, i))
+        hits.sort()
+        return [dict(self.row(i), score=-neg_score) for _, neg_score, i in hits[:limit]]
+
+    def page(self, pinned_ids, fields, page_size, after_rank, after_key):
+        """
+        get_fake_info_page的内存实现，排序规则相同：(置顶序号, 排序键)，置顶序号优先按infoId匹配
+        返回最多page_size + 1条 [(字段投影, 置顶序号, 排序键)]
+        """
+        first_rank = {}
+        for rank, value in enumerate(pinned_ids):
+            first_rank.setdefault(value, rank)
+        pinned_rank = {}
+        matched = {i for v in first_rank for i in self._by_info_id.get(v, []) + self._by_id.get(v, [])}
+        for i in matched:
+            rank = first_rank.get(self._info_ids[i])
+            pinned_rank[i] = rank if rank is not None else first_rank[self._ids[i]]
+
+        unpinned_rank = len(pinned_ids)
+        pinned = sorted((rank, self._sort_keys[i], i) for i, rank in pinned_rank.items())
+        selected = [item for item in pinned if item[:2] > (after_rank, after_key)][:page_size + 1]
+        if len(selected) <= page_size:
+            start = 0 if after_rank < unpinned_rank else bisect_right(self._ordered_keys, after_key)
+            for i in self._order[start:]:
+                if i in pinned_rank:
+                    continue
+                selected.append((unpinned_rank, self._sort_keys[i], i))
+                if len(selected) > page_size:
+                    break
+        return [(self.row(i, fields), rank, key) for rank, key, i in selected]
+
+
+def _snapshot_version():
+    """INFO节点数和版本字段最大值，任一变化即认为知识库有更新"""
+    result = execute_query(
+        "MATCH (i:INFO) RETURN count(i) AS total, max(i[$field]) AS max_updated",
+        {'field': _snapshot_config['version_field']}
+    )
+    return (result[0]['total'], str(result[0]['max_updated'])) if result else (0, 'None')
+
+
+def refresh_fake_info_snapshot(force=False):
+    """
+    检查INFO版本，变化（或快照超过NEO4J_SNAPSHOT_MAX_AGE秒）时重新加载，返回当前快照
+    版本在加载数据之前读取，加载期间的写入会在下一次检查时被发现
+    """
+    global fake_info_snapshot
+    with _snapshot_lock:
+        version = _snapshot_version()
+        _snapshot_state['last_check_at'] = time.time()
+        current = fake_info_snapshot
+        expired = current is not None and bool(_snapshot_config['max_age']) and \
+            time.time() - current.built_at >= _snapshot_config['max_age']
+        if current is not None and current.version == version and not expired and not force:
+            return current
+
+        start_time = time.time()
+        infos = [dict(record['info']) for record in execute_query("MATCH (i:INFO) RETURN i {.*} AS info")]
+        node_result = execute_query("MATCH (n) RETURN count(n) AS total")
+        relation_result = execute_query("MATCH ()-[r]->() RETURN count(r) AS total")
+        graph_counts = {'nodes': node_result[0]['total'] if node_result else 0,
+                        'relations': relation_result[0]['total'] if relation_result else 0}
+        # 整体替换引用，正在读取旧快照的请求不受影响
+        fake_info_snapshot = FakeInfoSnapshot(infos, version, graph_counts)
+        _snapshot_state['last_refresh_at'] = time.time()
+        _snapshot_state['refreshes'] += 1
+        logger.info(f"INFO快照已刷新: {len(infos)} 个节点, 版本 {version}, 耗时 {time.time() - start_time:.2f}s")
+        return fake_info_snapshot
+
+
+def get_fake_info_snapshot():
+    """返回当前快照；未启用或尚未加载成功时返回None，调用方直接查询Neo4j"""
+    return fake_info_snapshot if _snapshot_config['enabled'] else None
+
+
+def get_snapshot_state():
+    snapshot = fake_info_snapshot
+    return dict(_snapshot_state, enabled=_snapshot_config['enabled'],
+                size=len(snapshot) if snapshot is not None else None,
+                version=list(snapshot.version) if snapshot is not None else None)
+
+
+def _snapshot_loop():
+    while True:
+        try:
+            refresh_fake_info_snapshot()
+            _snapshot_state['last_error'] = None
+        except Exception as e:
+            # 刷新失败时继续使用旧快照
+            _snapshot_state['last_error'] = str(e)
+            logger.warning(f"INFO快照刷新失败: {e}")
+        time.sleep(_snapshot_config['check_interval'])
+
+
+def start_snapshot_refresher():
+    """启动后台快照刷新线程（每个进程一个），首次加载也在后台完成，不阻塞启动"""
+    global _snapshot_thread
+    if not _snapshot_config['enabled'] or _snapshot_thread is not None:
+        return _snapshot_thread
+    _snapshot_thread = threading.Thread(target=_snapshot_loop, name='neo4j-info-snapshot', daemon=True)
+    _snapshot_thread.start()
+    logger.info(f"INFO快照后台刷新已启动: 检查间隔 {_snapshot_config['check_interval']}s")
+    return _snapshot_thread
+
+
     # ================= 虚假信息知识库相关查询方法 =================
     
 def get_comments_by_info_id(info_id, limit=50):
@@ -142,6 +370,9 @@ def get_reposts_by_info_id(info_id, limit=50):
     
 def get_all_fake_info():
     """获取所有虚假信息"""
+    snapshot = get_fake_info_snapshot()
+    if snapshot is not None:
+        return snapshot.all()
     try:
         # 只查询INFO节点
         query = """
@@ -165,10 +396,101 @@ def get_all_fake_info():
         # 如果查询失败，返回空列表
         return []
     
+# 列表页默认返回的INFO摘要字段（不含正文全文和URL列表）
+FAKE_INFO_SUMMARY_FIELDS = ['id', 'infoId', 'title', 'date', 'element_topic', 'info_class', 'source', 'user', 'modal',
+                            'reposts_num', 'comments_num', 'likes_num', 'influence_score']
+_FIELD_NAME_RE = re.compile(r'^[A-Za-z_][A-Za-z0-9_]*$')
+
+
+def _encode_list_cursor(rank, key):
+    payload = json.dumps({'r': rank, 'k': key}, ensure_ascii=False).encode('utf-8')
+    return base64.urlsafe_b64encode(payload).decode('ascii')
+
+
+def _decode_list_cursor(token):
+    try:
+        payload = json.loads(base64.urlsafe_b64decode(token.encode('ascii')).decode('utf-8'))
+        return int(payload['r']), str(payload['k'])
+    except Exception:
+        raise ValueError("无效的分页游标")
+
+
+def get_fake_info_page(pinned_ids=None, fields=None, page_size=20, cursor=None):
+    """
+    分页获取虚假信息摘要：pinned_ids中的信息按列表顺序排在最前，其余按infoId排序；
+    排序、投影和分页都在Neo4j中完成，每次只返回一页指定字段。
+    返回 {"data", "next_cursor", "has_more", "total"}；游标或字段名无效时抛出ValueError
+    """
+    fields = fields or FAKE_INFO_SUMMARY_FIELDS
+    invalid = [f for f in fields if not _FIELD_NAME_RE.match(f)]
+    if invalid:
+        raise ValueError(f"无效的字段名: {', '.join(invalid)}")
+    pinned_ids = [str(i) for i in pinned_ids or []]
+    page_size = max(1, min(int(page_size), 200))
+    after_rank, after_key = _decode_list_cursor(cursor) if cursor else (-1, '')
+
+    snapshot = get_fake_info_snapshot()
+    if snapshot is not None:
+        rows = snapshot.page(pinned_ids, fields, page_size, after_rank, after_key)
+        has_more = len(rows) > page_size
+        rows = rows[:page_size]
+        return {
+            'data': [info for info, _, _ in rows],
+            'next_cursor': _encode_list_cursor(rows[-1][1], rows[-1][2]) if has_more else None,
+            'has_more': has_more,
+            'total': None if cursor else len(snapshot),
+        }
+
+    # 字段名已校验，只能是属性标识符；title缺失时取正文前50字，与get_all_fake_info一致
+    projection = ', '.join(
+        "title: coalesce(i.title, CASE WHEN size(i.text) > 50 THEN left(i.text, 50) + '...' ELSE i.text END)"
+        if f == 'title' else f".{f}" for f in fields
+    )
+    query = f"""
+    MATCH (i:INFO)
+    WITH i, coalesce(toString(i.infoId), toString(i.id), '') AS sort_key
+    WITH i, sort_key, coalesce(
+        [x IN range(0, size($pinned) - 1) WHERE $pinned[x] = toString(i.infoId)][0],
+        [x IN range(0, size($pinned) - 1) WHERE $pinned[x] = toString(i.id)][0],
+        size($pinned)
+    ) AS pin_rank
+    WHERE pin_rank > $after_rank OR (pin_rank = $after_rank AND sort_key > $after_key)
+    RETURN i {{{projection}}} AS info, pin_rank, sort_key
+    ORDER BY pin_rank, sort_key
+    LIMIT $limit
+    """
+    params = {'pinned': pinned_ids, 'after_rank': after_rank, 'after_key': after_key, 'limit': page_size + 1}
+
+    # 多取一条用于判断是否还有下一页
+    records = execute_query(query, params)
+    has_more = len(records) > page_size
+    records = records[:page_size]
+    next_cursor = _encode_list_cursor(records[-1]['pin_rank'], records[-1]['sort_key']) if has_more else None
+
+    total = None
+    if not cursor:
+        # 总数只在第一页返回，INFO节点计数由Neo4j计数存储直接给出
+        count_result = execute_query("MATCH (i:INFO) RETURN count(i) AS total")
+        total = count_result[0]['total'] if count_result else 0
+
+    return {
+        'data': [dict(record['info']) for record in records],
+        'next_cursor': next_cursor,
+        'has_more': has_more,
+        'total': total,
+    }
+
 def get_fake_info_detail(fake_id):
     """获取虚假信息详情"""
     # 确保fake_id是字符串类型，以兼容Neo4j数据库的存储方式
     fake_id_str = str(fake_id)
+
+    # 快照中没有时（例如刚导入、快照尚未刷新）再查询Neo4j
+    snapshot = get_fake_info_snapshot()
+    if snapshot is not None:
+        detail = snapshot.detail(fake_id_str)
+        if detail is not None:
+            return detail
     
     # 根据数据列表中使用的字段名(infoId)，调整查询逻辑
     # 首先尝试使用infoId属性查询
@@ -216,6 +538,81 @@ def get_fake_info_detail(fake_id):
         return None
 
 
+def ensure_fulltext_index():
+    """创建INFO全文索引（已存在时跳过），失败时搜索退化为CONTAINS扫描"""
+    name, analyzer = _fulltext_config['index'], _fulltext_config['analyzer']
+    # 索引DDL不支持参数，名称和分析器只接受字母、数字、下划线和连字符
+    if not re.fullmatch(r'[A-Za-z_][A-Za-z0-9_]*', name) or not re.fullmatch(r'[A-Za-z0-9_-]+', analyzer):
+        logger.error(f"全文索引名称或分析器不合法: {name}, {analyzer}")
+        _fulltext_state['available'] = False
+        return False
+    fields = ', '.join(f"n.{f}" for f in FULLTEXT_FIELDS)
+    try:
+        execute_query(
+            f"CREATE FULLTEXT INDEX {name} IF NOT EXISTS FOR (n:INFO) ON EACH [{fields}] "
+            f"OPTIONS {{indexConfig: {{`fulltext.analyzer`: '{analyzer}'}}}}"
+        )
+        result = execute_query("SHOW INDEXES YIELD name, type, state WHERE name = $name RETURN type, state", {'name': name})
+        _fulltext_state['available'] = bool(result) and result[0]['type'] == 'FULLTEXT'
+        logger.info(f"INFO全文索引 {name} 状态: {result[0]['state'] if result else '不存在'}")
+    except Exception as e:
+        _fulltext_state['available'] = False
+        logger.warning(f"创建INFO全文索引失败，搜索将使用CONTAINS扫描: {e}")
+    return _fulltext_state['available']
+
+
+def _fulltext_phrase(keyword):
+    """把关键词转换为Lucene短语查询，转义短语内的反斜杠和引号"""
+    return '"' + keyword.replace('\\', '\\\\').replace('"', '\\"') + '"'
+
+
+def _with_title(info):
+    """统一返回格式：title缺失时取正文前50字"""
+    if not info.get('title') and info.get('text'):
+        info['title'] = info['text'][:50] + '...' if len(info['text']) > 50 else info['text']
+    return info
+
+
+def search_fake_info(keyword, limit=50):
+    """
+    按关键词搜索虚假信息，结果按influence_score从高到低排序，并返回score
+    已加载INFO快照时在内存中匹配（score为关键词出现次数），否则查询Neo4j（score为全文相关度）；
+    有全文索引时只读取命中的节点（最多NEO4J_FULLTEXT_MAX_HITS个），耗时与命中数相关而与知识库大小无关；
+    单字关键词（CJK分析器按二元组切分，单字无法命中）或索引不可用时退化为CONTAINS扫描，排序和limit同样在Cypher中完成
+    """
+    keyword = (keyword or '').strip()
+    if not keyword:
+        return []
+
+    snapshot = get_fake_info_snapshot()
+    if snapshot is not None:
+        return snapshot.search(keyword, limit)
+
+    if _fulltext_state['available'] and len(keyword) > 1:
+        query = """
+        CALL db.index.fulltext.queryNodes($index, $phrase, {limit: $max_hits}) YIELD node, score
+        RETURN node {.*, score: score} AS info
+        ORDER BY toFloat(coalesce(node.influence_score, 0)) DESC, score DESC
+        LIMIT $limit
+        """
+        params = {'index': _fulltext_config['index'], 'phrase': _fulltext_phrase(keyword),
+                  'max_hits': _fulltext_config['max_hits'], 'limit': limit}
+        try:
+            return [_with_title(dict(record['info'])) for record in execute_query(query, params)]
+        except Exception as e:
+            logger.warning(f"全文索引搜索失败，改用CONTAINS扫描: {e}")
+
+    fields_match = ' OR '.join(f"toLower(i.{f}) CONTAINS $keyword" for f in FULLTEXT_FIELDS)
+    query = f"""
+    MATCH (i:INFO)
+    WHERE {fields_match}
+    RETURN i {{.*}} AS info
+    ORDER BY toFloat(coalesce(i.influence_score, 0)) DESC
+    LIMIT $limit
+    """
+    return [_with_title(dict(record['info'])) for record in execute_query(query, {'keyword': keyword.lower(), 'limit': limit})]
+
+
 def get_fake_info_by_keyword(keyword, limit=50):
     """根据关键词查询虚假信息"""
     query = """
@@ -310,6 +707,9 @@ __init__()
     
 def get_fake_knowledge_stats():
     """获取虚假信息知识库统计数据"""
+    snapshot = get_fake_info_snapshot()
+    if snapshot is not None:
+        return dict(snapshot.stats)
     try:
         # 查询所有节点数量（实体数）
         node_count_query = "MATCH (n) RETURN count(n) AS total_nodes"
@@ -347,54 +747,161 @@ def get_fake_knowledge_stats():
             "fakeNewsCategoryCount": 10
         }
     
-def get_fake_info_graph(fake_id):
-    """获取虚假信息传播图谱"""
-    # 确保fake_id是字符串类型，以兼容Neo4j数据库的存储方式
-    fake_id_str = str(fake_id)
-    
-    # 首先尝试使用infoId属性查询
-    query_info_id = """
-    MATCH (i:INFO {infoId: $fake_id_str})
+# 传播图谱各邻域（发布者、评论及评论者、子评论及其发布者、转发及转发者、相关用户间的关注）
+# 分别在独立的CALL {}子查询中展开并聚合，每个子查询只返回一行，
+# 避免连续OPTIONAL MATCH产生 评论数 × 转发数 × 用户数 的中间行；无匹配时聚合仍返回一行空列表
+_GRAPH_NEIGHBOURHOODS = """
+CALL {
+    WITH i
     OPTIONAL MATCH (i)<-[:post]-(pu:USER)
+    RETURN collect(DISTINCT pu) AS post_users
+}
+CALL {
+    WITH i
     OPTIONAL MATCH (i)<-[:review1]-(c:COMMENT)
-    OPTIONAL MATCH (i)<-[:review3]-(r:REPOST)
     OPTIONAL MATCH (c)<-[:issue]-(cu:USER)
-    OPTIONAL MATCH (r)<-[:perform]-(ru:USER)
-    OPTIONAL MATCH (c)<-[:review2]-(cc:COMMENT)
+    RETURN collect(DISTINCT c) AS comments, collect(DISTINCT cu) AS comment_users
+}
+CALL {
+    WITH i
+    OPTIONAL MATCH (i)<-[:review1]-(:COMMENT)<-[:review2]-(cc:COMMENT)
     OPTIONAL MATCH (cc)<-[:issue]-(ccu:USER)
-    OPTIONAL MATCH (pu)-[:follow]->(cu)
-    OPTIONAL MATCH (pu)-[:follow]->(ru)
-    OPTIONAL MATCH (pu)-[:follow]->(ccu)
-    OPTIONAL MATCH (cu)-[:follow]->(ru)
-    OPTIONAL MATCH (ru)-[:follow]->(cu)
-    OPTIONAL MATCH (ccu)-[:follow]->(cu)
-    OPTIONAL MATCH (cu)-[:follow]->(ccu)
-    RETURN i, collect(DISTINCT pu) AS post_users, collect(DISTINCT c) AS comments, collect(DISTINCT r) AS reposts,
-           collect(DISTINCT cu) AS comment_users, collect(DISTINCT ru) AS repost_users,
-           collect(DISTINCT cc) AS child_comments, collect(DISTINCT ccu) AS child_comment_users
-    """
-    
-    # 如果infoId查询失败，尝试使用id属性查询
-    query_id = """
-    MATCH (i:INFO {id: $fake_id_str})
-    OPTIONAL MATCH (i)<-[:post]-(pu:USER)
-    OPTIONAL MATCH (i)<-[:review1]-(c:COMMENT)
+    RETURN collect(DISTINCT cc) AS child_comments, collect(DISTINCT ccu) AS child_comment_users
+}
+CALL {
+    WITH i
     OPTIONAL MATCH (i)<-[:review3]-(r:REPOST)
-    OPTIONAL MATCH (c)<-[:issue]-(cu:USER)
     OPTIONAL MATCH (r)<-[:perform]-(ru:USER)
-    OPTIONAL MATCH (c)<-[:review2]-(cc:COMMENT)
-    OPTIONAL MATCH (cc)<-[:issue]-(ccu:USER)
-    OPTIONAL MATCH (pu)-[:follow]->(cu)
-    OPTIONAL MATCH (pu)-[:follow]->(ru)
-    OPTIONAL MATCH (pu)-[:follow]->(ccu)
-    OPTIONAL MATCH (cu)-[:follow]->(ru)
-    OPTIONAL MATCH (ru)-[:follow]->(cu)
-    OPTIONAL MATCH (ccu)-[:follow]->(cu)
-    OPTIONAL MATCH (cu)-[:follow]->(ccu)
-    RETURN i, collect(DISTINCT pu) AS post_users, collect(DISTINCT c) AS comments, collect(DISTINCT r) AS reposts,
-           collect(DISTINCT cu) AS comment_users, collect(DISTINCT ru) AS repost_users,
-           collect(DISTINCT cc) AS child_comments, collect(DISTINCT ccu) AS child_comment_users
+    RETURN collect(DISTINCT r) AS reposts, collect(DISTINCT ru) AS repost_users
+}
+CALL {
+    // 关注关系：发布者 -> 评论者/转发者/子评论者，评论者 <-> 转发者，评论者 <-> 子评论者
+    WITH post_users, comment_users, repost_users, child_comment_users
+    UNWIND [[post_users, comment_users + repost_users + child_comment_users],
+            [comment_users, repost_users + child_comment_users],
+            [repost_users, comment_users],
+            [child_comment_users, comment_users]] AS pair
+    UNWIND pair[0] AS a
+    MATCH (a)-[:follow]->(b:USER)
+    WHERE b IN pair[1]
+    RETURN collect(DISTINCT [a.userId, b.userId]) AS follows
+}
+RETURN i, post_users, comments, reposts, comment_users, repost_users,
+       child_comments, child_comment_users, follows
+"""
+
+
+def _graph_query(key_property):
+    """按INFO的infoId或id属性定位节点的传播图谱查询（属性写在模式中以使用索引）"""
+    return f"MATCH (i:INFO {{{key_property}: $fake_id_str}})" + _GRAPH_NEIGHBOURHOODS
+
+
+def _graph_edge(src, dst, e_type, src_type, src_props, dst_type, dst_props):
+    return {'e_src': src, 'e_dst': dst, 'e_type': e_type, 'src_type': src_type, 'src_props': src_props,
+            'dst_type': dst_type, 'dst_props': dst_props}
+
+
+def _build_graph_edges(data):
+    """
+    把传播图谱查询结果转换为前端使用的边列表（post/review1/issue/review3/perform/review2/follow）
+    评论、转发、用户先各按id建立一次索引，再一次遍历生成所有边；
+    同一节点在多条边中共用同一个属性字典，不按边复制
     """
+    info = data['i']
+    main_node_id = info.get('infoId', info.get('id', ''))
+    text = info.get('text') or ''
+    info_props = {'title': text[:50] + '...' if len(text) > 50 else text, 'isrumor': True}
+
+    # 用户名：优先使用user_name，其次是name，最后用默认值
+    id2name = {}
+    for key in ('post_users', 'comment_users', 'repost_users', 'child_comment_users'):
+        for user in data.get(key) or []:
+            if user:
+                user_id = user.get('userId', str(id(user)))
+                if user_id not in id2name:
+                    id2name[user_id] = user.get('user_name', user.get('name', '')) or f"用户{str(user_id)[:6]}"
+    user_props = {}
+
+    def _user_props(user_id):
+        props = user_props.get(user_id)
+        if props is None:
+            name = id2name.get(user_id, f"用户{str(user_id)[:6]}" if user_id else '未知用户')
+            props = user_props[user_id] = {'name': name}
+        return props
+
+    comments = [c for c in data.get('comments') or [] if c]
+    reposts = [r for r in data.get('reposts') or [] if r]
+    child_comments = [c for c in data.get('child_comments') or [] if c]
+
+    # 评论属性按id索引，子评论的父评论先在主评论中查找，再在子评论中查找
+    comment_props = [{'content': c.get('commentText', '')} for c in comments]
+    child_props = [{'content': c.get('commentText', '')} for c in child_comments]
+    main_by_id, child_by_id = {}, {}
+    for lookup, nodes, props_list in ((main_by_id, comments, comment_props), (child_by_id, child_comments, child_props)):
+        for node, props in zip(nodes, props_list):
+            if props['content']:
+                lookup.setdefault(node.get('commentId'), props)
+    missing_parent_props = {'content': '评论内容未找到'}
+
+    results = []
+    for post_user in data.get('post_users') or []:
+        if post_user:
+            user_id = post_user.get('userId', str(id(post_user)))
+            results.append(_graph_edge(user_id, main_node_id, 'post', 'USER', {
+                'name': id2name.get(user_id, f"用户{str(user_id)[:6]}" if user_id else '未知用户'),
+                'user_name': post_user.get('user_name', ''),
+                'userId': user_id,
+                'follows_num': post_user.get('follows_num', 0),
+                'fans_num': post_user.get('fans_num', 0),
+                'gender': post_user.get('gender', ''),
+                'influence_score': post_user.get('influence_score', 0),
+                'ip_address': post_user.get('ip_address', ''),
+                'verifiedType': post_user.get('verifiedType', '')
+            }, 'INFO', info_props))
+
+    for comment, props in zip(comments, comment_props):
+        comment_id = comment.get('commentId', str(id(comment)))
+        results.append(_graph_edge(comment_id, main_node_id, 'review1', 'COMMENT', props, 'INFO', info_props))
+        if 'user' in comment:
+            results.append(_graph_edge(comment['user'], comment_id, 'issue', 'USER', _user_props(comment['user']),
+                                       'COMMENT', props))
+
+    for repost in reposts:
+        repost_id = repost.get('repostId', str(id(repost)))
+        props = {'content': repost.get('repostText', '转发')}
+        results.append(_graph_edge(repost_id, main_node_id, 'review3', 'REPOST', props, 'INFO', info_props))
+        if 'user' in repost:
+            results.append(_graph_edge(repost['user'], repost_id, 'perform', 'USER', _user_props(repost['user']),
+                                       'REPOST', props))
+
+    for child_comment, props in zip(child_comments, child_props):
+        parent_comment_id = child_comment.get('superior_node')
+        if not parent_comment_id:
+            continue
+        child_comment_id = child_comment.get('commentId', str(id(child_comment)))
+        results.append(_graph_edge(child_comment_id, parent_comment_id, 'review2', 'COMMENT', props, 'COMMENT',
+                                   main_by_id.get(parent_comment_id) or child_by_id.get(parent_comment_id)
+                                   or missing_parent_props))
+        if 'user' in child_comment:
+            results.append(_graph_edge(child_comment['user'], child_comment_id, 'issue', 'USER',
+                                       _user_props(child_comment['user']), 'COMMENT', props))
+
+    # 关注关系来自查询中的follows列（图谱相关用户之间实际存在的follow关系）
+    for follower, followee in data.get('follows') or []:
+        if follower and followee:
+            results.append(_graph_edge(follower, followee, 'follow', 'USER', _user_props(follower),
+                                       'USER', _user_props(followee)))
+    return results
+
+
+def get_fake_info_graph(fake_id):
+    """获取虚假信息传播图谱"""
+    # 确保fake_id是字符串类型，以兼容Neo4j数据库的存储方式
+    fake_id_str = str(fake_id)
+    
+    # 首先尝试使用infoId属性查询，失败时再使用id属性查询
+    query_info_id = _graph_query('infoId')
+    query_id = _graph_query('id')
     
     params = {"fake_id_str": fake_id_str}
     
@@ -405,484 +912,14 @@ def get_fake_info_graph(fake_id):
             # 如果infoId查询失败，尝试用id查询
             logger.info(f"使用infoId查询图谱数据失败，尝试使用id查询: {fake_id_str}")
             result = execute_query(query_id, params)
-            
-            if result and result[0] and result[0].get('i'):
-                data = result[0]
-                # 将数据转换为前端期望的格式
-                results = []
-                main_node_id = data['i'].get('infoId', data['i'].get('id', ''))
-                id2name = {}
-                
-                # 收集所有用户ID和对应的用户名
-                if 'post_users' in data:
-                    for user in data['post_users']:
-                        if user:    
-                            user_id = user.get('userId', str(id(user)))
-                            if user_id not in id2name:
-                                # 优先使用user_name，其次是name，最后用默认值
-                                id2name[user_id] = user.get('user_name', user.get('name', '')) or f"用户{user_id[:6]}"
-                if 'comment_users' in data:
-                    for user in data['comment_users']:
-                        if user:
-                            user_id = user.get('userId', str(id(user)))
-                            if user_id not in id2name:
-                                id2name[user_id] = user.get('user_name', user.get('name', '')) or f"用户{user_id[:6]}"
-                if 'repost_users' in data:
-                    for user in data['repost_users']:
-                        if user:
-                            user_id = user.get('userId', str(id(user)))
-                            if user_id not in id2name:
-                                id2name[user_id] = user.get('user_name', user.get('name', '')) or f"用户{user_id[:6]}"
-                if 'child_comment_users' in data:
-                    for user in data['child_comment_users']:
-                        if user:
-                            user_id = user.get('userId', str(id(user)))
-                            if user_id not in id2name:
-                                id2name[user_id] = user.get('user_name', user.get('name', '')) or f"用户{user_id[:6]}"
-                # 处理post关系
-                if 'post_users' in data:
-                    for post_user in data['post_users']:
-                        if post_user:
-                            user_id = post_user.get('userId', str(id(post_user)))
-                            results.append({
-                                'e_src': user_id,
-                                'e_dst': main_node_id,
-                                'e_type': 'post',
-                                'src_type': 'USER',
-                                'src_props': {
-                                    'name': id2name.get(user_id, f"用户{user_id[:6]}" if user_id else '未知用户'),
-                                    'user_name': post_user.get('user_name', ''),
-                                    'userId': user_id,
-                                    'follows_num': post_user.get('follows_num', 0),
-                                    'fans_num': post_user.get('fans_num', 0),
-                                    'gender': post_user.get('gender', ''),
-                                    'influence_score': post_user.get('influence_score', 0),
-                                    'ip_address': post_user.get('ip_address', ''),
-                                    'verifiedType': post_user.get('verifiedType', '')
-                                },
-                                'dst_type': 'INFO',
-                                'dst_props': {
-                                    'title': data['i'].get('text', '')[:50] + '...' if len(data['i'].get('text', '')) > 50 else data['i'].get('text', ''),
-                                    'isrumor': True
-                                }
-                            })
-                
-                # 处理评论和相关关系
-                for comment in data['comments']:
-                    if comment:
-                        comment_id = comment.get('commentId', str(id(comment)))
-                        # review1关系
-                        results.append({
-                            'e_src': comment_id,
-                            'e_dst': main_node_id,
-                            'e_type': 'review1',
-                            'src_type': 'COMMENT',
-                            'src_props': {
-                                'content': comment.get('commentText', '')
-                            },
-                            'dst_type': 'INFO',
-                            'dst_props': {
-                                'title': data['i'].get('text', '')[:50] + '...' if len(data['i'].get('text', '')) > 50 else data['i'].get('text', ''),
-                                'isrumor': True
-                            }
-                        })
-                        # issue关系
-                        if 'user' in comment:
-                            user_id = comment['user']
-                            results.append({
-                                'e_src': user_id,
-                                'e_dst': comment_id,
-                                'e_type': 'issue',
-                                'src_type': 'USER',
-                                'src_props': {
-                                    # 安全地获取用户名，避免KeyError
-                                    'name': id2name.get(user_id, f"用户{user_id[:6]}" if user_id else '未知用户')
-                                },
-                                'dst_type': 'COMMENT',
-                                'dst_props': {
-                                    'content': comment.get('commentText', '')
-                                }
-                            })
-                
-                # 处理转发和相关关系
-                for repost in data['reposts']:
-                    if repost:
-                        repost_id = repost.get('repostId', str(id(repost)))
-                        # review3关系
-                        results.append({
-                            'e_src': repost_id,
-                            'e_dst': main_node_id,
-                            'e_type': 'review3',
-                            'src_type': 'REPOST',
-                            'src_props': {
-                                'content': repost.get('repostText', '转发')
-                            },
-                            'dst_type': 'INFO',
-                            'dst_props': {
-                                'title': data['i'].get('text', '')[:50] + '...' if len(data['i'].get('text', '')) > 50 else data['i'].get('text', ''),
-                                'isrumor': True
-                            }
-                        })
-                        # perform关系
-                        if 'user' in repost:
-                            user_id = repost['user']
-                            results.append({
-                                'e_src': user_id,
-                                'e_dst': repost_id,
-                                'e_type': 'perform',
-                                'src_type': 'USER',
-                                'src_props': {
-                                    # 安全地获取用户名，避免KeyError
-                                    'name': id2name.get(user_id, f"用户{user_id[:6]}" if user_id else '未知用户')
-                                },
-                                'dst_type': 'REPOST',
-                                'dst_props': {
-                                    'content': repost.get('repostText', '转发')
-                                }
-                            })
-                
-                # 处理子评论和相关关系
-                if 'child_comments' in data:
-                    for child_comment in data['child_comments']:
-                        if child_comment:
-                            child_comment_id = child_comment.get('commentId', str(id(child_comment)))
-                            parent_comment_id = child_comment.get('superior_node')
-                            if parent_comment_id:
-                                # review2关系
-                                # 先查找父评论内容
-                                parent_comment_content = ''
-                                # 遍历主评论列表查找父评论
-                                for main_comment in data['comments']:
-                                    if main_comment and main_comment.get('commentId') == parent_comment_id:
-                                        parent_comment_content = main_comment.get('commentText', '')
-                                        break
-                                # 如果主评论中没找到，在子评论中查找
-                                if not parent_comment_content and 'child_comments' in data:
-                                    for c in data['child_comments']:
-                                        if c and c.get('commentId') == parent_comment_id:
-                                            parent_comment_content = c.get('commentText', '')
-                                            break
-                                
-                                results.append({
-                                    'e_src': child_comment_id,
-                                    'e_dst': parent_comment_id,
-                                    'e_type': 'review2',
-                                    'src_type': 'COMMENT',
-                                    'src_props': {
-                                        'content': child_comment.get('commentText', '')
-                                    },
-                                    'dst_type': 'COMMENT',
-                                    'dst_props': {
-                                        'content': parent_comment_content or '评论内容未找到'
-                                    }
-                                })
-                                # issue关系
-                                if 'user' in child_comment:
-                                    user_id = child_comment['user']
-                                    results.append({
-                                        'e_src': user_id,
-                                        'e_dst': child_comment_id,
-                                        'e_type': 'issue',
-                                        'src_type': 'USER',
-                                        'src_props': {
-                                            # 安全地获取用户名，避免KeyError
-                                            'name': id2name.get(user_id, f"用户{user_id[:6]}" if user_id else '未知用户')
-                                        },
-                                        'dst_type': 'COMMENT',
-                                        'dst_props': {
-                                            'content': child_comment.get('commentText', '')
-                                        }
-                                    })
-                
-                # 处理用户之间的follow关系
-                if 'comment_users' in data and 'repost_users' in data and 'post_users' in data:
-                    # 简化处理，仅添加一些示例的follow关系
-                    existing_user_ids = []
-                    
-                    # 收集所有用户ID
-                    if 'post_users' in data:
-                        for user in data['post_users']:
-                            if user:
-                                existing_user_ids.append(user.get('userId', str(id(user))))
-                                
-                    for comment in data['comments']:
-                        if comment and 'user' in comment:
-                            existing_user_ids.append(comment['user'])
-                            
-                    for repost in data['reposts']:
-                        if repost and 'user' in repost:
-                            existing_user_ids.append(repost['user'])
-                                    
-                    if 'child_comments' in data:
-                        for child_comment in data['child_comments']:
-                            if child_comment and 'user' in child_comment:
-                                existing_user_ids.append(child_comment['user'])
-                                
-                    # 去重
-                    existing_user_ids = list(set(existing_user_ids))
-                    
-                    # 添加follow关系
-                    for i, user1 in enumerate(existing_user_ids):
-                        for j, user2 in enumerate(existing_user_ids):
-                            if i < j and i < 3 and j < 3:  # 限制数量，避免过多关系
-                                results.append({
-                                    'e_src': user1,
-                                    'e_dst': user2,
-                                    'e_type': 'follow',
-                                    'src_type': 'USER',
-                                    'src_props': {
-                                        # 安全地获取用户名，避免KeyError
-                                        'name': id2name.get(user1, f"用户{user1[:6]}" if user1 else '未知用户')
-                                    },
-                                    'dst_type': 'USER',
-                                    'dst_props': {
-                                        # 安全地获取用户名，避免KeyError
-                                        'name': id2name.get(user2, f"用户{user2[:6]}" if user2 else '未知用户')
-                                    }
-                                })
-                
-                return {"results": results}
-            else:
-                logger.warning(f"Neo4j中未找到虚假信息 {fake_id} 的传播图谱")
-                # 返回空的图数据结构
-                return {"results": []}
-        else:
-            # infoId查询成功的情况
-            data = result[0]
-            # 这里复用上面的数据处理逻辑
-            results = []
-            main_node_id = data['i'].get('infoId', data['i'].get('id', ''))
-            id2name = {}
-            
-            # 收集所有用户ID和对应的用户名
-            if 'post_users' in data:
-                for user in data['post_users']:
-                    if user:    
-                        user_id = user.get('userId', str(id(user)))
-                        if user_id not in id2name:
-                            # 优先使用user_name，其次是name，最后用默认值
-                            id2name[user_id] = user.get('user_name', user.get('name', '')) or f"用户{user_id[:6]}"
-            if 'comment_users' in data:
-                for user in data['comment_users']:
-                    if user:
-                        user_id = user.get('userId', str(id(user)))
-                        if user_id not in id2name:
-                            id2name[user_id] = user.get('user_name', user.get('name', '')) or f"用户{user_id[:6]}"
-            if 'repost_users' in data:
-                for user in data['repost_users']:
-                    if user:
-                        user_id = user.get('userId', str(id(user)))
-                        if user_id not in id2name:
-                            id2name[user_id] = user.get('user_name', user.get('name', '')) or f"用户{user_id[:6]}"
-            if 'child_comment_users' in data:
-                for user in data['child_comment_users']:
-                    if user:
-                        user_id = user.get('userId', str(id(user)))
-                        if user_id not in id2name:
-                            id2name[user_id] = user.get('user_name', user.get('name', '')) or f"用户{user_id[:6]}"
-            # 处理post关系
-            if 'post_users' in data:
-                for post_user in data['post_users']:
-                    if post_user:
-                        user_id = post_user.get('userId', str(id(post_user)))
-                        results.append({
-                            'e_src': user_id,
-                            'e_dst': main_node_id,
-                            'e_type': 'post',
-                            'src_type': 'USER',
-                            'src_props': {
-                                'name': id2name.get(user_id, f"用户{user_id[:6]}" if user_id else '未知用户'),
-                                'user_name': post_user.get('user_name', ''),
-                                'userId': user_id,
-                                'follows_num': post_user.get('follows_num', 0),
-                                'fans_num': post_user.get('fans_num', 0),
-                                'gender': post_user.get('gender', ''),
-                                'influence_score': post_user.get('influence_score', 0),
-                                'ip_address': post_user.get('ip_address', ''),
-                                'verifiedType': post_user.get('verifiedType', '')
-                            },
-                            'dst_type': 'INFO',
-                            'dst_props': {
-                                'title': data['i'].get('text', '')[:50] + '...' if len(data['i'].get('text', '')) > 50 else data['i'].get('text', ''),
-                                'isrumor': True
-                            }
-                        })
-            
-            # 处理评论和相关关系
-            for comment in data['comments']:
-                if comment:
-                    comment_id = comment.get('commentId', str(id(comment)))
-                    # review1关系
-                    results.append({
-                        'e_src': comment_id,
-                        'e_dst': main_node_id,
-                        'e_type': 'review1',
-                        'src_type': 'COMMENT',
-                        'src_props': {
-                            'content': comment.get('commentText', '')
-                        },
-                        'dst_type': 'INFO',
-                        'dst_props': {
-                            'title': data['i'].get('text', '')[:50] + '...' if len(data['i'].get('text', '')) > 50 else data['i'].get('text', ''),
-                            'isrumor': True
-                        }
-                    })
-                    # issue关系
-                    if 'user' in comment:
-                        user_id = comment['user']
-                        results.append({
-                            'e_src': user_id,
-                            'e_dst': comment_id,
-                            'e_type': 'issue',
-                            'src_type': 'USER',
-                            'src_props': {
-                                # 安全地获取用户名，避免KeyError
-                                'name': id2name.get(user_id, f"用户{user_id[:6]}" if user_id else '未知用户')
-                            },
-                            'dst_type': 'COMMENT',
-                            'dst_props': {
-                                'content': comment.get('commentText', '')
-                            }
-                        })
-            
-            # 处理转发和相关关系
-            for repost in data['reposts']:
-                if repost:
-                    repost_id = repost.get('repostId', str(id(repost)))
-                    # review3关系
-                    results.append({
-                        'e_src': repost_id,
-                        'e_dst': main_node_id,
-                        'e_type': 'review3',
-                        'src_type': 'REPOST',
-                        'src_props': {
-                            'content': repost.get('repostText', '转发')
-                        },
-                        'dst_type': 'INFO',
-                        'dst_props': {
-                            'title': data['i'].get('text', '')[:50] + '...' if len(data['i'].get('text', '')) > 50 else data['i'].get('text', ''),
-                            'isrumor': True
-                        }
-                    })
-                    # perform关系
-                    if 'user' in repost:
-                        user_id = repost['user']
-                        results.append({
-                            'e_src': user_id,
-                            'e_dst': repost_id,
-                            'e_type': 'perform',
-                            'src_type': 'USER',
-                            'src_props': {
-                                # 安全地获取用户名，避免KeyError
-                                'name': id2name.get(user_id, f"用户{user_id[:6]}" if user_id else '未知用户')
-                            },
-                            'dst_type': 'REPOST',
-                            'dst_props': {
-                                'content': repost.get('repostText', '转发')
-                            }
-                        })
-            
-            # 处理子评论和相关关系
-            if 'child_comments' in data:
-                for child_comment in data['child_comments']:
-                    if child_comment:
-                        child_comment_id = child_comment.get('commentId', str(id(child_comment)))
-                        parent_comment_id = child_comment.get('superior_node')
-                        if parent_comment_id:
-                            # review2关系
-                            # 先查找父评论内容
-                            parent_comment_content = ''
-                            # 遍历主评论列表查找父评论
-                            for main_comment in data['comments']:
-                                if main_comment and main_comment.get('commentId') == parent_comment_id:
-                                    parent_comment_content = main_comment.get('commentText', '')
-                                    break
-                            # 如果主评论中没找到，在子评论中查找
-                            if not parent_comment_content and 'child_comments' in data:
-                                for c in data['child_comments']:
-                                    if c and c.get('commentId') == parent_comment_id:
-                                        parent_comment_content = c.get('commentText', '')
-                                        break
-                            
-                            results.append({
-                                'e_src': child_comment_id,
-                                'e_dst': parent_comment_id,
-                                'e_type': 'review2',
-                                'src_type': 'COMMENT',
-                                'src_props': {
-                                    'content': child_comment.get('commentText', '')
-                                },
-                                'dst_type': 'COMMENT',
-                                'dst_props': {
-                                    'content': parent_comment_content or '评论内容未找到'
-                                }
-                            })
-                            # issue关系
-                            if 'user' in child_comment:
-                                user_id = child_comment['user']
-                                results.append({
-                                    'e_src': user_id,
-                                    'e_dst': child_comment_id,
-                                    'e_type': 'issue',
-                                    'src_type': 'USER',
-                                    'src_props': {
-                                        # 安全地获取用户名，避免KeyError
-                                        'name': id2name.get(user_id, f"用户{user_id[:6]}" if user_id else '未知用户')
-                                    },
-                                    'dst_type': 'COMMENT',
-                                    'dst_props': {
-                                        'content': child_comment.get('commentText', '')
-                                    }
-                                })
-            
-            # 处理用户之间的follow关系
-            if 'comment_users' in data and 'repost_users' in data and 'post_users' in data:
-                # 简化处理，仅添加一些示例的follow关系
-                existing_user_ids = []
-                
-                # 收集所有用户ID
-                if 'post_users' in data:
-                    for user in data['post_users']:
-                        if user:
-                            existing_user_ids.append(user.get('userId', str(id(user))))
-                            
-                for comment in data['comments']:
-                    if comment and 'user' in comment:
-                        existing_user_ids.append(comment['user'])
-                        
-                for repost in data['reposts']:
-                    if repost and 'user' in repost:
-                        existing_user_ids.append(repost['user'])
-                                
-                if 'child_comments' in data:
-                    for child_comment in data['child_comments']:
-                        if child_comment and 'user' in child_comment:
-                            existing_user_ids.append(child_comment['user'])
-                            
-                # 去重
-                existing_user_ids = list(set(existing_user_ids))
-                
-                # 添加follow关系
-                for i, user1 in enumerate(existing_user_ids):
-                    for j, user2 in enumerate(existing_user_ids):
-                        if i < j and i < 3 and j < 3:  # 限制数量，避免过多关系
-                            results.append({
-                                'e_src': user1,
-                                'e_dst': user2,
-                                'e_type': 'follow',
-                                'src_type': 'USER',
-                                'src_props': {
-                                    # 安全地获取用户名，避免KeyError
-                                    'name': id2name.get(user1, f"用户{user1[:6]}" if user1 else '未知用户')
-                                },
-                                'dst_type': 'USER',
-                                'dst_props': {
-                                    # 安全地获取用户名，避免KeyError
-                                    'name': id2name.get(user2, f"用户{user2[:6]}" if user2 else '未知用户')
-                                }
-                            })
-            
-            return {"results": results}
+
+        if result and result[0] and result[0].get('i'):
+            # 将数据转换为前端期望的格式
+            return {"results": _build_graph_edges(result[0])}
+
+        logger.warning(f"Neo4j中未找到虚假信息 {fake_id} 的传播图谱")
+        # 返回空的图数据结构
+        return {"results": []}
     except Exception as e:
         logger.error(f"获取虚假信息 {fake_id} 传播图谱失败: {str(e)}")
         # 出错时返回空数据
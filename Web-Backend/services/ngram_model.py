@@ -0,0 +1,130 @@
+# /unified_service/services/ngram_model.py
+
+import json
+import logging
+import os
+import time
+import numpy as np
+from sklearn.feature_extraction.text import HashingVectorizer
+from sklearn.preprocessing import normalize
+
+logger = logging.getLogger(__name__)
+
+# 哈希特征空间大小，IDF向量按此长度保存（float32约4MB）
+DEFAULT_N_FEATURES = 2 ** 20
+IDF_FILENAME = 'idf.npy'
+META_FILENAME = 'meta.json'
+
+
+def _make_vectorizer(n, n_features):
+    """构造无状态的字符n-gram哈希向量化器，输出原始词频"""
+    return HashingVectorizer(
+        analyzer='char',
+        ngram_range=(n, n),
+        lowercase=False,
+        n_features=n_features,
+        alternate_sign=False,
+        norm=None,
+    )
+
+
+class NgramModel:
+    """
+    语料级字符n-gram TF-IDF模型
+    IDF在离线阶段从整个ES索引学习并保存到磁盘，请求时只做transform，不再fit
+    """
+
+    def __init__(self, idf, n=3, n_docs=0, meta=None):
+        self.idf = idf
+        self.n = n
+        self.n_docs = n_docs
+        self.meta = meta or {}
+        self._vectorizer = _make_vectorizer(n, len(idf))
+
+    def transform(self, texts):
+        """将文本转换为L2归一化的TF-IDF稀疏向量"""
+        vectors = self._vectorizer.transform(texts).tocsr()
+        # 只按非零列取IDF，内存映射下只会读入实际用到的页
+        vectors.data = vectors.data * self.idf[vectors.indices]
+        return normalize(vectors, norm='l2', copy=False)
+
+    def similarity(self, query_text, doc_texts):
+        """计算查询与每个候选文档的余弦相似度"""
+        if not doc_texts:
+            return []
+        vectors = self.transform([query_text] + list(doc_texts))
+        sims = vectors[1:].dot(vectors[0].T).toarray().ravel()
+        return sims.tolist()
+
+    def save(self, model_dir):
+        """保存IDF向量和元信息"""
+        os.makedirs(model_dir, exist_ok=True)
+        np.save(os.path.join(model_dir, IDF_FILENAME), np.asarray(self.idf, dtype=np.float32))
+        meta = dict(self.meta, n=self.n, n_docs=self.n_docs, n_features=len(self.idf))
+        with open(os.path.join(model_dir, META_FILENAME), 'w', encoding='utf-8') as f:
+            json.dump(meta, f, ensure_ascii=False, indent=2)
+
+    @classmethod
+    def load(cls, model_dir, mmap=True):
+        """从磁盘加载模型，默认以内存映射方式打开IDF向量"""
+        with open(os.path.join(model_dir, META_FILENAME), 'r', encoding='utf-8') as f:
+            meta = json.load(f)
+        idf = np.load(os.path.join(model_dir, IDF_FILENAME), mmap_mode='r' if mmap else None)
+        if len(idf) != meta.get('n_features', len(idf)):
+            raise ValueError(f"IDF向量长度 {len(idf)} 与元信息不一致: {meta.get('n_features')}")
+        return cls(idf, n=meta.get('n', 3), n_docs=meta.get('n_docs', 0), meta=meta)
+
+    @classmethod
+    def fit(cls, texts, n=3, n_features=DEFAULT_N_FEATURES, batch_size=5000):
+        """
+        从文本流统计文档频率并计算IDF
+        IDF公式与TfidfVectorizer(smooth_idf=True)一致: log((1+N)/(1+df))+1
+        """
+        vectorizer = _make_vectorizer(n, n_features)
+        df = np.zeros(n_features, dtype=np.int64)
+        n_docs = 0
+
+        batch = []
+        for text in texts:
+            batch.append(text or '')
+            if len(batch) >= batch_size:
+                n_docs += _accumulate_df(vectorizer, batch, df)
+                logger.info(f"n-gram模型已统计 {n_docs} 篇文档")
+                batch = []
+        if batch:
+            n_docs += _accumulate_df(vectorizer, batch, df)
+
+        idf = (np.log((1.0 + n_docs) / (1.0 + df)) + 1.0).astype(np.float32)
+        meta = {'built_at': time.strftime('%Y-%m-%d %H:%M:%S')}
+        return cls(idf, n=n, n_docs=n_docs, meta=meta)
+
+
+def _accumulate_df(vectorizer, batch, df):
+    """累加一批文档的文档频率，返回本批文档数"""
+    vectors = vectorizer.transform(batch).tocsr()
+    vectors.sum_duplicates()
+    df += np.bincount(vectors.indices, minlength=len(df))
+    return len(batch)
+
+
+def iter_es_contents(es_client, index, batch_size=2000):
+    """滚动遍历ES索引，逐条返回content字段"""
+    from elasticsearch.helpers import scan
+
+    for hit in scan(
+        es_client,
+        index=index,
+        query={"query": {"match_all": {}}, "_source": ["content"]},
+        size=batch_size,
+    ):
+        yield hit.get('_source', {}).get('content', '')
+
+
+def build_from_es(es_client, index, model_dir, n=3, n_features=DEFAULT_N_FEATURES):
+    """离线构建：从整个ES索引学习IDF并保存到model_dir"""
+    start_time = time.time()
+    model = NgramModel.fit(iter_es_contents(es_client, index), n=n, n_features=n_features)
+    model.meta['index'] = index
+    model.save(model_dir)
+    logger.info(f"n-gram模型构建完成: {model.n_docs} 篇文档, 耗时 {time.time() - start_time:.2f}s, 保存至 {model_dir}")
+    return model
@@ -0,0 +1,146 @@
+# /unified_service/services/phash_index.py
+
+import logging
+import os
+import time
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# 汉明距离按列计算：签名按机器字转置为列主序（每列为所有签名的同一个字），
+# 每次只对一个字做异或和置位计数，连续内存访问且中间结果很小；按块处理控制临时内存
+# numpy>=2.0 提供 bitwise_count（硬件popcount），否则用16位查找表
+_HAS_BITWISE_COUNT = hasattr(np, 'bitwise_count')
+WORD_DTYPE = np.dtype('<u8') if _HAS_BITWISE_COUNT else np.dtype('<u2')
+_BLOCK_SIZE = 1 << 17
+
+_POPCOUNT_TABLE = None
+if not _HAS_BITWISE_COUNT:
+    _POPCOUNT_TABLE = np.zeros(1 << 16, dtype=np.uint8)
+    for _bit in range(16):
+        _POPCOUNT_TABLE[1 << _bit:1 << (_bit + 1)] = _POPCOUNT_TABLE[:1 << _bit] + 1
+
+
+def _popcount(words):
+    return np.bitwise_count(words) if _HAS_BITWISE_COUNT else _POPCOUNT_TABLE[words]
+
+
+def hamming_distances(columns, query_words):
+    """计算列主序签名矩阵（W x N 个机器字）与查询签名（W个机器字）的汉明距离"""
+    n_words, n = columns.shape
+    distances = np.empty(n, dtype=np.uint16)
+    buffer = np.empty(min(n, _BLOCK_SIZE), dtype=columns.dtype)
+    for start in range(0, n, _BLOCK_SIZE):
+        end = min(start + _BLOCK_SIZE, n)
+        out, tmp = distances[start:end], buffer[:end - start]
+        np.bitwise_xor(columns[0, start:end], query_words[0], out=tmp)
+        out[:] = _popcount(tmp)
+        for w in range(1, n_words):
+            np.bitwise_xor(columns[w, start:end], query_words[w], out=tmp)
+            out += _popcount(tmp)
+    return distances
+
+
+class PhashIndex:
+    """
+    进程内pHash汉明空间索引：列主序存储 + 向量化线性扫描
+    线上阈值为256位中的90位（约35%），此时任何子串切分的多索引哈希在抽屉原理下都几乎要探查全部签名，
+    因此不再建立倒排桶，直接对全部签名计算汉明距离（100万条约10ms，见 scripts/build_phash_index.py bench）。
+    """
+
+    def __init__(self, signatures, mids, paths):
+        signatures = np.ascontiguousarray(signatures, dtype=np.uint8)
+        if signatures.ndim != 2 or signatures.shape[1] % WORD_DTYPE.itemsize:
+            raise ValueError(f"签名矩阵形状不合法: {signatures.shape}")
+        if not (len(signatures) == len(mids) == len(paths)):
+            raise ValueError("签名、mid与路径数量不一致")
+
+        self.mids = np.asarray(mids)
+        self.paths = np.asarray(paths)
+        self.n_bytes = signatures.shape[1]
+        self.n_bits = self.n_bytes * 8
+        self._columns = np.ascontiguousarray(signatures.view(WORD_DTYPE).T)
+
+    def __len__(self):
+        return self._columns.shape[1]
+
+    @property
+    def signatures(self):
+        """按行还原的签名矩阵（N x B, uint8），仅保存时使用"""
+        return np.ascontiguousarray(self._columns.T).view(np.uint8).reshape(len(self), self.n_bytes)
+
+    def search(self, signature, max_distance=90, limit=10):
+        """
+        查询与signature汉明距离严格小于max_distance的签名，按距离升序返回前limit个
+        返回 [{"distance": d, "entity": {"mid": ..., "data_path": ...}}]，与Milvus搜索结果结构一致
+        """
+        query = np.frombuffer(bytes(signature), dtype=np.uint8)
+        if query.shape[0] * 8 != self.n_bits:
+            raise ValueError(f"查询签名长度 {query.shape[0] * 8} 位与索引 {self.n_bits} 位不一致")
+        if not len(self):
+            return []
+
+        # 严格小于max_distance，即距离<=max_distance-1
+        radius = max(max_distance - 1, 0)
+        distances = hamming_distances(self._columns, query.view(WORD_DTYPE))
+        candidates = np.nonzero(distances <= radius)[0]
+        distances = distances[candidates]
+
+        if len(candidates) > limit:
+            # 保留距离不超过第limit小距离的全部候选，保证并列时结果稳定
+            kth = np.partition(distances, limit - 1)[limit - 1]
+            keep = distances <= kth
+            candidates, distances = candidates[keep], distances[keep]
+        order = np.lexsort((candidates, distances))[:limit]
+
+        return [
+            {"distance": int(distances[i]),
+             "entity": {"mid": str(self.mids[candidates[i]]), "data_path": str(self.paths[candidates[i]])}}
+            for i in order
+        ]
+
+    def save(self, path):
+        """保存为紧凑的打包文件（npz：N x B 的uint8签名矩阵 + mid/路径数组）"""
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        np.savez_compressed(path, signatures=self.signatures,
+                            mids=self.mids.astype(str), paths=self.paths.astype(str))
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path, allow_pickle=False) as data:
+            return cls(data['signatures'], data['mids'], data['paths'])
+
+
+def benchmark(n=1000000, n_bits=256, n_queries=200, max_distance=90, near_distance=10, seed=0):
+    """用随机签名评估索引构建和查询耗时，可在没有Milvus的环境中运行"""
+    rng = np.random.default_rng(seed)
+    n_bytes = n_bits // 8
+    signatures = rng.integers(0, 256, size=(n, n_bytes), dtype=np.uint8)
+    mids = np.arange(n).astype(str)
+
+    start_time = time.time()
+    index = PhashIndex(signatures, mids, mids)
+    build_time = time.time() - start_time
+
+    # 构造近重复查询：在已有签名上随机翻转near_distance位
+    targets = rng.integers(0, n, size=n_queries)
+    queries = signatures[targets].copy()
+    for q in queries:
+        for bit in rng.choice(n_bits, size=near_distance, replace=False):
+            q[bit // 8] ^= np.uint8(1 << (bit % 8))
+
+    report = {'n': n, 'n_bits': n_bits, 'popcount': 'bitwise_count' if _HAS_BITWISE_COUNT else 'lookup_table',
+              'build_seconds': round(build_time, 3)}
+    for label, radius in (('near_duplicate', near_distance + 1), ('threshold', max_distance)):
+        start_time = time.time()
+        recall = 0
+        for target, q in zip(targets, queries):
+            hits = index.search(q.tobytes(), max_distance=radius)
+            recall += any(h['entity']['mid'] == str(target) for h in hits)
+        elapsed = time.time() - start_time
+        report[label] = {
+            'max_distance': radius,
+            'avg_query_ms': round(elapsed / n_queries * 1000, 3),
+            'recall': round(recall / n_queries, 4),
+        }
+    return report
@@ -0,0 +1,111 @@
+# /unified_service/services/pipeline_pool.py
+
+import logging
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+logger = logging.getLogger(__name__)
+
+
+class PipelineInputError(ValueError):
+    """输入数据本身有问题（如上传文件损坏），流水线实例仍然可用"""
+
+
+class PipelinePool:
+    """
+    可复用的流水线对象池
+    按键（如 集合/设备/阈值）分别维护最多 size 个实例，实例首次需要时通过factory创建，
+    之后在请求间复用；同一键的并发使用数不超过 size，超出时排队等待。
+    实例被丢弃或创建失败时唤醒等待者，由等待者补建实例。
+    """
+
+    def __init__(self, factory, size=1, acquire_timeout=300, name='pipeline', input_errors=(PipelineInputError,)):
+        self.factory = factory
+        self.size = max(1, size)
+        self.acquire_timeout = acquire_timeout
+        self.name = name
+        # 这些异常视为输入错误，实例归还池中；其他异常视为流水线或基础设施故障，实例被丢弃
+        self.input_errors = tuple(input_errors)
+        self._idle = {}
+        self._created = {}
+        self._cond = threading.Condition()
+
+    def warm_up(self, key):
+        """预先创建一个实例，使首个请求不必承担模型加载开销"""
+        with self._cond:
+            self._idle.setdefault(key, deque())
+            if self._created.get(key, 0) > 0:
+                return
+            self._created[key] = 1
+        try:
+            instance = self._create(key)
+        except Exception:
+            self._release_slot(key)
+            raise
+        self._return(key, instance)
+
+    @contextmanager
+    def acquire(self, key):
+        """借出一个实例，使用完毕自动归还；流水线故障时丢弃实例，由下一个使用者重建"""
+        instance = self._borrow(key)
+        healthy = True
+        try:
+            yield instance
+        except Exception as e:
+            healthy = isinstance(e, self.input_errors)
+            raise
+        finally:
+            if healthy:
+                self._return(key, instance)
+            else:
+                self._release_slot(key)
+                logger.warning(f"{self.name}实例执行出错，已丢弃: {key}")
+
+    def stats(self):
+        with self._cond:
+            return {
+                str(key): {'created': self._created.get(key, 0), 'idle': len(idle), 'size': self.size}
+                for key, idle in self._idle.items()
+            }
+
+    # --- 内部方法 ---
+
+    def _borrow(self, key):
+        deadline = time.monotonic() + self.acquire_timeout
+        with self._cond:
+            while True:
+                idle = self._idle.setdefault(key, deque())
+                if idle:
+                    return idle.popleft()
+                if self._created.get(key, 0) < self.size:
+                    self._created[key] = self._created.get(key, 0) + 1
+                    break
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise TimeoutError(f"等待{self.name}实例超时({self.acquire_timeout}s): {key}")
+                self._cond.wait(remaining)
+
+        try:
+            return self._create(key)
+        except Exception:
+            self._release_slot(key)
+            raise
+
+    def _return(self, key, instance):
+        with self._cond:
+            self._idle[key].append(instance)
+            self._cond.notify_all()
+
+    def _release_slot(self, key):
+        """实例被丢弃或创建失败，空出的名额交给等待者重建"""
+        with self._cond:
+            self._created[key] -= 1
+            self._cond.notify_all()
+
+    def _create(self, key):
+        start_time = time.time()
+        instance = self.factory(key)
+        logger.info(f"{self.name}实例创建完成: {key}, 耗时 {time.time() - start_time:.2f}s")
+        return instance
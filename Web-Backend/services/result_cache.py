@@ -0,0 +1,180 @@
+# /unified_service/services/result_cache.py
+
+import copy
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+
+class ResultCache:
+    """
+    有界查询结果缓存：进程内LRU + 可选的本地磁盘共享层
+    每个条目记录写入时的数据代际(generation)，代际变化后旧条目全部失效；
+    内存层保存和返回的都是副本，调用方修改结果不会影响缓存
+    """
+
+    def __init__(self, max_entries=512, disk_dir=None, max_disk_entries=10000, name='result'):
+        self.name = name
+        self.max_entries = max_entries
+        self.disk_dir = disk_dir
+        self.max_disk_entries = max_disk_entries
+        self._entries = OrderedDict()
+        self._generation = None
+        self._lock = threading.Lock()
+        self._disk_writes = 0
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        if disk_dir:
+            os.makedirs(disk_dir, exist_ok=True)
+
+    @staticmethod
+    def make_key(*parts):
+        """将若干键片段序列化为稳定的字符串键"""
+        return json.dumps(parts, ensure_ascii=False, separators=(',', ':'))
+
+    def check_generation(self, generation):
+        """数据代际变化时清空内存层，磁盘层条目在读取时按代际校验"""
+        with self._lock:
+            if generation == self._generation:
+                return
+            if self._generation is not None:
+                self.invalidations += 1
+                logger.info(f"{self.name}缓存代际变化 {self._generation} -> {generation}，清空 {len(self._entries)} 条缓存")
+            self._entries.clear()
+            self._generation = generation
+
+    def get(self, key):
+        """命中返回 (True, value)，未命中返回 (False, None)"""
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return True, copy.deepcopy(self._entries[key])
+            generation = self._generation
+
+        if self.disk_dir:
+            value = self._disk_get(key, generation)
+            if value is not None:
+                with self._lock:
+                    self.disk_hits += 1
+                    self._put_memory(key, value)
+                return True, value
+
+        with self._lock:
+            self.misses += 1
+        return False, None
+
+    def put(self, key, value, generation=None):
+        """generation为计算结果前读取的代际，期间代际已变化时结果可能过期，不写入"""
+        with self._lock:
+            if generation is not None and generation != self._generation:
+                return
+            self._put_memory(key, value)
+            generation = self._generation
+        if self.disk_dir:
+            self._disk_put(key, value, generation)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.invalidations += 1
+        if self.disk_dir:
+            for filename in os.listdir(self.disk_dir):
+                if filename.endswith('.json'):
+                    try:
+                        os.remove(os.path.join(self.disk_dir, filename))
+                    except OSError:
+                        pass
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.disk_hits + self.misses
+            return {
+                'name': self.name,
+                'entries': len(self._entries),
+                'max_entries': self.max_entries,
+                'generation': self._generation,
+                'hits': self.hits,
+                'disk_hits': self.disk_hits,
+                'misses': self.misses,
+                'invalidations': self.invalidations,
+                'hit_rate': round((self.hits + self.disk_hits) / lookups, 4) if lookups else 0.0,
+                'disk_enabled': bool(self.disk_dir),
+            }
+
+    # --- 内部方法 ---
+
+    def _put_memory(self, key, value):
+        # 调用方需持有锁
+        self._entries[key] = copy.deepcopy(value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def _disk_path(self, key):
+        digest = hashlib.sha1(key.encode('utf-8')).hexdigest()
+        return os.path.join(self.disk_dir, f"{digest}.json")
+
+    def _disk_get(self, key, generation):
+        path = self._disk_path(key)
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            return None
+        # 代际不一致或键冲突都视为未命中
+        if entry.get('key') != key or entry.get('generation') != _jsonable(generation):
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            return None
+        return entry.get('value')
+
+    def _disk_put(self, key, value, generation):
+        path = self._disk_path(key)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump({'key': key, 'generation': _jsonable(generation), 'created_at': time.time(), 'value': value},
+                          f, ensure_ascii=False)
+            # 原子替换，保证多个worker并发读写时不会读到半个文件
+            os.replace(tmp_path, path)
+        except (OSError, TypeError, ValueError) as e:
+            logger.warning(f"{self.name}缓存写入磁盘失败: {e}")
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+            return
+
+        self._disk_writes += 1
+        if self._disk_writes % 100 == 0:
+            self._prune_disk()
+
+    def _prune_disk(self):
+        """磁盘条目超过上限时按修改时间淘汰最旧的条目"""
+        try:
+            files = [os.path.join(self.disk_dir, f) for f in os.listdir(self.disk_dir) if f.endswith('.json')]
+            if len(files) <= self.max_disk_entries:
+                return
+            files.sort(key=lambda p: os.path.getmtime(p))
+            for path in files[:len(files) - self.max_disk_entries]:
+                os.remove(path)
+        except OSError as e:
+            logger.warning(f"{self.name}缓存清理磁盘失败: {e}")
+
+
+def _jsonable(generation):
+    """代际值在磁盘上以JSON保存，元组需转为列表后再比较"""
+    if isinstance(generation, tuple):
+        return [_jsonable(g) for g in generation]
+    return generation
@@ -0,0 +1,187 @@
+# /unified_service/services/schema_migration.py
+
+import logging
+import threading
+import time
+from datetime import datetime
+from pymongo import UpdateOne
+
+logger = logging.getLogger(__name__)
+
+# 规范化影子字段：isRisk混有字符串'true'和布尔True，Time为'YYYY-MM-DD HH:MM'字符串
+RISK_FIELD = 'isRiskBool'
+TIME_FIELD = 'TimeDt'
+MIGRATION_ID = 'event_schema_v1'
+MIGRATION_COLLECTION = 'schema_migrations'
+
+_TIME_FORMATS = ('%Y-%m-%d %H:%M', '%Y-%m-%d %H:%M:%S', '%Y-%m-%d', '%Y/%m/%d %H:%M', '%Y/%m/%d %H:%M:%S', '%Y/%m/%d')
+_TRUE_VALUES = {'true', '1', 'yes'}
+_FALSE_VALUES = {'false', '0', 'no', ''}
+
+# 轮询模式下发现新文档时唤醒增量迁移，不必等满一个间隔
+_incremental_wakeup = threading.Event()
+
+
+def normalize_is_risk(value):
+    """把isRisk的各种存储形式转换为布尔值，无法识别时返回None"""
+    if isinstance(value, bool):
+        return value
+    if isinstance(value, (int, float)):
+        return value != 0
+    if isinstance(value, str):
+        lowered = value.strip().lower()
+        if lowered in _TRUE_VALUES:
+            return True
+        if lowered in _FALSE_VALUES:
+            return False
+    if value is None:
+        return False
+    return None
+
+
+def parse_event_time(value):
+    """把Time字段解析为datetime，无法解析时返回None"""
+    if isinstance(value, datetime):
+        return value
+    if not isinstance(value, str):
+        return None
+    value = value.strip()
+    for fmt in _TIME_FORMATS:
+        try:
+            return datetime.strptime(value, fmt)
+        except ValueError:
+            continue
+    return None
+
+
+def normalized_fields(doc):
+    """计算一条事件文档的影子字段，无法转换的字段值为None"""
+    return {
+        RISK_FIELD: normalize_is_risk(doc.get('isRisk')),
+        TIME_FIELD: parse_event_time(doc.get('Time')),
+    }
+
+
+def _shadow_update(doc, fields):
+    """
+    影子字段的更新操作，已是最新值时返回None。
+    无法转换的字段不写入（$unset），查询对缺少影子字段的文档仍按原字段匹配（见mongodb_service._with_legacy_fallback）
+    """
+    if all((k not in doc) if v is None else (k in doc and doc[k] == v) for k, v in fields.items()):
+        return None
+    update = {}
+    values = {k: v for k, v in fields.items() if v is not None}
+    if values:
+        update['$set'] = values
+    missing = {k: '' for k, v in fields.items() if v is None}
+    if missing:
+        update['$unset'] = missing
+    return update
+
+
+def get_migration_state(db):
+    """迁移状态：finished表示本次执行已处理到末尾，completed表示全量迁移至少完成过一次"""
+    return db[MIGRATION_COLLECTION].find_one({'_id': MIGRATION_ID})
+
+
+def migrate_events(collection, db, batch_size=1000, restart=False, limit=None):
+    """
+    按 _id 升序分批写入影子字段，每批用一次 bulk_write 提交并记录断点，
+    中断后再次执行从断点继续；已完成后再次执行只处理断点之后新写入的文档
+    """
+    state_collection = db[MIGRATION_COLLECTION]
+    state = None if restart else state_collection.find_one({'_id': MIGRATION_ID})
+    if state is None:
+        state = {'_id': MIGRATION_ID, 'last_id': None, 'processed': 0, 'updated': 0,
+                 'unparsed_time': 0, 'unknown_risk': 0, 'finished': False, 'completed': False,
+                 'started_at': datetime.now()}
+    state['finished'] = False
+    state_collection.replace_one({'_id': MIGRATION_ID}, state, upsert=True)
+    # 早期版本为无法转换的值写入了null，字段存在时查询不再回退到原字段，这里改为删除
+    for field in (RISK_FIELD, TIME_FIELD):
+        result = collection.update_many({field: {'$type': 'null'}}, {'$unset': {field: ''}})
+        if result.modified_count:
+            logger.info(f"已删除 {result.modified_count} 条文档上为null的影子字段 {field}")
+
+    start_time = time.time()
+    migrated = 0
+    while limit is None or migrated < limit:
+        query = {'_id': {'$gt': state['last_id']}} if state['last_id'] is not None else {}
+        size = batch_size if limit is None else min(batch_size, limit - migrated)
+        batch = list(collection.find(query, {'isRisk': 1, 'Time': 1, RISK_FIELD: 1, TIME_FIELD: 1})
+                     .sort('_id', 1).limit(size))
+        if not batch:
+            state['finished'] = True
+            break
+
+        requests = []
+        for doc in batch:
+            fields = normalized_fields(doc)
+            if fields[TIME_FIELD] is None and doc.get('Time'):
+                state['unparsed_time'] += 1
+            if fields[RISK_FIELD] is None:
+                state['unknown_risk'] += 1
+            # 影子字段已是最新值时跳过，重复执行不产生多余写入
+            update = _shadow_update(doc, fields)
+            if update:
+                requests.append(UpdateOne({'_id': doc['_id']}, update))
+        if requests:
+            result = collection.bulk_write(requests, ordered=False)
+            state['updated'] += result.modified_count
+
+        migrated += len(batch)
+        state['processed'] += len(batch)
+        state['last_id'] = batch[-1]['_id']
+        state['updated_at'] = datetime.now()
+        state_collection.replace_one({'_id': MIGRATION_ID}, state, upsert=True)
+        logger.info(f"规范化迁移进度: 已处理 {state['processed']} 条, 已更新 {state['updated']} 条")
+
+    if state['finished']:
+        # completed在首次全量迁移完成后保持为True，增量补齐期间查询不会退回原字段
+        state['completed'] = True
+        state['finished_at'] = datetime.now()
+        state_collection.replace_one({'_id': MIGRATION_ID}, state, upsert=True)
+    logger.info(f"规范化迁移本次处理 {migrated} 条, 耗时 {time.time() - start_time:.2f}s, 完成: {state['finished']}")
+    return state
+
+
+def apply_change(collection, change):
+    """
+    event_watcher监听器：change stream提供了变更后的完整文档时，立即为新增/修改的文档写入影子字段，
+    包括 _id 早于迁移断点的文档上isRisk或Time的后续修改（增量迁移只扫描断点之后的文档，发现不了这类修改）。
+    轮询模式拿不到文档内容，新增时唤醒增量迁移；修改无法发现，需定期执行 scripts/migrate_event_schema.py --restart
+    """
+    if change['op'] not in ('insert', 'update', 'replace'):
+        return
+    doc = change.get('doc')
+    if doc is None:
+        if change['op'] == 'insert':
+            _incremental_wakeup.set()
+        return
+    fields = normalized_fields(doc)
+    update = _shadow_update(doc, fields)
+    if update is None:
+        return
+    if fields[TIME_FIELD] is None and doc.get('Time'):
+        logger.warning(f"事件 {doc['_id']} 的Time无法解析: {doc.get('Time')!r}，查询按原字段匹配")
+    # 以原字段未再变化为条件：多个进程各自监听时，较早的变更不会覆盖较新的影子字段
+    collection.update_one({'_id': doc['_id'], 'isRisk': doc.get('isRisk'), 'Time': doc.get('Time')}, update)
+
+
+def start_incremental_migration(collection, db, interval=300, batch_size=1000):
+    """后台定期执行增量迁移，为迁移完成后新写入的文档补齐影子字段"""
+    def _loop():
+        while True:
+            _incremental_wakeup.wait(interval)
+            _incremental_wakeup.clear()
+            try:
+                state = get_migration_state(db)
+                # 只在首次全量迁移完成后接管，避免与手动执行的迁移脚本并发
+                if state and state.get('completed'):
+                    migrate_events(collection, db, batch_size=batch_size)
+            except Exception as e:
+                logger.warning(f"增量规范化迁移失败: {e}")
+
+    thread = threading.Thread(target=_loop, name='schema-migration', daemon=True)
+    thread.start()
+    return thread
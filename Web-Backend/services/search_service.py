@@ -3,6 +3,7 @@
 import logging
 import os
 import time
+from concurrent.futures import ProcessPoolExecutor
 from towhee import AutoPipes, AutoConfig
 from towhee.datacollection import DataCollection
 from pymilvus import MilvusClient
@@ -12,12 +13,35 @@ from sklearn.metrics.pairwise import cosine_similarity
 from PIL import Image
 from imagehash import phash
 import numpy as np
+from services.ngram_model import NgramModel
+from services.result_cache import ResultCache
+from services.phash_index import PhashIndex
+from services.source_attribution import assign_is_source
+from services.pipeline_pool import PipelinePool, PipelineInputError
+from services import upload_store, media_service
+from services.job_queue import JobQueue, JOB_RUNNING
+
+try:
+    import cv2  # 可选依赖，用于校验上传的视频和读取帧数以估算任务进度
+except ImportError:
+    cv2 = None
 
 logger = logging.getLogger(__name__)
 
 # 全局客户端变量
 es_client = None
 milvus_client = None
+ngram_model = None
+text_result_cache = None
+phash_index = None
+phash_executor = None
+video_pipeline_pool = None
+video_job_queue = None
+# 视频检测吞吐量样本的最短检测耗时(秒)，以及单个样本相对滑动平均的最大偏差倍数
+_VIDEO_FPS_MIN_SAMPLE_SECONDS = 1.0
+_VIDEO_FPS_MAX_RATIO = 4.0
+# ES索引代际缓存: (检查时间, 代际)
+_index_generation_state = {'checked_at': 0.0, 'generation': None}
 
 def init_search_clients(app_config):
     """初始化Elasticsearch和Milvus客户端"""
@@ -39,17 +63,107 @@ def init_search_clients(app_config):
         logger.error(f"初始化Elasticsearch客户端时出错: {e}")
         exit(1)
 
+    # 本地pHash索引需在Milvus之前加载，存在本地索引时Milvus不可用不再视为致命错误
+    init_phash_index(app_config)
+
     # 初始化Milvus
     try:
         milvus_client = MilvusClient(uri=app_config.get('MILVUS_URI'), token=app_config.get('MILVUS_TOKEN'))
         logger.info("连接Milvus成功!")
     except Exception as e:
         logger.error(f"初始化Milvus客户端时出错: {e}")
-        exit(1)
+        if phash_index is None:
+            exit(1)
+        logger.warning("Milvus不可用，图像搜索仅使用本地pHash索引")
+
+    init_ngram_model(app_config)
+    init_text_result_cache(app_config)
+    init_video_pipeline_pool(app_config)
+    init_video_job_queue(app_config)
+
+def init_ngram_model(app_config):
+    """加载离线构建的语料级n-gram模型，不存在时退回到逐请求拟合"""
+    global ngram_model
+    model_dir = app_config.get('NGRAM_MODEL_DIR')
+    if not model_dir or not os.path.exists(os.path.join(model_dir, 'meta.json')):
+        logger.warning(f"未找到n-gram模型 {model_dir}，重排序将退回到逐请求拟合TF-IDF")
+        return
+    try:
+        ngram_model = NgramModel.load(model_dir)
+        logger.info(f"n-gram模型加载成功: n={ngram_model.n}, 文档数={ngram_model.n_docs}")
+    except Exception as e:
+        logger.error(f"加载n-gram模型失败: {e}")
+        ngram_model = None
+
+def init_phash_index(app_config):
+    """加载本地pHash汉明空间索引（由 scripts/build_phash_index.py 构建）"""
+    global phash_index
+    index_path = app_config.get('PHASH_INDEX_PATH')
+    if not index_path or not os.path.exists(index_path):
+        logger.info(f"未找到本地pHash索引 {index_path}，图像搜索将直接使用Milvus")
+        return
+    try:
+        start_time = time.time()
+        phash_index = PhashIndex.load(index_path)
+        logger.info(f"本地pHash索引加载成功: {len(phash_index)} 条签名, 耗时 {time.time() - start_time:.2f}s")
+    except Exception as e:
+        logger.error(f"加载本地pHash索引失败: {e}")
+        phash_index = None
+
+def init_text_result_cache(app_config):
+    """初始化文本搜索结果缓存"""
+    global text_result_cache
+    max_entries = app_config.get('SEARCH_CACHE_SIZE', 512)
+    if not max_entries:
+        logger.info("文本搜索结果缓存已禁用")
+        return
+    text_result_cache = ResultCache(
+        max_entries=max_entries,
+        disk_dir=app_config.get('SEARCH_CACHE_DISK_DIR'),
+        name='search_text'
+    )
+    logger.info(f"文本搜索结果缓存已启用: 内存上限 {max_entries} 条, 磁盘层 {app_config.get('SEARCH_CACHE_DISK_DIR') or '未启用'}")
+
+def _get_index_generation(app_config):
+    """
+    获取ES索引的数据代际：文档数 + 写入/删除计数 + refresh次数
+    写入在refresh之后才对搜索可见，只看写入计数时，写入后、refresh前算出的结果会以新代际缓存下来；
+    结果按 SEARCH_CACHE_GENERATION_TTL 秒缓存，避免每次查询都访问ES
+    """
+    ttl = app_config.get('SEARCH_CACHE_GENERATION_TTL', 5)
+    now = time.time()
+    if _index_generation_state['generation'] is not None and now - _index_generation_state['checked_at'] < ttl:
+        return _index_generation_state['generation']
+
+    stats = es_client.indices.stats(index=app_config.get('ES_INDEX'), metric='docs,indexing,refresh')
+    primaries = stats['_all']['primaries']
+    generation = (
+        primaries['docs']['count'],
+        primaries['indexing']['index_total'],
+        primaries['indexing']['delete_total'],
+        primaries['refresh']['total'],
+    )
+    _index_generation_state['checked_at'] = now
+    _index_generation_state['generation'] = generation
+    return generation
+
+def _normalize_query(query_content):
+    """去除首尾空白并合并连续空白，作为缓存键和实际查询文本"""
+    return ' '.join(query_content.split())
+
+def get_text_cache_stats():
+    """返回文本搜索缓存的命中统计"""
+    if text_result_cache is None:
+        return {'enabled': False}
+    return dict(text_result_cache.stats(), enabled=True)
 
 # --- 文本搜索逻辑 ---
 
 def _compute_ngram_similarity(query_text, doc_texts, n=3):
+    # 优先使用语料级IDF模型，只做transform
+    if ngram_model is not None and ngram_model.n == n:
+        return ngram_model.similarity(query_text, doc_texts)
+
     all_texts = [query_text] + doc_texts
     vectorizer = TfidfVectorizer(analyzer='char', ngram_range=(n, n), lowercase=False)
     try:
@@ -59,15 +173,49 @@ def _compute_ngram_similarity(query_text, doc_texts, n=3):
     except ValueError:
         return [0.0] * len(doc_texts)
 
+# 候选集中ES返回的字段
+_EVENT_SOURCE_FIELDS = ["id", "title", "content", "publishtime", "event", "uid", "uname", 
+                        "isrumor", "datasource", "istweet", "isretweet", "retext", "pic_ids", "pic_urls", "vid_ids", "vid_urls"]
+
+def _rename_media_fields(candidates):
+    for c in candidates:
+        c["imageUrl"] = c.pop("pic_urls", -1)  # 使用 pop 删除原键并获取其值 重命名    
+        c["videoUrl"] = c.pop("vid_urls", -1)  # 使用 pop 删除原键并获取其值 重命名      
+
 def search_text(query_content, score_threshold, app_config, top_k_first=100, ngram_n=3):
-    """两阶段文本搜索：ES召回 + n-gram重排序"""
+    """两阶段文本搜索，带结果缓存；ES索引数据变化时缓存自动失效"""
     if not es_client:
         raise ConnectionError("Elasticsearch客户端未初始化")
 
+    query_content = _normalize_query(query_content)
+    if text_result_cache is None:
+        return _search_text_uncached(query_content, score_threshold, app_config, top_k_first, ngram_n)
+
+    try:
+        generation = _get_index_generation(app_config)
+        text_result_cache.check_generation(generation)
+    except Exception as e:
+        # 无法确认索引代际时不使用缓存，直接查询
+        logger.warning(f"获取ES索引代际失败，跳过缓存: {e}")
+        return _search_text_uncached(query_content, score_threshold, app_config, top_k_first, ngram_n)
+
+    key = ResultCache.make_key(query_content, float(score_threshold), top_k_first, ngram_n)
+    hit, results = text_result_cache.get(key)
+    if hit:
+        return results
+
+    results = _search_text_uncached(query_content, score_threshold, app_config, top_k_first, ngram_n)
+    # 出错结果不缓存；查询期间代际已变化时结果可能过期，也不缓存
+    if not (isinstance(results, dict) and "error" in results):
+        text_result_cache.put(key, results, generation=generation)
+    return results
+
+def _search_text_uncached(query_content, score_threshold, app_config, top_k_first=100, ngram_n=3):
+    """两阶段文本搜索：ES召回 + n-gram重排序"""
+
     search_body = {
         "query": {"match": {"content": query_content}},
-        "_source": ["id", "title", "content", "publishtime", "event", "uid", "uname", 
-                    "isrumor", "datasource", "istweet", "isretweet", "retext", "pic_ids", "pic_urls", "vid_ids", "vid_urls"],
+        "_source": _EVENT_SOURCE_FIELDS,
         "size": top_k_first
     }
     
@@ -88,61 +236,8 @@ def search_text(query_content, score_threshold, app_config, top_k_first=100, ngr
 
         candidates = [c for c in candidates if c["ngram_sim"] > score_threshold]
 
-        for c in candidates:
-            if c.get("datasource") == 'weibo':
-                if c["istweet"] and not c["isretweet"]:  
-                # if c.get("istweet") == "true" and c.get("isretweet") == "false":
-                    c["isSource"] = 0
-            else:
-                c["isSource"] = 0
-
-        id_group = {}
-        for c in candidates:
-            id_val = c.get("event")
-            if id_val not in id_group:
-                id_group[id_val] = []
-            id_group[id_val].append(c)
-        
-        temp_candidates = []
-        for group in id_group.values():
-            # sorted_group = sorted(group, key=lambda x: x.get("publishtime", ""), reverse=False)
-            # sorted_group = sorted(group, key=lambda x: x["ngram_sim"], reverse=True)
-            sorted_group = sorted(group, key=lambda x: x["publishtime"], reverse=False)
-            found_source = False
-            for item in sorted_group:
-                if not found_source and item["isSource"] == 0:
-                    item["isSource"] = 1
-                    found_source = True
-            # for item in sorted_group:
-            #     if item["isSource"] == -1:
-            #         item["isSource"] = 0
-            temp_candidates.extend(sorted_group)
-
-        id_group = {}
-        for c in candidates:
-            id_val = c.get("datasource")
-            if id_val not in id_group:
-                id_group[id_val] = []
-            id_group[id_val].append(c)
-        
-        final_candidates = []
-        for group in id_group.values():
-            # sorted_group = sorted(group, key=lambda x: x.get("publishtime", ""), reverse=False)
-            # sorted_group = sorted(group, key=lambda x: x["ngram_sim"], reverse=True)
-            sorted_group = sorted(group, key=lambda x: x["publishtime"], reverse=False)
-            found_source = False
-            for item in sorted_group:
-                if not found_source and (item["isSource"] == 0 or item["isSource"] == 1):
-                    item["isSource"] = 1
-                    found_source = True
-            for item in sorted_group:
-                if item["isSource"] == -1:
-                    item["isSource"] = 0
-            final_candidates.extend(sorted_group)
-        
-        for c in candidates:
-            c["imageUrl"] = c.pop("pic_urls", -1)  # 使用 pop 删除原键并获取其值 重命名    
-            c["videoUrl"] = c.pop("vid_urls", -1)  # 使用 pop 删除原键并获取其值 重命名      
+        final_candidates = assign_is_source(candidates)
+        _rename_media_fields(candidates)
 
         return final_candidates
 
@@ -153,11 +248,8 @@ def search_text(query_content, score_threshold, app_config, top_k_first=100, ngr
 # --- 图像搜索逻辑 ---
 
 def _convert_bool_list_to_bytes(bool_list):
-    byte_array = bytearray(len(bool_list) // 8)
-    for i, bit in enumerate(bool_list):
-        if bit:
-            byte_array[i // 8] |= (1 << (i % 8))
-    return bytes(byte_array)
+    # 第i位写入第i//8个字节的第i%8位（低位在前），与Milvus中已入库的签名布局一致
+    return np.packbits(np.asarray(bool_list, dtype=np.uint8), bitorder='little').tobytes()
 
 def _calculate_phash_signature(image_file, hash_size=16):
     pil_image = Image.open(image_file).convert("L").resize(
@@ -170,20 +262,47 @@ def _calculate_phash_signature(image_file, hash_size=16):
     bit_array = bool_array.astype(np.uint8)
     return _convert_bool_list_to_bytes(bit_array)
 
+def _search_phash_milvus(img_hashes, max_distance, top_k, app_config):
+    """在Milvus中搜索一个或多个pHash签名，返回每个签名距离小于max_distance的命中"""
+    results = milvus_client.search(
+        collection_name=app_config.get('MILVUS_IMAGE_COLLECTION'),
+        data=img_hashes,
+        limit=top_k,
+        output_fields=["data_path","mid"]
+    )
+    return [[hit for hit in result_list if hit["distance"] < max_distance] for result_list in results]
+
 def search_picture(image_path, app_config):
-    """使用Milvus进行图像pHash搜索"""
-    if not milvus_client:
+    """图像pHash搜索：优先查询本地汉明空间索引，未命中时回退到Milvus"""
+    if not milvus_client and phash_index is None:
         raise ConnectionError("Milvus客户端未初始化")
     
     try:
-        img_hash = _calculate_phash_signature(image_path)
-        results = milvus_client.search(
-            collection_name=app_config.get('MILVUS_IMAGE_COLLECTION'),
-            data=[img_hash],
-            output_fields=["data_path","mid"]
-        )
-        results = [[hit for hit in result_list if hit["distance"] < 90] for result_list in results]
-        print(results)
+        max_distance = app_config.get('PHASH_MAX_DISTANCE', 90)
+        top_k = app_config.get('PHASH_TOP_K', 10)
+
+        # 同一内容重复提交时直接复用上次的搜索结果
+        upload_folder = app_config.get('UPLOAD_FOLDER')
+        digest = upload_store.digest_from_path(image_path)
+        cache_key = f"picture:{max_distance}:{top_k}"
+        if digest:
+            cached = upload_store.get_cached_result(
+                upload_folder, digest, cache_key, app_config.get('UPLOAD_RESULT_CACHE_TTL', 3600))
+            if cached is not None:
+                return cached[0], cached[1]
+
+        img_hash, error = _calculate_phash_signatures([image_path], app_config)[0]
+        if error is not None:
+            raise ValueError(error)
+
+        results = None
+        if phash_index is not None:
+            hits = phash_index.search(img_hash, max_distance=max_distance, limit=top_k)
+            # 本地索引只覆盖热数据，未命中时由Milvus兜底
+            if hits or not milvus_client:
+                results = [hits]
+        if results is None:
+            results = _search_phash_milvus([img_hash], max_distance, top_k, app_config)
         
         pred_paths = []
         pred_mid = []
@@ -192,6 +311,9 @@ def search_picture(image_path, app_config):
             pred_paths.append(top_n_paths)
             top_n_mid = [item["entity"]["mid"] for item in result_set]
             pred_mid.append(top_n_mid)
+
+        if digest:
+            upload_store.put_cached_result(upload_folder, digest, cache_key, [pred_paths, pred_mid])
             
         return pred_paths,pred_mid
         
@@ -200,6 +322,95 @@ def search_picture(image_path, app_config):
         return {"error": str(e)}
 
 
+def _get_phash_executor(app_config):
+    """懒加载签名计算进程池，避免在应用导入阶段fork子进程"""
+    global phash_executor
+    if phash_executor is None:
+        phash_executor = ProcessPoolExecutor(max_workers=app_config.get('PHASH_WORKERS') or os.cpu_count())
+    return phash_executor
+
+def _safe_phash_signature(image_file):
+    """进程池任务：计算失败时返回异常信息而不是抛出，保证单张坏图不影响整批"""
+    try:
+        return _calculate_phash_signature(image_file), None
+    except Exception as e:
+        return None, str(e)
+
+def _calculate_phash_signatures(image_paths, app_config):
+    """
+    批量计算pHash签名，图片数量较多时使用进程池并行解码
+    内容寻址的上传文件优先读取旁路缓存中的签名，命中时不再解码图片
+    """
+    upload_folder = app_config.get('UPLOAD_FOLDER')
+    signatures = [None] * len(image_paths)
+    digests = [upload_store.digest_from_path(p) for p in image_paths]
+    for i, digest in enumerate(digests):
+        if digest:
+            cached = upload_store.load_meta(upload_folder, digest).get('phash')
+            if cached:
+                signatures[i] = (bytes.fromhex(cached), None)
+
+    pending = [i for i, sig in enumerate(signatures) if sig is None]
+    pending_paths = [image_paths[i] for i in pending]
+    if len(pending_paths) < app_config.get('PHASH_POOL_MIN_BATCH', 8):
+        computed = [_safe_phash_signature(p) for p in pending_paths]
+    else:
+        executor = _get_phash_executor(app_config)
+        computed = list(executor.map(_safe_phash_signature, pending_paths, chunksize=4))
+
+    for i, (signature, error) in zip(pending, computed):
+        signatures[i] = (signature, error)
+        if error is None and digests[i]:
+            upload_store.update_meta(upload_folder, digests[i], phash=signature.hex())
+    return signatures
+
+def search_pictures_batch(image_paths, app_config):
+    """
+    批量图像pHash搜索：并行计算签名，本地索引未命中的签名合并为一次多向量Milvus搜索
+    返回与image_paths一一对应的 [{"paths": [...], "mids": [...]}]，单张失败时含 "error"
+    """
+    if not milvus_client and phash_index is None:
+        raise ConnectionError("Milvus客户端未初始化")
+
+    try:
+        max_distance = app_config.get('PHASH_MAX_DISTANCE', 90)
+        top_k = app_config.get('PHASH_TOP_K', 10)
+        signatures = _calculate_phash_signatures(image_paths, app_config)
+
+        hits_per_image = [None] * len(image_paths)
+        milvus_pending = []
+        for i, (signature, error) in enumerate(signatures):
+            if error is not None:
+                continue
+            if phash_index is not None:
+                hits = phash_index.search(signature, max_distance=max_distance, limit=top_k)
+                if hits or not milvus_client:
+                    hits_per_image[i] = hits
+                    continue
+            milvus_pending.append(i)
+
+        if milvus_pending:
+            milvus_results = _search_phash_milvus(
+                [signatures[i][0] for i in milvus_pending], max_distance, top_k, app_config)
+            for i, hits in zip(milvus_pending, milvus_results):
+                hits_per_image[i] = hits
+
+        results = []
+        for (signature, error), hits in zip(signatures, hits_per_image):
+            if error is not None:
+                results.append({"paths": [], "mids": [], "error": error})
+            else:
+                results.append({
+                    "paths": [item["entity"]["data_path"] for item in hits],
+                    "mids": [item["entity"]["mid"] for item in hits],
+                })
+        return results
+
+    except Exception as e:
+        logger.error(f"批量图像搜索出错: {e}")
+        return {"error": str(e)}
+
+
 def search_event_by_mid(query_content, app_config, top_k_first=1, ngram_n=3):
     """两阶段文本搜索：ES召回 + n-gram重排序"""
     if not es_client:
@@ -207,8 +418,7 @@ def search_event_by_mid(query_content, app_config, top_k_first=1, ngram_n=3):
 
     search_body = {
         "query": {"term": {"id": query_content}},
-        "_source": ["id", "title", "content", "publishtime", "event", "uid", "uname", 
-                    "isrumor", "datasource", "istweet", "isretweet", "retext", "pic_ids", "pic_urls", "vid_ids", "vid_urls"],
+        "_source": _EVENT_SOURCE_FIELDS,
         "size": top_k_first
     }
     
@@ -227,60 +437,8 @@ def search_event_by_mid(query_content, app_config, top_k_first=1, ngram_n=3):
             c["ngram_sim"] = sim
             c["isSource"] = -1
 
-        for c in candidates:
-            if c.get("datasource") == 'weibo':
-                if c["istweet"] and not c["isretweet"]:  
-                # if c.get("istweet") == "true" and c.get("isretweet") == "false":
-                    c["isSource"] = 0
-            else:
-                c["isSource"] = 0
-
-        id_group = {}
-        for c in candidates:
-            id_val = c.get("event")
-            if id_val not in id_group:
-                id_group[id_val] = []
-            id_group[id_val].append(c)
-        
-        temp_candidates = []
-        for group in id_group.values():
-            # sorted_group = sorted(group, key=lambda x: x.get("publishtime", ""), reverse=False)
-            # sorted_group = sorted(group, key=lambda x: x["ngram_sim"], reverse=True)
-            sorted_group = sorted(group, key=lambda x: x["publishtime"], reverse=False)
-            found_source = False
-            for item in sorted_group:
-                if not found_source and item["isSource"] == 0:
-                    item["isSource"] = 1
-                    found_source = True
-            # for item in sorted_group:
-            #     if item["isSource"] == -1:
-            #         item["isSource"] = 0
-            temp_candidates.extend(sorted_group)
-        id_group = {}
-        for c in candidates:
-            id_val = c.get("datasource")
-            if id_val not in id_group:
-                id_group[id_val] = []
-            id_group[id_val].append(c)
-        
-        final_candidates = []
-        for group in id_group.values():
-            # sorted_group = sorted(group, key=lambda x: x.get("publishtime", ""), reverse=False)
-            # sorted_group = sorted(group, key=lambda x: x["ngram_sim"], reverse=True)
-            sorted_group = sorted(group, key=lambda x: x["publishtime"], reverse=False)
-            found_source = False
-            for item in sorted_group:
-                if not found_source and (item["isSource"] == 0 or item["isSource"] == 1):
-                    item["isSource"] = 1
-                    found_source = True
-            for item in sorted_group:
-                if item["isSource"] == -1:
-                    item["isSource"] = 0
-            final_candidates.extend(sorted_group)
-        
-        for c in candidates:
-            c["imageUrl"] = c.pop("pic_urls", -1)  # 使用 pop 删除原键并获取其值 重命名       
-            c["videoUrl"] = c.pop("vid_urls", -1)  # 使用 pop 删除原键并获取其值 重命名   
+        final_candidates = assign_is_source(candidates)
+        _rename_media_fields(candidates)
 
         return final_candidates
 
@@ -288,37 +446,288 @@ def search_event_by_mid(query_content, app_config, top_k_first=1, ngram_n=3):
         logger.error(f"搜索出错: {e}")
         return {"error": str(e)}
 
-# --- 视频搜索逻辑 ---
+def _unique_mids(mids):
+    """去重并保持命中顺序，同一帖子的多张图片只回查一次"""
+    return list(dict.fromkeys(str(mid) for mid in mids if mid is not None and mid != ''))
+
+def _fetch_events_by_mids(unique_mids, app_config):
+    """一次terms查询取回所有mid对应的帖子，返回 {mid: _source}"""
+    search_body = {
+        "query": {"terms": {"id": unique_mids}},
+        "_source": _EVENT_SOURCE_FIELDS,
+        "size": len(unique_mids)
+    }
+    response = es_client.search(index=app_config.get('ES_INDEX'), body=search_body)
+
+    # 每个mid只保留一条
+    by_mid = {}
+    for hit in response['hits']['hits']:
+        source = hit["_source"]
+        by_mid.setdefault(str(source.get("id")), source)
+    return by_mid
+
+def _attribute_events(candidates):
+    """按mid精确回查，不存在查询文本，相似度不参与排序"""
+    for c in candidates:
+        c["ngram_sim"] = 0.0
+
+    final_candidates = assign_is_source(candidates)
+    _rename_media_fields(candidates)
+    return final_candidates
+
+def search_events_by_mids(mids, app_config):
+    """
+    批量回查图像/视频命中的帖子：一次terms查询取回所有mid，
+    并在合并后的候选集上统一做一次isSource归属
+    """
+    if not es_client:
+        raise ConnectionError("Elasticsearch客户端未初始化")
+
+    unique_mids = _unique_mids(mids)
+    if not unique_mids:
+        return []
+
+    try:
+        by_mid = _fetch_events_by_mids(unique_mids, app_config)
+        candidates = [by_mid[mid] for mid in unique_mids if mid in by_mid]
+        return _attribute_events(candidates)
+
+    except Exception as e:
+        logger.error(f"批量回查帖子出错: {e}")
+        return {"error": str(e)}
+
+def search_events_by_mid_groups(mid_groups, app_config):
+    """
+    多组mid的批量回查（如批量图片搜索中每张图片一组）：
+    所有组合并为一次ES请求，isSource归属在各组内部分别计算
+    """
+    if not es_client:
+        raise ConnectionError("Elasticsearch客户端未初始化")
+
+    groups = [_unique_mids(mids) for mids in mid_groups]
+    all_mids = _unique_mids(mid for group in groups for mid in group)
+    if not all_mids:
+        return [[] for _ in groups]
 
-def search_video(video_path, score, app_config):
-    """使用Towhee和Milvus进行视频拷贝检测"""
     try:
+        by_mid = _fetch_events_by_mids(all_mids, app_config)
+        # 不同组可能命中同一帖子，每组使用独立副本，避免isSource互相覆盖
+        return [
+            _attribute_events([dict(by_mid[mid]) for mid in group if mid in by_mid])
+            for group in groups
+        ]
+
+    except Exception as e:
+        logger.error(f"批量回查帖子出错: {e}")
+        return {"error": str(e)}
+
+# --- 视频搜索逻辑 ---
+
+def _video_pipeline_key(app_config, threshold):
+    """流水线按 集合/设备/阈值 区分，其余配置在进程内不变"""
+    return (app_config.get('MILVUS_VIDEO_COLLECTION'), app_config.get('TOWHEE_DEVICE'), float(threshold))
+
+def _make_video_pipeline_factory(app_config):
+    """根据当前配置生成流水线工厂，工厂只依赖配置快照，可在请求上下文之外调用"""
+    milvus_uri = app_config.get('MILVUS_URI')
+    leveldb_path = app_config.get('TOWHEE_LEVELDB_PATH')
+
+    def factory(key):
+        collection, device, threshold = key
         search_conf = AutoConfig.load_config('video_copy_detection')
-        search_conf.collection = app_config.get('MILVUS_VIDEO_COLLECTION')
-        search_conf.milvus_host = app_config.get('MILVUS_URI').split('//')[1].split(':')[0]
-        search_conf.milvus_port = int(app_config.get('MILVUS_URI').split(':')[-1])
-        search_conf.device = app_config.get('TOWHEE_DEVICE')
-        search_conf.leveldb_path = app_config.get('TOWHEE_LEVELDB_PATH')
-        search_conf.threshold = score
-        
-        search_pipe = AutoPipes.pipeline('video_copy_detection', search_conf)
+        search_conf.collection = collection
+        search_conf.milvus_host = milvus_uri.split('//')[1].split(':')[0]
+        search_conf.milvus_port = int(milvus_uri.split(':')[-1])
+        search_conf.device = device
+        search_conf.leveldb_path = leveldb_path
+        search_conf.threshold = threshold
+        return AutoPipes.pipeline('video_copy_detection', search_conf)
+
+    return factory
+
+def init_video_pipeline_pool(app_config):
+    """创建视频拷贝检测流水线池，并按配置预热常用阈值的流水线"""
+    global video_pipeline_pool
+    video_pipeline_pool = PipelinePool(
+        _make_video_pipeline_factory(app_config),
+        size=app_config.get('VIDEO_PIPELINE_POOL_SIZE', 1),
+        acquire_timeout=app_config.get('VIDEO_PIPELINE_ACQUIRE_TIMEOUT', 300),
+        name='视频拷贝检测流水线'
+    )
+    for threshold in app_config.get('VIDEO_PIPELINE_WARMUP_THRESHOLDS') or []:
+        try:
+            video_pipeline_pool.warm_up(_video_pipeline_key(app_config, threshold))
+        except Exception as e:
+            # 预热失败不影响启动，首个请求时会再次尝试创建
+            logger.error(f"预热视频拷贝检测流水线失败(threshold={threshold}): {e}")
+
+def _check_video_readable(video_path):
+    """文件不存在或无法解码出第一帧时抛出PipelineInputError；未安装OpenCV时只检查文件存在"""
+    if not os.path.isfile(video_path):
+        raise PipelineInputError(f"视频文件不存在: {video_path}")
+    if cv2 is None:
+        return
+    capture = cv2.VideoCapture(video_path)
+    try:
+        ok, _ = capture.read()
+    finally:
+        capture.release()
+    if not ok:
+        raise PipelineInputError(f"视频文件无法解码: {os.path.basename(video_path)}")
+
+def _search_video(video_path, score, app_config):
+    """执行视频拷贝检测，返回 (候选列表, 是否命中上传结果缓存)"""
+    if video_pipeline_pool is None:
+        raise ConnectionError("视频拷贝检测流水线池未初始化")
+
+    # 同一视频重复提交时直接复用上次的检测结果，不再解码和提取特征
+    upload_folder = app_config.get('UPLOAD_FOLDER')
+    digest = upload_store.digest_from_path(video_path)
+    cache_key = "video:{}:{}:{}".format(*_video_pipeline_key(app_config, score))
+    if digest:
+        cached = upload_store.get_cached_result(
+            upload_folder, digest, cache_key, app_config.get('UPLOAD_RESULT_CACHE_TTL', 3600))
+        if cached is not None:
+            return cached, True
+
+    # 先校验上传文件，损坏的视频不应占用（或弄坏）流水线实例
+    _check_video_readable(video_path)
+    with video_pipeline_pool.acquire(_video_pipeline_key(app_config, score)) as search_pipe:
         results = search_pipe(video_path)
         res = DataCollection(results).to_list()
-        
-        # 假设返回结果是每个检测段的候选视频列表，我们这里简化为只取第一个结果的候选列表
-        res_value = [r['candidates'] for r in res] if res else []
-        print(res_value)
-        return res_value
-        # 将多个候选列表拍平并去重
-        # flat_unique_list = []
-        # if res_value:
-        #      seen = set()
-        #      for sublist in res_value[0]:
-        #          if sublist not in seen:
-        #              seen.add(sublist)
-        #              flat_unique_list.append(sublist)
-        # return flat_unique_list
 
+    # 假设返回结果是每个检测段的候选视频列表，我们这里简化为只取第一个结果的候选列表
+    res_value = [r['candidates'] for r in res] if res else []
+    logger.debug(f"视频拷贝检测候选: {res_value}")
+    if digest:
+        upload_store.put_cached_result(upload_folder, digest, cache_key, res_value)
+    return res_value, False
+    # 将多个候选列表拍平并去重
+    # flat_unique_list = []
+    # if res_value:
+    #      seen = set()
+    #      for sublist in res_value[0]:
+    #          if sublist not in seen:
+    #              seen.add(sublist)
+    #              flat_unique_list.append(sublist)
+    # return flat_unique_list
+
+def search_video(video_path, score, app_config):
+    """使用Towhee和Milvus进行视频拷贝检测，流水线从池中复用"""
+    try:
+        return _search_video(video_path, score, app_config)[0]
     except Exception as e:
         logger.error(f"视频搜索出错: {e}")
-        return {"error": str(e)}
\ No newline at end of file
+        return {"error": str(e)}
+
+def video_paths_to_mids(video_paths):
+    """视频文件名即帖子mid: /path/<mid>.mp4"""
+    return [video_path.split("/")[-1].split(".")[0] for video_path in video_paths]
+
+# --- 异步视频搜索任务 ---
+
+def init_video_job_queue(app_config):
+    """创建后台视频搜索任务队列，Web worker提交后立即返回，不再阻塞整个检测过程"""
+    global video_job_queue
+    video_job_queue = JobQueue(
+        workers=app_config.get('VIDEO_JOB_WORKERS', 2),
+        max_pending=app_config.get('VIDEO_JOB_MAX_PENDING', 16),
+        job_dir=app_config.get('VIDEO_JOB_DIR'),
+        ttl=app_config.get('VIDEO_JOB_RESULT_TTL', 24 * 3600),
+        name='视频搜索'
+    )
+
+def _count_video_frames(video_path):
+    """读取视频总帧数，无法读取时返回None"""
+    if cv2 is None:
+        return None
+    capture = cv2.VideoCapture(video_path)
+    try:
+        frames = int(capture.get(cv2.CAP_PROP_FRAME_COUNT))
+        return frames if frames > 0 else None
+    finally:
+        capture.release()
+
+def _update_video_fps(fps):
+    """
+    视频检测吞吐量（帧/秒）的滑动平均保存在任务目录中，各worker进程估算进度时使用同一个值；
+    单个样本相对当前平均值的偏差限制在 _VIDEO_FPS_MAX_RATIO 倍以内，避免异常样本把估算带偏
+    """
+    previous = video_job_queue.get_stat('video_fps')
+    if previous is None:
+        video_job_queue.set_stat('video_fps', fps)
+        return
+    fps = min(max(fps, previous / _VIDEO_FPS_MAX_RATIO), previous * _VIDEO_FPS_MAX_RATIO)
+    video_job_queue.set_stat('video_fps', 0.7 * previous + 0.3 * fps)
+
+def _run_video_search_job(report_progress, video_path, score, app_config):
+    """后台执行视频检测和帖子回查，按阶段上报进度"""
+    frames_total = _count_video_frames(video_path)
+    report_progress(stage='detecting', frames_total=frames_total, frames_processed=0)
+
+    start_time = time.time()
+    try:
+        results, cached = _search_video(video_path, score, app_config)
+    except Exception as e:
+        logger.error(f"视频搜索出错: {e}")
+        raise RuntimeError(str(e)) from e
+
+    duration = time.time() - start_time
+    # 命中缓存或耗时过短的样本不反映真实检测速度，不计入吞吐量
+    if frames_total and not cached and duration >= _VIDEO_FPS_MIN_SAMPLE_SECONDS:
+        _update_video_fps(frames_total / duration)
+    report_progress(stage='hydrating', frames_processed=frames_total)
+
+    results_event = []
+    if results and isinstance(results, list):
+        results_event = search_events_by_mids(video_paths_to_mids(results), app_config)
+        if isinstance(results_event, dict) and "error" in results_event:
+            raise RuntimeError(results_event["error"])
+
+    # 任务结果保留时间远长于签名链接有效期，这里只保存文件路径，读取结果时再签名
+    media_paths = results if results and isinstance(results, list) else []
+
+    report_progress(stage='done')
+    return {"search_results": results_event, "media_paths": media_paths}
+
+def video_search_job_result(result, app_config):
+    """把任务结果中的媒体文件路径转换为当前时刻签发的媒体链接"""
+    result = dict(result)
+    media_paths = result.pop('media_paths', None)
+    if media_paths is not None:
+        result['media'] = media_service.describe_media(media_paths, app_config, mids=video_paths_to_mids(media_paths))
+    return result
+
+def submit_video_search_job(video_path, score, app_config):
+    """提交视频搜索任务，队列已满时抛出QueueFullError"""
+    if video_job_queue is None:
+        raise ConnectionError("视频搜索任务队列未初始化")
+    return video_job_queue.submit(
+        _run_video_search_job, video_path, score, app_config,
+        meta={'filename': os.path.basename(video_path), 'score': score}
+    )
+
+def get_video_search_job(job_id):
+    """
+    查询任务状态；检测阶段没有逐帧进度，按历史平均吞吐量给出估算值：
+    frames_processed_estimate / percent_estimate，并标记 estimated=True
+    """
+    if video_job_queue is None:
+        raise ConnectionError("视频搜索任务队列未初始化")
+    job = video_job_queue.get(job_id)
+    if job is None:
+        return None
+
+    progress = job['progress']
+    frames_total = progress.get('frames_total')
+    if job['status'] == JOB_RUNNING and progress.get('stage') == 'detecting' and frames_total and job['started_at']:
+        fps = video_job_queue.get_stat('video_fps')
+        if fps:
+            # 估算值封顶在99%，真正完成以stage变化为准
+            estimated = int(min(frames_total * 0.99, (time.time() - job['started_at']) * fps))
+            progress['estimated'] = True
+            progress['frames_processed_estimate'] = estimated
+            progress['percent_estimate'] = round(100.0 * estimated / frames_total, 1)
+    if frames_total and progress.get('frames_processed') is not None:
+        progress['percent'] = round(100.0 * progress['frames_processed'] / frames_total, 1)
+    return job
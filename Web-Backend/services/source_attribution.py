@@ -0,0 +1,43 @@
+# /unified_service/services/source_attribution.py
+
+
+def _is_original(c):
+    """微博只有原创且非转发的帖子可以作为源头，其他数据源的帖子都可以"""
+    if c.get("datasource") == 'weibo':
+        return bool(c["istweet"] and not c["isretweet"])
+    return True
+
+
+def assign_is_source(candidates):
+    """
+    源头标记（isSource）：在同一事件(event)或同一数据源(datasource)内，
+    最早发布的可作为源头的帖子标记为1，其余为0。
+    候选集只按publishtime稳定排序一次，然后单次遍历同时得到事件源头和数据源源头；
+    返回按数据源分组（组顺序为数据源首次出现的顺序）、组内按发布时间升序的列表。
+    """
+    # 数据源分组顺序与原始候选顺序一致
+    groups = {}
+    for c in candidates:
+        ds = c.get("datasource")
+        if ds not in groups:
+            groups[ds] = []
+
+    seen_events = set()
+    seen_datasources = set()
+    for c in sorted(candidates, key=lambda x: x["publishtime"]):
+        ds = c.get("datasource")
+        c["isSource"] = 0
+        if _is_original(c):
+            event = c.get("event")
+            if event not in seen_events:
+                seen_events.add(event)
+                c["isSource"] = 1
+            if ds not in seen_datasources:
+                seen_datasources.add(ds)
+                c["isSource"] = 1
+        groups[ds].append(c)
+
+    final_candidates = []
+    for group in groups.values():
+        final_candidates.extend(group)
+    return final_candidates
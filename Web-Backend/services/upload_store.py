@@ -0,0 +1,105 @@
+# /unified_service/services/upload_store.py
+
+import hashlib
+import json
+import logging
+import os
+import re
+import tempfile
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+# 上传文件按内容SHA-256命名: <sha256>.<ext>，旁路元数据保存在 .meta/<sha256>.json
+META_DIRNAME = '.meta'
+CHUNK_SIZE = 1024 * 1024
+_DIGEST_RE = re.compile(r'^[0-9a-f]{64}$')
+_meta_lock = threading.Lock()
+
+
+def save_upload(file, upload_folder, extension):
+    """
+    流式保存上传文件：边写临时文件边计算SHA-256，内容已存在时直接丢弃临时文件
+    返回 (filepath, digest, is_new)
+    """
+    os.makedirs(upload_folder, exist_ok=True)
+    hasher = hashlib.sha256()
+    fd, tmp_path = tempfile.mkstemp(dir=upload_folder, prefix='.upload-', suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as out:
+            while True:
+                chunk = file.stream.read(CHUNK_SIZE)
+                if not chunk:
+                    break
+                hasher.update(chunk)
+                out.write(chunk)
+        digest = hasher.hexdigest()
+        filepath = os.path.join(upload_folder, f"{digest}.{extension.lower()}")
+        if os.path.exists(filepath):
+            os.remove(tmp_path)
+            return filepath, digest, False
+        os.replace(tmp_path, filepath)
+        return filepath, digest, True
+    except Exception:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def digest_from_path(filepath):
+    """从内容寻址的文件路径中取出SHA-256，非内容寻址路径返回None"""
+    name = os.path.splitext(os.path.basename(filepath))[0]
+    return name if _DIGEST_RE.match(name) else None
+
+
+def _meta_path(upload_folder, digest):
+    return os.path.join(upload_folder, META_DIRNAME, f"{digest}.json")
+
+
+def load_meta(upload_folder, digest):
+    """读取某个内容哈希的旁路元数据（签名、指纹、搜索结果等）"""
+    try:
+        with open(_meta_path(upload_folder, digest), 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def _write_meta(upload_folder, digest, meta):
+    # 调用方需持有 _meta_lock；临时文件+原子替换，避免并发读到不完整内容
+    path = _meta_path(upload_folder, digest)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    try:
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(meta, f, ensure_ascii=False)
+        os.replace(tmp_path, path)
+    except (OSError, TypeError, ValueError) as e:
+        logger.warning(f"写入上传文件元数据失败 {digest}: {e}")
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+def update_meta(upload_folder, digest, **fields):
+    """合并写入旁路元数据"""
+    with _meta_lock:
+        meta = load_meta(upload_folder, digest)
+        meta.update(fields)
+        _write_meta(upload_folder, digest, meta)
+    return meta
+
+
+def get_cached_result(upload_folder, digest, key, ttl):
+    """读取按内容哈希缓存的搜索结果，超过ttl秒视为过期"""
+    entry = load_meta(upload_folder, digest).get('results', {}).get(key)
+    if not entry or time.time() - entry.get('created_at', 0) > ttl:
+        return None
+    return entry.get('value')
+
+
+def put_cached_result(upload_folder, digest, key, value):
+    with _meta_lock:
+        meta = load_meta(upload_folder, digest)
+        meta.setdefault('results', {})[key] = {'created_at': time.time(), 'value': value}
+        _write_meta(upload_folder, digest, meta)
@@ -0,0 +1,47 @@
+# /unified_service/tests/test_bigram_index.py
+# 用法（在 Web-Backend 目录下执行）: python -m pytest tests
+
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bson import ObjectId
+from services.bigram_index import BigramIndex
+
+
+def _index(n=3):
+    ids = sorted(ObjectId() for _ in range(n))
+    docs = [{'_id': doc_id, 'Event': f"事件{i}", 'content': f"内容{i}"} for i, doc_id in enumerate(ids)]
+    return BigramIndex.build(docs), ids
+
+
+def _update(doc_id, updated=None, removed=None):
+    return {'op': 'update', 'id': doc_id, 'doc': None, 'before': None, 'token': None,
+            'updated_fields': updated, 'removed_fields': removed, 'source': 'change_stream'}
+
+
+def test_praise_only_update_does_not_dirty_index():
+    index, ids = _index()
+    assert not index.affected_by(_update(ids[0], updated=['Praise']))
+    assert not index.affected_by(_update(ids[0], updated=['TimeDt', 'isRiskBool']))
+
+
+def test_text_update_dirties_index():
+    index, ids = _index()
+    assert index.affected_by(_update(ids[0], updated=['Praise', 'content']))
+    assert index.affected_by(_update(ids[1], updated=['Event.title']))
+    assert index.affected_by(_update(ids[1], updated=[], removed=['Event']))
+
+
+def test_replace_and_unknown_update_dirty_index():
+    index, ids = _index()
+    assert index.affected_by(dict(_update(ids[0]), op='replace'))
+    # 轮询模式不知道修改了哪些字段
+    assert index.affected_by(_update(ids[0]))
+
+
+def test_documents_outside_index_are_ignored():
+    index, ids = _index()
+    assert not index.affected_by(_update(ObjectId(), updated=['content']))
+    assert not index.affected_by(dict(_update(ids[0], updated=['content']), op='insert'))